@@ -1,2 +1,33 @@
-from .data_service import *
-from .utility_funcs import *
\ No newline at end of file
+import importlib
+
+# The package's names are looked up in its modules on first use instead of star
+# imported here: importing back_end (or a light module like back_end.utility_funcs)
+# doesn't pull in pandas and every reader. Later modules win, as star imports did.
+_MODULES = ("data_service", "utility_funcs", "partitioned_compare", "index_compare",
+            "factorized_compare", "value_diff", "projection", "json_stream", "key_normalize",
+            "profiling", "export", "key_sketch", "incremental", "process_parse", "transform",
+            "fuzzy_match", "frame_io")
+
+
+def _public(module) -> list:
+    names = getattr(module, "__all__", None)
+    return list(names) if names is not None else [n for n in vars(module) if not n.startswith("_")]
+
+
+def __getattr__(name: str):
+    if name.startswith("_"):
+        raise AttributeError(name)
+    for module_name in reversed(_MODULES):
+        module = importlib.import_module(f".{module_name}", __name__)
+        if name in _public(module):
+            value = getattr(module, name)
+            globals()[name] = value
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list:
+    names = set(globals())
+    for module_name in _MODULES:
+        names.update(_public(importlib.import_module(f".{module_name}", __name__)))
+    return sorted(names)
\ No newline at end of file
@@ -0,0 +1,230 @@
+import json
+import multiprocessing
+import os
+import re
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Sequence
+from .data_service import DataService
+from .export import EXPORT_FORMATS, FORMAT_EXTENSIONS, export_frame
+from .partitioned_compare import MERGE_OVERHEAD
+
+# Headless batch compares. A manifest lists jobs (file A, file B, keys, options);
+# every job runs in its own spawned process, so a job that runs out of memory
+# can't take the others down, and nothing here ever imports Qt.
+
+# parsed frame size per byte of file, by extension, for the memory estimate
+PARSED_BYTES_PER_FILE_BYTE = {
+    ".csv": 2.0, ".txt": 2.0, ".tsv": 2.0, ".json": 2.5,
+    ".parquet": 6.0, ".feather": 1.5, ".arrow": 1.5,
+    ".xlsx": 8.0, ".xls": 8.0, ".xlsm": 8.0, ".xlsb": 8.0, ".ods": 8.0,
+}
+DEFAULT_PARSED_RATIO = 4.0
+
+JOB_OPTIONS = ("engine", "load_engine", "normalize_str", "validate", "suffixes",
+               "keep_cols_a", "keep_cols_b", "write", "output_format", "chunk_rows", "fuzzy")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _as_list(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _job_name(i: int, job: Dict) -> str:
+    name = job.get("name") or (f"{i:04d}_{os.path.splitext(os.path.basename(job['file_a']))[0]}"
+                               f"__{os.path.splitext(os.path.basename(job['file_b']))[0]}")
+    return re.sub(r"[^\w.-]+", "_", str(name))
+
+
+def load_manifest(path: str) -> List[Dict]:
+    # {"defaults": {...options}, "jobs": [{"file_a", "file_b", "keys" | "keys_a"/"keys_b", ...}]}
+    # or just the list of jobs. Relative paths are relative to the manifest.
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    if isinstance(doc, list):
+        doc = {"jobs": doc}
+    defaults = doc.get("defaults", {})
+    base = os.path.dirname(os.path.abspath(path))
+
+    jobs = []
+    names = set()
+    for i, raw in enumerate(doc.get("jobs", [])):
+        job = {**defaults, **raw}
+        missing = [k for k in ("file_a", "file_b") if not job.get(k)]
+        if missing:
+            raise ManifestError(f"Job {i}: missing {missing}")
+        keys_a = _as_list(job.get("keys_a", job.get("keys")))
+        keys_b = _as_list(job.get("keys_b", job.get("keys")))
+        if not keys_a or not keys_b:
+            raise ManifestError(f"Job {i}: needs \"keys\" or \"keys_a\" and \"keys_b\"")
+        unknown = set(job) - {"name", "file_a", "file_b", "keys", "keys_a", "keys_b", *JOB_OPTIONS}
+        if unknown:
+            raise ManifestError(f"Job {i}: unknown options {sorted(unknown)}")
+        if job.get("output_format", "csv") not in EXPORT_FORMATS:
+            raise ManifestError(f"Job {i}: output_format must be one of {EXPORT_FORMATS}")
+        job["file_a"] = os.path.join(base, job["file_a"])
+        job["file_b"] = os.path.join(base, job["file_b"])
+        job["keys_a"], job["keys_b"] = keys_a, keys_b
+        job.pop("keys", None)
+        job["name"] = _job_name(i, job)
+        if job["name"] in names:
+            raise ManifestError(f"Job {i}: duplicate name {job['name']!r}")
+        names.add(job["name"])
+        jobs.append(job)
+    return jobs
+
+
+def estimate_job_bytes(job: Dict) -> int:
+    # rough peak memory of a job: both parsed sides times the merge overhead
+    parsed = 0
+    for key in ("file_a", "file_b"):
+        path = job[key]
+        ext = os.path.splitext(path)[1].lower()
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        parsed += size * PARSED_BYTES_PER_FILE_BYTE.get(ext, DEFAULT_PARSED_RATIO)
+    return int(parsed * MERGE_OVERHEAD)
+
+
+def available_memory() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def run_job(job: Dict, out_dir: str) -> Dict:
+    # Runs one job in the current process and returns its summary
+    start = time.perf_counter()
+    service = DataService(load_engine=job.get("load_engine", "pandas"))
+    job_dir = os.path.join(out_dir, job["name"])
+    os.makedirs(job_dir, exist_ok=True)
+
+    with service.tracer.span("job", job=job["name"]) as root:
+        result = service.compare_files(
+            job["file_a"], job["file_b"], job["keys_a"], job["keys_b"],
+            keep_cols_1=_as_list(job.get("keep_cols_a")),
+            keep_cols_2=_as_list(job.get("keep_cols_b")),
+            suffixes=tuple(job.get("suffixes", ("_A", "_B"))),
+            validate=job.get("validate"),
+            normalize_str=job.get("normalize_str", False),
+            engine=job.get("engine", "factorize"),
+            fuzzy=job.get("fuzzy"))
+
+        fmt = job.get("output_format", "csv")
+        outputs = {}
+        rows = {}
+        for key in job.get("write", ["left_only", "right_only"]):
+            path = os.path.join(job_dir, f"{key}{FORMAT_EXTENSIONS[fmt]}")
+            with service.tracer.span("write", result=key):
+                rows[key] = export_frame(result, path, key, chunk_rows=int(job.get("chunk_rows", 100_000)))
+            outputs[key] = path
+
+    counts = result.counts if hasattr(result, "counts") else {k: len(v) for k, v in result.items()}
+    return {
+        "name": job["name"],
+        "status": "ok",
+        "file_a": job["file_a"],
+        "file_b": job["file_b"],
+        "counts": counts,
+        "outputs": outputs,
+        "rows_written": rows,
+        "seconds": round(time.perf_counter() - start, 3),
+        "phases": root.summary() if root is not None else None
+    }
+
+
+def _job_process(job: Dict, out_dir: str, summary_path: str):
+    try:
+        summary = run_job(job, out_dir)
+    except Exception as e:
+        summary = {"name": job["name"], "status": "failed",
+                   # some exceptions (MemoryError()) have no message
+                   "error": str(e) or type(e).__name__,
+                   "traceback": traceback.format_exc()}
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+
+
+class BatchRunner:
+    # Runs jobs in up to `workers` processes at a time. A job is only started
+    # while the memory estimates of the running jobs plus its own fit in
+    # memory_limit; a job too big for the limit on its own runs alone.
+    poll_seconds = 0.1
+
+    def __init__(self, out_dir: str, workers: Optional[int] = None,
+                 memory_limit: Optional[int] = None,
+                 on_done: Optional[Callable[[Dict], None]] = None):
+        self.out_dir = out_dir
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        total = available_memory()
+        self.memory_limit = memory_limit or (total // 2 if total else None)
+        self.on_done = on_done
+
+    def run(self, jobs: Sequence[Dict]) -> List[Dict]:
+        os.makedirs(self.out_dir, exist_ok=True)
+        ctx = multiprocessing.get_context("spawn")
+        pending = [(job, estimate_job_bytes(job)) for job in jobs]
+        running: Dict[str, tuple] = {}
+        results: Dict[str, Dict] = {}
+
+        while pending or running:
+            # start whatever fits, in manifest order
+            in_use = sum(est for _, _, est in running.values())
+            i = 0
+            while i < len(pending) and len(running) < self.workers:
+                job, est = pending[i]
+                fits = self.memory_limit is None or in_use + est <= self.memory_limit
+                if fits or not running:
+                    summary_path = os.path.join(self.out_dir, f".{job['name']}.summary.json")
+                    proc = ctx.Process(target=_job_process, args=(job, self.out_dir, summary_path))
+                    proc.start()
+                    running[job["name"]] = (proc, summary_path, est)
+                    in_use += est
+                    pending.pop(i)
+                else:
+                    i += 1
+
+            for name, (proc, summary_path, est) in list(running.items()):
+                if proc.is_alive():
+                    continue
+                proc.join()
+                del running[name]
+                results[name] = self._collect(name, proc.exitcode, summary_path, est)
+                if self.on_done is not None:
+                    self.on_done(results[name])
+            if running:
+                time.sleep(self.poll_seconds)
+
+        return [results[job["name"]] for job in jobs]
+
+    def _collect(self, name: str, exitcode: int, summary_path: str, est: int) -> Dict:
+        try:
+            with open(summary_path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+            os.remove(summary_path)
+        except (OSError, ValueError):
+            hint = " (killed, likely out of memory)" if exitcode and exitcode < 0 else ""
+            summary = {"name": name, "status": "failed",
+                       "error": f"Worker process exited with code {exitcode}{hint}"}
+        summary["estimated_bytes"] = est
+        return summary
+
+
+def run_batch(manifest_path: str, out_dir: str, workers: Optional[int] = None,
+              memory_limit: Optional[int] = None,
+              on_done: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    # summary.jsonl in out_dir gets one line per job as soon as it finishes
+    jobs = load_manifest(manifest_path)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "summary.jsonl"), "w", encoding="utf-8") as log:
+        def done(summary: Dict):
+            log.write(json.dumps({k: v for k, v in summary.items() if k != "traceback"}, default=str) + "\n")
+            log.flush()
+            if on_done is not None:
+                on_done(summary)
+        return BatchRunner(out_dir, workers, memory_limit, on_done=done).run(jobs)
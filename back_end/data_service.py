@@ -1,87 +1,554 @@
 import pandas as pd
 import os
-import json
 import traceback
-from typing import List, Sequence, Union, Dict, Optional, Tuple
+import threading
+from typing import List, Sequence, Union, Dict, Optional, Tuple, Callable, Mapping
+from .partitioned_compare import partitioned_compare
+from .index_compare import index_compare, HashCollision, SideIndex
+from .factorized_compare import factorized_compare
+from .value_diff import value_diff
+from .dataset_cache import DatasetCache
+from .projection import ProjectedFrame
+from .json_stream import iter_json_batches, records_frame
+from .key_normalize import FrameCache, KeyNormalizer, NormalizeSpec, normalize_spec
+from .profiling import Tracer
+from .export import ExportProgress, export_frame
+from .key_sketch import KeySketch, estimate_overlap
+from .incremental import APPENDABLE_FORMATS, FileState, read_appended
+from .process_parse import ParsePool
+from .transform import Transformer, apply_rules
+from .fuzzy_match import FuzzyResult, fuzzy_frame, fuzzy_rows, unmatched_rows
+from .utility_funcs import key_hashes
+
+# progress(bytes_read, total_bytes, rows_parsed)
+ProgressCallback = Callable[[int, int, int], None]
+# cache_status("hit" | "miss")
+CacheStatusCallback = Callable[[str], None]
+
+
+class LoadCancelled(Exception):
+    pass
+
 
 class DataService():
-    def __init__(self, export_path:str=None):
+    csv_chunk_rows: int = 200_000
+    json_batch_rows: int = 50_000
+    export_chunk_rows: int = 100_000
+    preview_rows: int = 20
+    compare_engines = ("merge", "partitioned", "index", "parallel", "factorize")
+    # memory the partitioned compare engine may use for one partition merge
+    compare_memory_budget: int = 1 << 30
+
+    # already columnar, re-reading them is as fast as a cache hit
+    uncached_formats = ('.parquet', '.feather', '.arrow')
+
+    # "pandas": the default NumPy-backed readers
+    # "pyarrow": multithreaded Arrow readers for CSV/Parquet/Feather, Arrow-backed dtypes
+    load_engines = ("pandas", "pyarrow")
+    arrow_formats = ('.csv', '.txt', '.tsv', '.parquet', '.feather', '.arrow')
+
+    def __init__(self, export_path:str=None, cache: Optional[DatasetCache] = None,
+                 load_engine: str = "pandas", tracer: Optional[Tracer] = None,
+                 parse_pool: Optional[ParsePool] = None):
+        if load_engine not in self.load_engines:
+            raise ValueError(f"Unknown load engine: {load_engine}. Expected one of {self.load_engines}")
         self.export_path:str = export_path
         self.Cols = Union[str, Sequence[str]]
+        self.cache = cache
+        self.load_engine = load_engine
+        self.key_normalizer = KeyNormalizer()
+        # per loaded frame: key sketches and key indexes by (key columns, normalization),
+        # and the FileState of the text file it was loaded from
+        self.key_sketches = FrameCache()
+        self.key_indexes = FrameCache()
+        self.file_states = FrameCache(max_entries=64)
+        # timing/memory spans of loads and compares, cheap enough to stay on
+        self.tracer = tracer if tracer is not None else Tracer()
+        # parse in worker processes (formats in parse_pool.formats), None: in this one
+        self.parse_pool = parse_pool
+
+    def json_reader(self, path:str,
+                    progress: Optional[ProgressCallback] = None,
+                    cancel: Optional[threading.Event] = None,
+                    columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        # one streaming pass, format sniffed up front (see json_stream)
+        total = os.path.getsize(path)
+        frames = []
+        rows = 0
+
+        def flatten(records: list) -> pd.DataFrame:
+            with self.tracer.span("flatten"):
+                return records_frame(records)
 
-    def json_reader(self, path:str) -> pd.DataFrame:
+        batches = iter_json_batches(path, self.json_batch_rows, flatten=flatten)
+        while True:
+            with self.tracer.span("parse"):
+                item = next(batches, None)
+            if item is None:
+                break
+            frame, nbytes = item
+            if columns is not None:
+                # drop unwanted columns per batch, a missing one fails in get_data
+                frame = frame[[c for c in columns if c in frame.columns]]
+            frames.append(frame)
+            rows += len(frame)
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled(path)
+            if progress is not None:
+                progress(nbytes, total, rows)
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0]
+        with self.tracer.span("concat"):
+            return pd.concat(frames, ignore_index=True)
+
+    def _read_csv_chunked(self, data_path: str, sep: str,
+                          progress: Optional[ProgressCallback],
+                          cancel: Optional[threading.Event],
+                          columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        total = os.path.getsize(data_path)
+        chunks = []
+        rows = 0
+        with open(data_path, "rb") as f:
+            reader = pd.read_csv(f, sep=sep, chunksize=self.csv_chunk_rows, low_memory=False,
+                                 usecols=columns)
+            while True:
+                with self.tracer.span("parse"):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                if cancel is not None and cancel.is_set():
+                    raise LoadCancelled(data_path)
+                chunks.append(chunk)
+                rows += len(chunk)
+                if progress is not None:
+                    progress(min(f.tell(), total), total, rows)
+        if not chunks:
+            return pd.read_csv(data_path, sep=sep, usecols=columns)
+        if len(chunks) == 1:
+            return chunks[0]
+        with self.tracer.span("concat"):
+            return pd.concat(chunks, ignore_index=True)
+
+    def _preview_parquet(self, data_path: str, nrows: int) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(data_path)
+        if pf.num_row_groups == 0:
+            return pf.schema_arrow.empty_table().to_pandas()
+        return pf.read_row_group(0).slice(0, nrows).to_pandas()
+
+    def _preview_feather(self, data_path: str, nrows: int) -> pd.DataFrame:
+        import pyarrow as pa
+        with pa.memory_map(data_path) as source:
+            reader = pa.ipc.open_file(source)
+            if reader.num_record_batches == 0:
+                return reader.schema.empty_table().to_pandas()
+            return pa.Table.from_batches([reader.get_batch(0).slice(0, nrows)]).to_pandas()
+
+    def get_preview(self, data_path: str, nrows: Optional[int] = None) -> Optional[pd.DataFrame]:
+        # Cheap partial read used to fill a panel before the full parse is done.
+        # Returns None for formats that can't be read partially (html, pickle, ...).
+        nrows = self.preview_rows if nrows is None else nrows
+        ext = os.path.splitext(data_path)[1].lower()
         try:
-            return pd.read_json(path)
-        except ValueError as e:
-            if "Trailing data" in str(e) or "Expected object or value" in str(e):
-                return pd.read_json(path, lines=True)
-            else:
-                with open(path, "r", encoding="utf-8") as f:
-                    raw = json.load(f)
-            if isinstance(raw, dict):
-                # if top-level is dict, try to normalize based on a likely array
-                # prefer first value if list-like
-                first_key = next(iter(raw))
-                if first_key is not None and isinstance(raw[first_key], list):
-                    return pd.json_normalize(raw[first_key])
-                # else flatten
-                return pd.json_normalize(raw)
-            elif isinstance(raw, list):
-                return pd.json_normalize(raw)
-            else:
-                raise RuntimeError(f"Unsupported JSON structure type: {type(raw)}")
+            if ext in ('.csv', '.txt', '.tsv'):
+                sep = "\t" if ext == ".tsv" else ","
+                return pd.read_csv(data_path, sep=sep, nrows=nrows)
+            elif ext in ('.xlsx', '.xls', '.xlsm', '.xlsb', '.ods'):
+                engine = "pyxlsb" if ext == ".xlsb" else None
+                return pd.read_excel(data_path, engine=engine, nrows=nrows)
+            elif ext == '.parquet':
+                return self._preview_parquet(data_path, nrows)
+            elif ext in ('.feather', '.arrow'):
+                return self._preview_feather(data_path, nrows)
+            elif ext == '.dta':
+                with pd.read_stata(data_path, iterator=True) as reader:
+                    return reader.read(nrows)
+            elif ext in ('.sas7bdat', '.xpt'):
+                with pd.read_sas(data_path, chunksize=nrows) as reader:
+                    return reader.read(nrows)
+            elif ext == '.json':
+                for frame, _ in iter_json_batches(data_path, max(nrows, 1)):
+                    return frame.head(nrows)
+                return pd.DataFrame()
+        except Exception:
+            # the full load reports real errors, a failed preview just means waiting for it
+            return None
+        return None
+
+    def _read_csv_arrow(self, data_path: str, sep: str,
+                        progress: Optional[ProgressCallback],
+                        cancel: Optional[threading.Event],
+                        columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        import pyarrow as pa
+        from pyarrow import csv
 
-    def get_data(self, data_path:str) -> pd.DataFrame:
+        parse_options = csv.ParseOptions(delimiter=sep)
+        convert_options = csv.ConvertOptions(include_columns=list(columns) if columns is not None else None)
+        if progress is None and cancel is None:
+            with self.tracer.span("parse"):
+                table = csv.read_csv(data_path, parse_options=parse_options, convert_options=convert_options)
+        else:
+            total = os.path.getsize(data_path)
+            batches = []
+            rows = 0
+            with self.tracer.span("parse"), pa.OSFile(data_path, "rb") as source:
+                reader = csv.open_csv(source, parse_options=parse_options, convert_options=convert_options)
+                for batch in reader:
+                    if cancel is not None and cancel.is_set():
+                        raise LoadCancelled(data_path)
+                    batches.append(batch)
+                    rows += batch.num_rows
+                    if progress is not None:
+                        progress(min(source.tell(), total), total, rows)
+                table = pa.Table.from_batches(batches, schema=reader.schema)
+        with self.tracer.span("convert"):
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _read_arrow(self, data_path: str, ext: str,
+                    progress: Optional[ProgressCallback],
+                    cancel: Optional[threading.Event],
+                    columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        if ext in ('.csv', '.txt', '.tsv'):
+            sep = "\t" if ext == ".tsv" else ","
+            return self._read_csv_arrow(data_path, sep, progress, cancel, columns)
+        if progress is not None:
+            progress(0, os.path.getsize(data_path), 0)
+        if ext == '.parquet':
+            with self.tracer.span("read"):
+                return pd.read_parquet(data_path, dtype_backend="pyarrow", columns=columns)
+        # Feather v2 / Arrow IPC: memory-mapped, Arrow-backed columns keep pointing
+        # into the mapping instead of being copied
+        from pyarrow import feather
+        with self.tracer.span("read"):
+            table = feather.read_table(data_path, columns=columns, memory_map=True)
+        with self.tracer.span("convert"):
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def get_schema(self, data_path: str) -> List[str]:
+        # Column names without parsing the data (only the header / file metadata)
+        ext = os.path.splitext(data_path)[1].lower()
+        try:
+            if ext == '.parquet':
+                import pyarrow.parquet as pq
+                schema = pq.read_schema(data_path)
+                index_cols = (schema.pandas_metadata or {}).get("index_columns", [])
+                return [c for c in schema.names if c not in index_cols]
+            if ext in ('.feather', '.arrow'):
+                import pyarrow as pa
+                with pa.memory_map(data_path) as source:
+                    return list(pa.ipc.open_file(source).schema.names)
+        except FileNotFoundError:
+            raise RuntimeError("File could not be found")
+        except Exception as e:
+            raise RuntimeError(f"An error occurred: {e}\n\n{traceback.format_exc()}")
+
+        nrows = 0 if ext in ('.csv', '.txt', '.tsv', '.xlsx', '.xls', '.xlsm', '.xlsb', '.ods') else 1
+        head = self.get_preview(data_path, nrows=nrows)
+        if head is None:
+            head = self.get_data(data_path)
+        return list(head.columns)
+
+    def get_data(self, data_path:str,
+                 progress: Optional[ProgressCallback] = None,
+                 cancel: Optional[threading.Event] = None,
+                 cache_status: Optional[CacheStatusCallback] = None,
+                 engine: Optional[str] = None,
+                 columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        # columns: load only these columns (projection pushdown where the format allows)
+        with self.tracer.span("get_data", path=data_path, engine=engine or self.load_engine):
+            return self._get_data(data_path, progress, cancel, cache_status, engine, columns)
+
+    def _get_data(self, data_path: str,
+                  progress: Optional[ProgressCallback],
+                  cancel: Optional[threading.Event],
+                  cache_status: Optional[CacheStatusCallback],
+                  engine: Optional[str],
+                  columns: Optional[Sequence[str]]) -> pd.DataFrame:
+        engine = engine or self.load_engine
+        if engine not in self.load_engines:
+            raise ValueError(f"Unknown load engine: {engine}. Expected one of {self.load_engines}")
         txt_list = ['.csv', '.txt', '.tsv']
         excel_list = ['.xlsx', '.xls', '.xlsm', '.xlsb', '.ods']
         other_formats = {
-            '.json': self.json_reader,
             '.html': lambda path: pd.read_html(path)[0],
             '.parquet': pd.read_parquet,
             '.pkl': pd.read_pickle,
             '.dta': pd.read_stata,
             '.sas7bdat': pd.read_sas,
             '.xpt': pd.read_sas,
-            '.feather': pd.read_feather
+            '.feather': pd.read_feather,
+            '.arrow': pd.read_feather
         }
+        # readers that can skip unwanted columns themselves
+        projecting_formats = ('.parquet', '.dta', '.feather', '.arrow')
+        if columns is not None:
+            columns = list(dict.fromkeys(columns))
 
         try:
             ext = os.path.splitext(data_path)[1].lower()
-            if ext in txt_list:
+            total = os.path.getsize(data_path)
+            # full loads of text files can later pick up appended rows (refresh_data).
+            # That needs a hash of the whole file, taken once per parse: cache hits
+            # reuse the one stored with the entry.
+            state = FileState.capture(data_path) if columns is None and ext in APPENDABLE_FORMATS else None
+
+            cache_key = None
+            if self.cache is not None and ext not in self.uncached_formats:
+                with self.tracer.span("cache read"):
+                    cache_key = self.cache.key_for(data_path, variant=engine)
+                    data = None if cache_key is None else self.cache.get(
+                        cache_key, arrow_dtypes=engine == "pyarrow", columns=columns)
+            if cache_key is not None:
+                if cache_status is not None:
+                    cache_status("miss" if data is None else "hit")
+                if data is not None:
+                    if progress is not None:
+                        progress(total, total, len(data))
+                    if state is not None:
+                        state.prefix_digest = self.cache.meta(cache_key).get("prefix_digest")
+                    self._remember_source(data, state)
+                    return data
+
+            if self.parse_pool is not None and ext in self.parse_pool.formats:
+                with self.tracer.span("parse", processes=self.parse_pool.workers):
+                    data = self.parse_pool.parse(data_path, engine, columns, progress, cancel)
+
+            elif engine == "pyarrow" and ext in self.arrow_formats:
+                data = self._read_arrow(data_path, ext, progress, cancel, columns)
+
+            elif ext in txt_list:
                 sep = "\t" if ext == ".tsv" else ","
-                data = pd.read_csv(data_path, sep=sep, low_memory=False)
-                return data
+                if progress is None and cancel is None:
+                    with self.tracer.span("parse"):
+                        data = pd.read_csv(data_path, sep=sep, low_memory=False, usecols=columns)
+                else:
+                    data = self._read_csv_chunked(data_path, sep, progress, cancel, columns)
+
+            elif ext == '.json':
+                data = self.json_reader(data_path, progress, cancel, columns)
 
             elif ext in excel_list:
-                engine = None
+                excel_engine = None
                 if ext == ".xlsb":
-                    engine = "pyxlsb"
-                data = pd.read_excel(data_path, engine=engine)
-                return data
+                    excel_engine = "pyxlsb"
+                if progress is not None:
+                    progress(0, total, 0)
+                with self.tracer.span("parse"):
+                    data = pd.read_excel(data_path, engine=excel_engine, usecols=columns)
 
             elif ext in other_formats:
                 reader_func = other_formats.get(ext)
-                data = reader_func(data_path)
+                if progress is not None:
+                    progress(0, total, 0)
+                with self.tracer.span("read"):
+                    if columns is not None and ext in projecting_formats:
+                        data = reader_func(data_path, columns=columns)
+                    else:
+                        data = reader_func(data_path)
                 if isinstance(data, list):
                     if not data:
                         raise RuntimeError("read_html returned no tables")
                     data = data[0]
-                return data
 
-            raise RuntimeError(f"Unsupported file type: {ext}")
+            else:
+                raise RuntimeError(f"Unsupported file type: {ext}")
+
+            # whole-file readers can't be interrupted mid-parse, so honour a
+            # cancel request as soon as they return
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled(data_path)
+            if columns is not None:
+                # requested order, and a plain selection for formats without pushdown
+                with self.tracer.span("select"):
+                    data = data[columns]
+            if progress is not None:
+                progress(total, total, len(data))
+            if state is not None:
+                with self.tracer.span("hash"):
+                    state.hash_prefix()
+            if cache_key is not None and columns is None:
+                # only complete frames are cached
+                with self.tracer.span("cache write"):
+                    self.cache.put(cache_key, data, data_path, variant=engine,
+                                   meta={"prefix_digest": state.prefix_digest} if state is not None else None)
+            self._remember_source(data, state)
+            return data
 
+        except LoadCancelled:
+            raise
         except FileNotFoundError:
             raise RuntimeError("File could not be found")
         except Exception as e:
             raise RuntimeError(f"An error occurred: {e}\n\n{traceback.format_exc()}")
 
+    def _remember_source(self, data: pd.DataFrame, state: Optional[FileState]):
+        # only when the file didn't change while it was read
+        if state is not None and state.same_as(FileState.capture(state.path)):
+            if state.prefix_digest is None:
+                # a cache entry from before prefix digests were stored
+                state.hash_prefix()
+            self.file_states.put(data, "source", state)
+
+    def refresh_data(self, data_path: str, data: pd.DataFrame,
+                     progress: Optional[ProgressCallback] = None,
+                     cancel: Optional[threading.Event] = None) -> Tuple[pd.DataFrame, str]:
+        # data: what get_data(data_path) returned earlier. Returns (frame, change):
+        #   "unchanged"  data itself
+        #   "appended"   data plus the rows appended to the file since, parsed from the
+        #                old end on; data's normalized keys, key indexes and sketches
+        #                are extended to the new frame instead of rebuilt
+        #   "reloaded"   the file changed otherwise (or wasn't a full text load)
+        state = self.file_states.get(data, "source")
+        change = state.change() if state is not None else "rewritten"
+        if change == "unchanged":
+            return data, change
+        if change == "appended":
+            new_state = FileState.capture(data_path, prefix=True)
+            if not new_state.ends_with_newline:
+                # the last line is still being written, it waits for the next refresh
+                return data, "unchanged"
+            with self.tracer.span("refresh", path=data_path, rows=len(data)):
+                with self.tracer.span("parse"):
+                    tail = read_appended(state, data, new_state.size)
+                grown = pd.concat([data, tail], ignore_index=True)
+                with self.tracer.span("extend keys"):
+                    self._extend_keys(data, grown, len(data))
+            self.file_states.put(grown, "source", new_state)
+            if progress is not None:
+                progress(new_state.size, new_state.size, len(grown))
+            return grown, "appended"
+        return self.get_data(data_path, progress, cancel), "reloaded"
+
+    def _extend_keys(self, data: pd.DataFrame, grown: pd.DataFrame, start: int):
+        self.key_normalizer.extend(data, grown, start)
+        for (cols, spec), index in self.key_indexes.entries(data):
+            try:
+                self.key_indexes.put(grown, (cols, spec),
+                                     index.extended(self.key_normalizer.frame(grown, cols, spec), cols, start))
+            except HashCollision:
+                pass
+        for (cols, spec), sketch in self.key_sketches.entries(data):
+            keys = self.key_normalizer.frame(grown, cols, spec).iloc[start:]
+            self.key_sketches.put(grown, (cols, spec), sketch.extended(key_hashes(keys, list(cols))))
+
+    def key_index(self, data: pd.DataFrame, cols: Sequence[str], spec: Tuple[str, ...]) -> SideIndex:
+        index = self.key_indexes.get(data, (tuple(cols), spec))
+        if index is None:
+            with self.tracer.span("key index"):
+                index = SideIndex.build(self.key_normalizer.frame(data, cols, spec), cols)
+            self.key_indexes.put(data, (tuple(cols), spec), index)
+        return index
+
+    def open_projected(self, data_path: str, columns: Sequence[str], **kwargs) -> ProjectedFrame:
+        # loads only columns now, the rest of the schema stays on disk until used
+        def load(cols: List[str]) -> pd.DataFrame:
+            return self.get_data(data_path, columns=cols, **kwargs)
+        return ProjectedFrame(self.get_schema(data_path), load, columns)
+
+    def compare_files(self, path_1: str, path_2: str,
+                      columns_1: Union[str, Sequence[str]],
+                      columns_2: Union[str, Sequence[str]],
+                      *, keep_cols_1: Optional[Sequence[str]] = None,
+                      keep_cols_2: Optional[Sequence[str]] = None,
+                      **compare_kwargs) -> Mapping[str, pd.DataFrame]:
+        # compare_columns straight from two files, parsing only the key columns and
+        # keep_cols. Without keep_cols every column is loaded, as compare_columns would
+        cols_1 = [columns_1] if isinstance(columns_1, str) else list(columns_1)
+        cols_2 = [columns_2] if isinstance(columns_2, str) else list(columns_2)
+        schema_1 = self.get_schema(path_1)
+        schema_2 = self.get_schema(path_2)
+        missing_1 = [c for c in cols_1 if c not in schema_1]
+        missing_2 = [c for c in cols_2 if c not in schema_2]
+        if missing_1 or missing_2:
+            raise KeyError(f"Missing columns. A-side: {missing_1} || B-side: {missing_2}")
+
+        need_1 = [*cols_1, *keep_cols_1] if keep_cols_1 is not None else schema_1
+        need_2 = [*cols_2, *keep_cols_2] if keep_cols_2 is not None else schema_2
+        data_1 = self.get_data(path_1, columns=list(dict.fromkeys(need_1)))
+        data_2 = self.get_data(path_2, columns=list(dict.fromkeys(need_2)))
+        return self.compare_columns(data_1, data_2, cols_1, cols_2,
+                                    keep_cols_1=keep_cols_1,
+                                    keep_cols_2=keep_cols_2,
+                                    **compare_kwargs)
+
     def compare_columns(self, data_1: pd.DataFrame, data_2: pd.DataFrame,
                         columns_1: str|List, columns_2: str|List,
                         *, suffixes: Tuple[str, str] = ("_A", "_B"),
                         keep_cols_1: Optional[Sequence[str]] = None,
                         keep_cols_2: Optional[Sequence[str]] = None,
                         validate: Optional[str] = None,
-                        normalize_str: bool = False) -> Dict[str, pd.DataFrame]:
+                        normalize_str: NormalizeSpec = False,
+                        engine: str = "merge",
+                        memory_budget: Optional[int] = None,
+                        spill_dir: Optional[str] = None,
+                        workers: Optional[int] = None,
+                        fuzzy: Union[bool, Mapping, None] = None) -> Mapping[str, pd.DataFrame]:
+        # fuzzy: True or fuzzy_match.fuzzy_pairs options (threshold, max_candidates,
+        # top_n, q, max_gram_keys, max_postings) to add a "fuzzy" frame of near-miss matches
+        # between the left_only and right_only rows
+
+        with self.tracer.span("compare_columns", engine=engine, rows_1=len(data_1), rows_2=len(data_2)):
+            result = self._compare_columns(data_1, data_2, columns_1, columns_2,
+                                           suffixes=suffixes,
+                                           keep_cols_1=keep_cols_1,
+                                           keep_cols_2=keep_cols_2,
+                                           validate=validate,
+                                           normalize_str=normalize_str,
+                                           engine=engine,
+                                           memory_budget=memory_budget,
+                                           spill_dir=spill_dir,
+                                           workers=workers)
+            if fuzzy is None or fuzzy is False:
+                return result
+            with self.tracer.span("fuzzy"):
+                return self._fuzzy_result(result, data_1, data_2, columns_1, columns_2,
+                                          suffixes=suffixes,
+                                          keep_cols_1=keep_cols_1,
+                                          keep_cols_2=keep_cols_2,
+                                          normalize_str=normalize_str,
+                                          options={} if fuzzy is True else dict(fuzzy))
+
+    def _fuzzy_result(self, result: Mapping, data_1: pd.DataFrame, data_2: pd.DataFrame,
+                      columns_1: str|List, columns_2: str|List,
+                      *, suffixes: Tuple[str, str],
+                      keep_cols_1: Optional[Sequence[str]],
+                      keep_cols_2: Optional[Sequence[str]],
+                      normalize_str: NormalizeSpec,
+                      options: Dict) -> FuzzyResult:
+        unknown = set(options) - {"threshold", "max_candidates", "top_n", "q", "max_gram_keys", "max_postings"}
+        if unknown:
+            raise ValueError(f"Unknown fuzzy options: {sorted(unknown)}")
+        cols_1 = [columns_1] if isinstance(columns_1, str) else list(columns_1)
+        cols_2 = [columns_2] if isinstance(columns_2, str) else list(columns_2)
+        # the frames the compare ran on (cached), so rows show up as in the other results
+        spec = normalize_spec(normalize_str)
+        df1 = self.key_normalizer.frame(data_1, cols_1, spec)
+        df2 = self.key_normalizer.frame(data_2, cols_2, spec)
+        if keep_cols_1 is not None:
+            df1 = df1[list(dict.fromkeys([*cols_1, *keep_cols_1]))]
+        if keep_cols_2 is not None:
+            df2 = df2[list(dict.fromkeys([*cols_2, *keep_cols_2]))]
+        with self.tracer.span("unmatched"):
+            rows_1, rows_2 = unmatched_rows(df1, df2, cols_1, cols_2, result)
+        with self.tracer.span("match", rows_1=len(rows_1), rows_2=len(rows_2)):
+            pairs = fuzzy_rows(df1, df2, cols_1, cols_2, rows_1, rows_2, **options)
+        return FuzzyResult(result, fuzzy_frame(df1, df2, pairs, suffixes))
+
+    def _compare_columns(self, data_1: pd.DataFrame, data_2: pd.DataFrame,
+                         columns_1: str|List, columns_2: str|List,
+                         *, suffixes: Tuple[str, str],
+                         keep_cols_1: Optional[Sequence[str]],
+                         keep_cols_2: Optional[Sequence[str]],
+                         validate: Optional[str],
+                         normalize_str: NormalizeSpec,
+                         engine: str,
+                         memory_budget: Optional[int],
+                         spill_dir: Optional[str],
+                         workers: Optional[int]) -> Mapping[str, pd.DataFrame]:
+        if engine not in self.compare_engines:
+            raise ValueError(f"Unknown compare engine: {engine}. Expected one of {self.compare_engines}")
 
         if isinstance(columns_1, str):
             cols_1 = [columns_1]
@@ -100,18 +567,11 @@ class DataService():
         if missing_1 or missing_2:
             raise KeyError(f"Missing columns. A-side: {missing_1} || B-side: {missing_2}")
 
-        if normalize_str:
-            df1 = data_1.copy()
-            df2 = data_2.copy()
-            for c in cols_1:
-                if pd.api.types.is_string_dtype(df1[c]):
-                    df1[c] = df1[c].astype("string").str.strip().str.lower()
-            for c in cols_2:
-                if pd.api.types.is_string_dtype(df2[c]):
-                    df2[c] = df2[c].astype("string").str.strip().str.lower()
-        else:
-            df1 = data_1
-            df2 = data_2
+        # normalized copies of the key columns only, cached across compares
+        spec = normalize_spec(normalize_str)
+        with self.tracer.span("normalize"):
+            df1 = self.key_normalizer.frame(data_1, cols_1, spec)
+            df2 = self.key_normalizer.frame(data_2, cols_2, spec)
 
         if keep_cols_1 is not None:
             keep_1 = list(dict.fromkeys([*cols_1, *keep_cols_1]))
@@ -120,17 +580,53 @@ class DataService():
             keep_2 = list(dict.fromkeys([*cols_2, *keep_cols_2]))
             df2 = df2[keep_2]
 
-        merged_df = pd.merge(df1, df2,
-                             left_on=cols_1,
-                             right_on=cols_2,
-                             how="outer",
-                             suffixes=suffixes,
-                             indicator=True,
-                             validate=validate
-                             )
-        matches = merged_df[merged_df["_merge"] == "both"].copy()
-        left_only = merged_df[merged_df["_merge"] == "left_only"].copy()
-        right_only = merged_df[merged_df["_merge"] == "right_only"].copy()
+        if engine in ("partitioned", "parallel"):
+            # hash-partitions both sides to disk and merges one partition at a time,
+            # in a process pool for the parallel engine
+            if engine == "parallel":
+                workers = workers or os.cpu_count() or 1
+            with self.tracer.span("merge"):
+                return partitioned_compare(df1, df2, cols_1, cols_2,
+                                           suffixes=suffixes,
+                                           validate=validate,
+                                           memory_budget=memory_budget or self.compare_memory_budget,
+                                           spill_dir=spill_dir,
+                                           workers=workers or 1)
+
+        if engine == "factorize":
+            # shared integer codes per key, key dtypes aligned across the sides
+            with self.tracer.span("key"):
+                return factorized_compare(df1, df2, cols_1, cols_2,
+                                          suffixes=suffixes,
+                                          validate=validate)
+
+        if engine == "index":
+            # key membership only; the result frames are built on first access
+            try:
+                # each side's key index is cached per loaded frame, so replacing one
+                # side only indexes the new frame
+                indexes = (self.key_index(data_1, cols_1, spec), self.key_index(data_2, cols_2, spec))
+                with self.tracer.span("key"):
+                    return index_compare(df1, df2, cols_1, cols_2,
+                                         suffixes=suffixes,
+                                         validate=validate,
+                                         indexes=indexes)
+            except HashCollision:
+                pass
+
+        with self.tracer.span("merge"):
+            merged_df = pd.merge(df1, df2,
+                                 left_on=cols_1,
+                                 right_on=cols_2,
+                                 how="outer",
+                                 suffixes=suffixes,
+                                 indicator=True,
+                                 validate=validate
+                                 )
+        with self.tracer.span("split"):
+            matches = merged_df[merged_df["_merge"] == "both"].copy()
+            left_only = merged_df[merged_df["_merge"] == "left_only"].copy()
+            right_only = merged_df[merged_df["_merge"] == "right_only"].copy()
 
         return {
             "merged": merged_df,
@@ -139,19 +635,83 @@ class DataService():
             "right_only": right_only
         }
 
+    def estimate_columns(self, data_1: pd.DataFrame, data_2: pd.DataFrame,
+                         columns_1: str|List, columns_2: str|List,
+                         *, normalize_str: NormalizeSpec = False) -> Dict:
+        # Approximate counts of what compare_columns would return (see key_sketch),
+        # duplicate warnings and a suggested validate=; each side's key sketch is
+        # cached, so re-estimating against another dataset only sketches that one
+        cols_1 = [columns_1] if isinstance(columns_1, str) else list(columns_1)
+        cols_2 = [columns_2] if isinstance(columns_2, str) else list(columns_2)
+        if len(cols_1) != len(cols_2):
+            raise ValueError("Columns_1 and Columns_2 must have the same number of keys")
+        missing_1 = [c for c in cols_1 if c not in data_1.columns]
+        missing_2 = [c for c in cols_2 if c not in data_2.columns]
+        if missing_1 or missing_2:
+            raise KeyError(f"Missing columns. A-side: {missing_1} || B-side: {missing_2}")
+
+        spec = normalize_spec(normalize_str)
+        with self.tracer.span("estimate_columns", rows_1=len(data_1), rows_2=len(data_2)):
+            sketches = []
+            for df, cols in ((data_1, cols_1), (data_2, cols_2)):
+                sketch = self.key_sketches.get(df, (tuple(cols), spec))
+                if sketch is None:
+                    with self.tracer.span("sketch"):
+                        sketch = KeySketch.from_frame(self.key_normalizer.frame(df, cols, spec), cols)
+                    self.key_sketches.put(df, (tuple(cols), spec), sketch)
+                sketches.append(sketch)
+            return estimate_overlap(*sketches)
+
+    def diff_values(self, matches: pd.DataFrame,
+                    *, suffixes: Tuple[str, str] = ("_A", "_B"),
+                    columns: Optional[Sequence[str]] = None,
+                    atol: float = 0.0,
+                    rtol: float = 0.0,
+                    nan_equal: bool = True,
+                    normalize_str: bool = False) -> Dict[str, Union[pd.DataFrame, pd.Series]]:
+        # cell level diff of the non-key columns of compare_columns(...)["matches"]
+        return value_diff(matches, suffixes,
+                          columns=columns,
+                          atol=atol,
+                          rtol=rtol,
+                          nan_equal=nan_equal,
+                          normalize_str=normalize_str)
+
+    def export(self, data, path: str, key: Optional[str] = None,
+               progress: Optional[ExportProgress] = None,
+               cancel: Optional[threading.Event] = None) -> int:
+        # Writes a DataFrame, a result window or compare_columns(...)[key] to path in
+        # chunks (format from the extension); raises ExportCancelled when cancelled
+        with self.tracer.span("export", path=path, result=key):
+            return export_frame(data, path, key, chunk_rows=self.export_chunk_rows,
+                                progress=progress, cancel=cancel)
+
+    def transform(self, data: pd.DataFrame, rules) -> pd.DataFrame:
+        # applies rules (see transform.compile_rule) and returns the new frame;
+        # data is left as it was and shares every unchanged column with it
+        with self.tracer.span("transform", rows=len(data)):
+            return apply_rules(data, rules).frame
+
+    def transformer(self, data: pd.DataFrame) -> Transformer:
+        # data with an undo/redo history of transforms
+        return Transformer(data, tracer=self.tracer)
+
 if __name__ == "__main__":
-    def get_testdata(file):
-        return os.path.join('..', "resources", file)
-
-    datacomp = DataService("")
-    data = datacomp.get_data(get_testdata('dataset_a.csv'))
-    # print(data.head(10))
-    data2 = datacomp.get_data(get_testdata('dataset_b.xlsx'))
-    # print(data2.head(10))
-    res = datacomp.compare_columns(data, data2,
-                                   "id", "client_id")
-    print(f"Matches\n{res["matches"]}\n-----\n")
-    print(f"Left Only\n{res["left_only"]}\n-----\n")
-    print(f"Right Only\n{res["right_only"]}\n-----\n")
-    print(f"Merged\n{res["merged"]}\n-----\n")
-    print(f"Describe\n{res["matches"].describe()}\n-----\n")
+    # python -m back_end.data_service [file A] [file B] [key A] [key B]
+    # Without arguments two small in-memory datasets are compared; the benchmark
+    # suite lives in benchmarks/bench_suite.py.
+    import sys
+
+    datacomp = DataService()
+    if len(sys.argv) == 5:
+        data = datacomp.get_data(sys.argv[1])
+        data2 = datacomp.get_data(sys.argv[2])
+        key_1, key_2 = sys.argv[3], sys.argv[4]
+    else:
+        data = pd.DataFrame({"id": [1, 2, 3, 4], "name": ["a", "b", "c", "d"]})
+        data2 = pd.DataFrame({"client_id": [3, 4, 5], "name": ["c", "D", "e"]})
+        key_1, key_2 = "id", "client_id"
+    res = datacomp.compare_columns(data, data2, key_1, key_2)
+    for key in ("matches", "left_only", "right_only", "merged"):
+        print(f"{key}\n{res[key]}\n-----\n")
+    print(f"Describe\n{res['matches'].describe()}\n-----\n")
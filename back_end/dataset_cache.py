@@ -0,0 +1,229 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence
+from .frame_io import write_frame, read_frame
+
+SAMPLE_BYTES = 64 * 1024
+SAMPLE_COUNT = 16
+# a lock file older than this was left by a process that died holding it
+STALE_LOCK_SECONDS = 60.0
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "datacomp")
+
+
+def content_hash(path: str, size: int) -> str:
+    # Sampled hash: the head, the tail and evenly spaced blocks in between. Combined
+    # with size and mtime this catches in-place edits without reading a multi-GB file.
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        if size <= SAMPLE_BYTES * (SAMPLE_COUNT + 2):
+            h.update(f.read(size))
+        else:
+            step = (size - SAMPLE_BYTES) // (SAMPLE_COUNT + 1)
+            for i in range(SAMPLE_COUNT + 2):
+                f.seek(min(i * step, size - SAMPLE_BYTES))
+                h.update(f.read(SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+class CacheLockTimeout(Exception):
+    pass
+
+
+class _FileLock:
+    # Lock shared by every process using the cache directory: held by whoever
+    # creates the lock file.
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - os.path.getmtime(self.path) > STALE_LOCK_SECONDS:
+                    os.remove(self.path)
+                    continue
+            except OSError:
+                # released meanwhile
+                continue
+            if time.monotonic() > deadline:
+                raise CacheLockTimeout(f"Timed out waiting for the cache lock {self.path}")
+            time.sleep(0.01)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class DatasetCache:
+    # On-disk cache of parsed DataFrames stored as Arrow IPC (Feather), keyed on the
+    # source file's path, size, mtime and content hash. Least recently used entries
+    # are evicted once the cache grows past max_bytes. Several processes can share
+    # the directory: files are written under a temporary name and renamed into
+    # place, and the index is read, changed and written back under a lock file.
+    index_name = "index.json"
+    lock_name = "index.lock"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 10 << 30,
+                 min_source_bytes: int = 1 << 20):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.min_source_bytes = min_source_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index: Dict[str, dict] = {}
+        try:
+            # loads the index (dropping stale entries)
+            with self._locked():
+                pass
+        except CacheLockTimeout:
+            pass
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.index_name)
+
+    @contextmanager
+    def _locked(self):
+        # the index as on disk, written back when the block completes
+        with self._lock, _FileLock(os.path.join(self.cache_dir, self.lock_name)):
+            self._index = self._read_index()
+            # entries of older versions that weren't Feather (pickles) are dropped
+            for key in [k for k, e in self._index.items() if not e["file"].endswith(".feather")]:
+                self._drop(key)
+            yield
+            self._write_index()
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        tmp = f"{self._index_path()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path())
+
+    def key_for(self, data_path: str, variant: str = "") -> Optional[str]:
+        # variant separates parses of the same file that differ, e.g. by load engine
+        path = os.path.abspath(data_path)
+        st = os.stat(path)
+        if st.st_size < self.min_source_bytes:
+            return None
+        ident = f"{path}|{st.st_size}|{st.st_mtime_ns}|{content_hash(path, st.st_size)}|{variant}"
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, arrow_dtypes: bool = False,
+            columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        # the file is read outside the lock; one evicted meanwhile fails to read
+        try:
+            with self._locked():
+                entry = self._index.get(key)
+                if entry is None:
+                    return None
+                entry["last_used"] = time.time()
+            return read_frame(os.path.join(self.cache_dir, entry["file"]), arrow_dtypes, columns)
+        except CacheLockTimeout:
+            return None
+        except Exception:
+            try:
+                with self._locked():
+                    self._drop(key)
+            except CacheLockTimeout:
+                pass
+            return None
+
+    def meta(self, key: str) -> dict:
+        # what put stored with the entry, {} when there's no such entry
+        try:
+            with self._locked():
+                return dict(self._index.get(key, {}).get("meta", {}))
+        except CacheLockTimeout:
+            return {}
+
+    def put(self, key: str, df: pd.DataFrame, source_path: str, variant: str = "",
+            meta: Optional[dict] = None):
+        # meta: JSON-able facts about the source kept with the entry, see meta()
+        # the (slow) write happens outside the lock, to a temporary name; the file is
+        # renamed into place and published in the index under the lock
+        base = os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp = write_frame(df, base, "feather")
+        except Exception:
+            # a full disk or a frame Arrow can't hold just means no cache entry
+            try:
+                os.remove(base + ".feather")
+            except OSError:
+                pass
+            return
+        nbytes = os.path.getsize(tmp)
+        if nbytes > self.max_bytes:
+            os.remove(tmp)
+            return
+        source = os.path.abspath(source_path)
+        file = os.path.join(self.cache_dir, key + ".feather")
+        try:
+            self._publish(key, tmp, file, nbytes, source, variant, meta or {})
+        except CacheLockTimeout:
+            os.remove(tmp)
+
+    def _publish(self, key: str, tmp: str, file: str, nbytes: int, source: str, variant: str, meta: dict):
+        with self._locked():
+            os.replace(tmp, file)
+            # an older parse of the same file can never be hit again
+            for old in [k for k, e in self._index.items()
+                        if e["source"] == source and e.get("variant") == variant and k != key]:
+                self._drop(old)
+            self._index[key] = {
+                "file": os.path.basename(file),
+                "bytes": nbytes,
+                "last_used": time.time(),
+                "source": source,
+                "variant": variant,
+                "meta": meta
+            }
+            self._evict()
+
+    def _drop(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _evict(self):
+        total = sum(e["bytes"] for e in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]["bytes"]
+            self._drop(key)
+
+    def clear(self):
+        with self._locked():
+            for key in list(self._index):
+                self._drop(key)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(e["bytes"] for e in self._index.values())
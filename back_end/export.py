@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+import os
+from typing import Callable, Iterator, Optional
+
+# Chunked export of loaded frames and compare results. Rows are streamed from the
+# source a chunk at a time: DataFrames are sliced (no copies), lazy compare
+# results are read through their windows, so nothing is concatenated or built whole.
+
+# extension -> (format, CSV separator)
+EXPORT_EXTENSIONS = {
+    ".csv": ("csv", ","), ".txt": ("csv", ","), ".tsv": ("csv", "\t"),
+    ".parquet": ("parquet", None), ".feather": ("feather", None), ".arrow": ("feather", None),
+    ".xlsx": ("excel", None),
+}
+# format -> extension it is written with
+FORMAT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "excel": ".xlsx"}
+EXPORT_FORMATS = tuple(FORMAT_EXTENSIONS)
+# rows per sheet including the header; longer exports continue on "<sheet> (2)", ...
+EXCEL_MAX_ROWS = 1_048_576
+
+# progress(rows_written, total_rows)
+ExportProgress = Callable[[int, int], None]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Can't export to {ext or 'a file without extension'}. "
+                         f"Expected one of {sorted(EXPORT_EXTENSIONS)}")
+    return EXPORT_EXTENSIONS[ext][0]
+
+
+def export_source(data, key: Optional[str] = None):
+    # A DataFrame or windowed source (columns, len(), rows()), or one frame of a
+    # compare_columns result. Lazy results hand out their window so the frame is
+    # never built.
+    if isinstance(data, pd.DataFrame) or hasattr(data, "rows"):
+        return data
+    if key is None:
+        raise ValueError("A result key (e.g. \"left_only\") is needed to export a compare result")
+    return data.window(key) if hasattr(data, "window") else data[key]
+
+
+def iter_chunks(source, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(source), chunk_rows):
+        stop = min(start + chunk_rows, len(source))
+        if isinstance(source, pd.DataFrame):
+            yield source.iloc[start:stop]
+        else:
+            yield source.rows(np.arange(start, stop))
+
+
+def _reference_dtypes(source) -> Optional[pd.Series]:
+    # The dtypes of the whole export. Segments of a result window (e.g. matches vs
+    # left_only rows of "merged") can come out with different dtypes on their own.
+    if isinstance(source, pd.DataFrame):
+        return source.dtypes
+    if hasattr(source, "sample"):
+        return source.sample().dtypes
+    return None
+
+
+def _conform(chunk: pd.DataFrame, dtypes: Optional[pd.Series]) -> pd.DataFrame:
+    if dtypes is None:
+        return chunk
+    changed = {c: dtypes[c] for c in chunk.columns if chunk[c].dtype != dtypes[c]}
+    return chunk.astype(changed) if changed else chunk
+
+
+class _Export:
+    # Runs one export: chunks, progress, cancel. The file is written next to the
+    # target and only moved into place once complete, so a cancelled or failed
+    # export never leaves a half-written file behind (or clobbers the old one).
+    def __init__(self, source, path: str, chunk_rows: int,
+                 progress: Optional[ExportProgress], cancel):
+        self.source = source
+        self.path = path
+        self.tmp_path = f"{path}.part"
+        self.chunk_rows = chunk_rows
+        self.progress = progress
+        self.cancel = cancel
+        self.total = len(source)
+        self.rows = 0
+        self._dtypes = _reference_dtypes(source)
+
+    def chunks(self) -> Iterator[pd.DataFrame]:
+        for chunk in iter_chunks(self.source, self.chunk_rows):
+            if self.cancel is not None and self.cancel.is_set():
+                raise ExportCancelled(self.path)
+            yield _conform(chunk, self._dtypes)
+
+    def wrote(self, n: int):
+        self.rows += n
+        if self.progress is not None:
+            self.progress(self.rows, self.total)
+
+    def empty(self) -> pd.DataFrame:
+        if isinstance(self.source, pd.DataFrame):
+            return self.source.iloc[:0]
+        return _conform(self.source.rows(np.empty(0, dtype=np.int64)), self._dtypes)
+
+    def run(self, write: Callable[["_Export"], None]) -> int:
+        try:
+            write(self)
+            os.replace(self.tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+            raise
+        return self.rows
+
+
+def _write_csv(job: _Export, sep: str):
+    with open(job.tmp_path, "w", encoding="utf-8", newline="") as f:
+        header = True
+        for chunk in job.chunks():
+            chunk.to_csv(f, sep=sep, index=False, header=header)
+            header = False
+            job.wrote(len(chunk))
+        if header:
+            job.empty().to_csv(f, sep=sep, index=False)
+
+
+def _source_column(source, pos: int) -> pd.Series:
+    if isinstance(source, pd.DataFrame):
+        return source.iloc[:, pos]
+    return source.column(pos)
+
+
+def _arrow_schema(job: _Export, table):
+    # The first chunk's types, except for columns that are all-null in it (typed
+    # null): those get the type of the whole column's non-null values, text when
+    # the column has none
+    import pyarrow as pa
+
+    fields = []
+    for pos, f in enumerate(table.schema):
+        if pa.types.is_null(f.type):
+            col = _conform(_source_column(job.source, pos).to_frame(), job._dtypes).iloc[:, 0]
+            present = np.flatnonzero(col.notna().to_numpy())
+            values = pa.Array.from_pandas(col.iloc[present]) if len(present) else None
+            f = pa.field(f.name, pa.string() if values is None or pa.types.is_null(values.type)
+                         else values.type)
+        fields.append(f)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def _write_arrow(job: _Export, fmt: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    schema = None
+    try:
+        for chunk in job.chunks():
+            if writer is None:
+                schema = _arrow_schema(job, pa.Table.from_pandas(chunk, preserve_index=False))
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(job.tmp_path, schema)
+                else:
+                    # Feather v2 is the Arrow IPC file format
+                    writer = pa.ipc.new_file(job.tmp_path, schema)
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table)
+            job.wrote(len(chunk))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        empty = job.empty()
+        if fmt == "parquet":
+            empty.to_parquet(job.tmp_path, index=False)
+        else:
+            empty.reset_index(drop=True).to_feather(job.tmp_path)
+
+
+def _excel_values(chunk: pd.DataFrame) -> Iterator[tuple]:
+    # openpyxl takes Python scalars and naive datetimes, None for empty cells
+    cols = {}
+    for name, col in chunk.items():
+        if isinstance(col.dtype, pd.DatetimeTZDtype):
+            col = col.dt.tz_localize(None)
+        cols[name] = col.astype(object).where(col.notna(), None)
+    return zip(*cols.values()) if cols else iter(())
+
+
+def _write_excel(job: _Export, sheet_name: str):
+    from openpyxl import Workbook
+
+    # write-only workbooks stream rows to disk instead of keeping a cell tree
+    wb = Workbook(write_only=True)
+    header = [str(c) for c in job.source.columns]
+    sheets = 0
+    ws = None
+    sheet_rows = EXCEL_MAX_ROWS
+
+    for chunk in job.chunks():
+        for row in _excel_values(chunk):
+            if sheet_rows >= EXCEL_MAX_ROWS:
+                sheets += 1
+                ws = wb.create_sheet(sheet_name if sheets == 1 else f"{sheet_name[:25]} ({sheets})")
+                ws.append(header)
+                sheet_rows = 1
+            ws.append(row)
+            sheet_rows += 1
+        job.wrote(len(chunk))
+    if ws is None:
+        wb.create_sheet(sheet_name).append(header)
+    wb.save(job.tmp_path)
+
+
+def export_frame(data, path: str, key: Optional[str] = None, *,
+                 chunk_rows: int = 100_000,
+                 progress: Optional[ExportProgress] = None,
+                 cancel=None,
+                 sheet_name: str = "Sheet1") -> int:
+    # Writes a DataFrame or result[key] of a compare_columns result to path, in the
+    # format its extension names. cancel: anything with is_set() (threading.Event);
+    # returns the number of rows written.
+    fmt = export_format(path)
+    sep = EXPORT_EXTENSIONS[os.path.splitext(path)[1].lower()][1]
+    job = _Export(export_source(data, key), path, chunk_rows, progress, cancel)
+    if fmt == "csv":
+        return job.run(lambda j: _write_csv(j, sep))
+    if fmt == "excel":
+        return job.run(lambda j: _write_excel(j, sheet_name))
+    return job.run(lambda j: _write_arrow(j, fmt))
+
@@ -0,0 +1,151 @@
+import pandas as pd
+import numpy as np
+from typing import Optional, Sequence, Tuple
+from .index_compare import IndexCompareResult, MergeLayout, check_validate
+
+INT64_LIMIT = 1 << 63
+
+
+def _kind(s: pd.Series) -> str:
+    # "int", "float", "datetime", "timedelta", "bool" or "text" (anything else)
+    if pd.api.types.is_bool_dtype(s):
+        return "bool"
+    if pd.api.types.is_integer_dtype(s):
+        return "int"
+    if pd.api.types.is_float_dtype(s):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return "datetime"
+    if pd.api.types.is_timedelta64_dtype(s):
+        return "timedelta"
+    return "text"
+
+
+def _plain(s: pd.Series) -> pd.Series:
+    # categoricals and object columns holding only numbers act as their values
+    if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object:
+        return s.astype(object).infer_objects()
+    return s
+
+
+def _parse_numbers(s: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    # (mask of non-null values that parse as numbers, parsed values for that mask);
+    # parsed again on the subset so all-int strings stay exact int64
+    mask = (pd.to_numeric(s, errors="coerce").notna() & s.notna()).to_numpy()
+    return mask, pd.to_numeric(s[mask])
+
+
+def _numbers(s: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    # (values, null mask); ints stay exact (a 0 where null), so ids past 2**53
+    # don't collapse into one float
+    null = s.isna().to_numpy()
+    if _kind(s) == "int":
+        dtype = np.uint64 if pd.api.types.is_unsigned_integer_dtype(s) else np.int64
+        return s.to_numpy(dtype=dtype, na_value=0), null
+    return s.to_numpy(dtype=np.float64, na_value=np.nan), null
+
+
+def _factorize_numbers(parts: Sequence[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, int]:
+    # codes over the concatenated (values, null mask) parts, nulls sharing one
+    # code; compared as ints when every part with values is the same int dtype,
+    # else as floats
+    dtypes = {v.dtype for v, m in parts if not m.all()}
+    exact = len(dtypes) <= 1 and all(d.kind in "iu" for d in dtypes)
+    dtype = dtypes.pop() if exact and dtypes else np.float64
+    values = np.concatenate([v.astype(dtype, copy=False) for v, _ in parts])
+    null = np.concatenate([m for _, m in parts])
+    codes = np.empty(len(values), dtype=np.int64)
+    found, uniques = pd.factorize(values[~null])
+    codes[~null] = found
+    codes[null] = len(uniques)
+    return codes, len(uniques) + int(null.any())
+
+
+def align_codes(s1: pd.Series, s2: pd.Series) -> Tuple[np.ndarray, np.ndarray, int]:
+    # Shared codes for one key column pair: equal keys get equal codes on both
+    # sides, nulls match nulls as in pd.merge. Numbers stored as text on one side
+    # ("42", " 007") match the numbers on the other side; text that isn't a number
+    # can't match a numeric key and gets codes of its own.
+    s1, s2 = _plain(s1), _plain(s2)
+    k1, k2 = _kind(s1), _kind(s2)
+    numeric = ("int", "float")
+    n1 = len(s1)
+
+    if k1 == k2 and k1 not in ("text", "int", "float"):
+        values = np.concatenate([s1.to_numpy(), s2.to_numpy()])
+    elif k1 in numeric and k2 in numeric:
+        codes, n_codes = _factorize_numbers([_numbers(s1), _numbers(s2)])
+        return codes[:n1], codes[n1:], n_codes
+    elif k1 == k2 == "text":
+        values = np.concatenate([s1.to_numpy(dtype=object), s2.to_numpy(dtype=object)])
+    elif {k1, k2} <= {"int", "float", "text"}:
+        num, text = (s1, s2) if k1 in numeric else (s2, s1)
+        mask, parsed = _parse_numbers(text)
+        null = text.isna().to_numpy()
+        # numbers and nulls of the text side share the numeric side's code space
+        shared = mask | null
+        parsed_values, _ = _numbers(parsed)
+        shared_values = np.zeros(int(shared.sum()), dtype=parsed_values.dtype)
+        shared_values[mask[shared]] = parsed_values
+        codes, n_codes = _factorize_numbers([_numbers(num), (shared_values, null[shared])])
+        num_codes = codes[:len(num)]
+        text_codes = np.empty(len(text), dtype=np.int64)
+        text_codes[shared] = codes[len(num):]
+        # text that isn't a number gets codes past the numeric ones
+        other = ~shared
+        if other.any():
+            extra, extra_uniques = pd.factorize(text.to_numpy(dtype=object)[other])
+            text_codes[other] = n_codes + extra
+            n_codes += len(extra_uniques)
+        return (num_codes, text_codes, n_codes) if k1 in numeric else (text_codes, num_codes, n_codes)
+    else:
+        raise ValueError(f"Can't match {s1.dtype} keys ({s1.name!r}) with {s2.dtype} keys ({s2.name!r})")
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return codes[:n1], codes[n1:], len(uniques)
+
+
+class FactorizedKeys:
+    # Shared integer code per distinct (multi-column) key across both sides. Each
+    # key column is factorized once over both sides, then the columns' codes are
+    # packed into one int64 (mixed radix), re-factorizing only if the product of
+    # the columns' cardinalities would overflow. Same interface as KeyCodes.
+    def __init__(self, df1: pd.DataFrame, df2: pd.DataFrame,
+                 cols_1: Sequence[str], cols_2: Sequence[str]):
+        n1 = len(df1)
+        packed: Optional[np.ndarray] = None
+        card = 1
+        for c1, c2 in zip(cols_1, cols_2):
+            codes_1, codes_2, n = align_codes(df1[c1], df2[c2])
+            codes = np.concatenate([codes_1, codes_2]).astype(np.int64)
+            if packed is None:
+                packed, card = codes, n
+                continue
+            if card * n >= INT64_LIMIT:
+                packed, uniques = pd.factorize(packed)
+                card = len(uniques)
+            packed = packed * n + codes
+            card *= n
+        if packed is None:
+            raise ValueError("No key columns")
+        if card > 2 * max(len(packed), 1):
+            # sparse code space: renumber so counts can be kept in dense arrays
+            packed, uniques = pd.factorize(packed)
+            card = len(uniques)
+        self.n_codes = card
+        self.codes_1 = packed[:n1]
+        self.codes_2 = packed[n1:]
+        self.counts_1 = np.bincount(self.codes_1, minlength=self.n_codes)
+        self.counts_2 = np.bincount(self.codes_2, minlength=self.n_codes)
+
+
+def factorized_compare(df1: pd.DataFrame, df2: pd.DataFrame,
+                       cols_1: Sequence[str], cols_2: Sequence[str],
+                       *, suffixes: Tuple[str, str] = ("_A", "_B"),
+                       validate: Optional[str] = None) -> IndexCompareResult:
+    # Unlike pd.merge, keys of different dtypes are aligned instead of rejected,
+    # e.g. int64 ids on one side and the same ids as strings on the other
+    codes = FactorizedKeys(df1, df2, cols_1, cols_2)
+    check_validate(validate, codes.counts_1, codes.counts_2)
+    layout = MergeLayout(df1, df2, cols_1, cols_2, suffixes)
+    return IndexCompareResult(layout, codes)
@@ -0,0 +1,32 @@
+import pandas as pd
+from typing import Optional, Sequence
+
+# Frames stored for other processes and later runs: parse results handed back by
+# the worker processes and the dataset cache.
+
+
+def write_frame(df: pd.DataFrame, path: str, fmt: str = "parquet") -> str:
+    # fmt is "parquet" or "feather" (Arrow IPC, memory-mappable by other processes).
+    # Raises ValueError for frames Arrow can't hold, e.g. mixed-type object columns.
+    import pyarrow as pa
+
+    try:
+        if fmt == "feather":
+            df.to_feather(path + ".feather")
+            return path + ".feather"
+        df.to_parquet(path + ".parquet", index=False)
+        return path + ".parquet"
+    except (pa.ArrowException, ValueError) as e:
+        raise ValueError(f"Can't store the frame as {fmt}: {e}") from e
+
+
+def read_frame(path: str, arrow_dtypes: bool = False,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    columns = list(columns) if columns is not None else None
+    if path.endswith(".feather"):
+        from pyarrow import feather
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return table.to_pandas(types_mapper=pd.ArrowDtype) if arrow_dtypes else table.to_pandas()
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    raise ValueError(f"Not a Feather or Parquet file: {path}")
@@ -0,0 +1,308 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Mapping, Optional, Sequence, Tuple
+from .key_normalize import normalize_key
+
+# Near-miss matching of the keys an exact compare left unmatched (typos,
+# reformatted ids). All-pairs scoring is out of the question at 1M x 1M, so pairs
+# are blocked first: an inverted index from every q-gram (padded substring of q
+# characters) of B's keys to the keys holding it gives, for each of A's keys, the
+# B keys sharing grams with it. A keys only look up their rarest grams (as few as
+# can still find every B key within the threshold), the max_candidates B keys
+# sharing the most of those are scored, with an edit distance computed for all
+# candidate pairs at once.
+
+# how keys are compared: as text, Unicode/whitespace/case differences ignored
+FUZZY_NORMALIZE = ("to_str", "nfkc", "collapse_ws", "lower")
+# longer keys are compared on their first MAX_KEY_CHARS characters (the edit
+# distance keeps one 64-bit word per pair)
+MAX_KEY_CHARS = 64
+# grams held by more of B's keys than this ("the", "inc", "000") are too common
+# to block on
+MAX_GRAM_KEYS = 5_000
+# B keys an A key's grams may reach before its more common grams are skipped;
+# without it a key of common grams only ("john smith") reaches most of B
+MAX_POSTINGS = 2_000
+# A keys blocked and scored at a time, bounds the candidate arrays
+CHUNK_KEYS = 4_096
+
+_BITS = 21  # enough for any code point, plus the two padding marks
+_START = 0x110000
+_END = 0x110001
+
+
+def key_text(df: pd.DataFrame, cols: Sequence[str]) -> pd.Series:
+    # one normalized string per row (multi-column keys joined by a space), NA
+    # where any key column is null
+    parts = [normalize_key(df[c], FUZZY_NORMALIZE) for c in cols]
+    text = parts[0]
+    for p in parts[1:]:
+        text = text + " " + p
+    return text
+
+
+def _code_matrix(texts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (n, width) code points, zero past each string's end, and the lengths
+    width = max(1, min(MAX_KEY_CHARS, max((len(t) for t in texts), default=1)))
+    fixed = np.asarray(texts, dtype=f"<U{width}")
+    codes = fixed.view(np.uint32).reshape(len(texts), width)
+    return codes, np.char.str_len(fixed).astype(np.int64)
+
+
+def _grams(codes: np.ndarray, lengths: np.ndarray, q: int) -> np.ndarray:
+    # (n, positions) distinct q-grams of every string as int64, sorted per row and
+    # -1 where there is none; strings are padded with q-1 start/end marks
+    n, width = codes.shape
+    pad = q - 1
+    padded = np.zeros((n, width + 2 * pad), dtype=np.int64)
+    padded[:, :pad] = _START
+    padded[:, pad:pad + width] = codes
+    k = np.arange(width + 2 * pad)
+    end = (k >= pad + lengths[:, None]) & (k < 2 * pad + lengths[:, None])
+    padded[end] = _END
+    positions = width + pad
+    grams = np.zeros((n, positions), dtype=np.int64)
+    for t in range(q):
+        grams |= padded[:, t:t + positions] << (_BITS * (q - 1 - t))
+    grams[np.arange(positions) >= (lengths + pad)[:, None]] = -1
+    grams[lengths == 0] = -1
+    grams.sort(axis=1)
+    dup = np.zeros_like(grams, dtype=bool)
+    dup[:, 1:] = grams[:, 1:] == grams[:, :-1]
+    grams[dup] = -1
+    return grams
+
+
+def _pack_eq(a: np.ndarray, c: np.ndarray, a_valid: np.ndarray) -> np.ndarray:
+    # bit i set where a[:, i] == c (the pattern's match vector for character c)
+    bits = np.packbits((a == c[:, None]) & a_valid, axis=1, bitorder="little")
+    words = np.zeros((len(a), 8), dtype=np.uint8)
+    words[:, :bits.shape[1]] = bits
+    return words.view(np.uint64).ravel()
+
+
+def edit_similarity(a: np.ndarray, a_len: np.ndarray, b: np.ndarray, b_len: np.ndarray) -> np.ndarray:
+    # 1 - Levenshtein distance / longer length for every pair of rows of a and b
+    # (code matrices as from _code_matrix, a at most 64 wide). Myers' bit-parallel
+    # algorithm: one step per character of b, each a few ops over all pairs.
+    n = len(a_len)
+    one = np.uint64(1)
+    pv = np.full(n, ~np.uint64(0))
+    mv = np.zeros(n, dtype=np.uint64)
+    dist = a_len.copy()
+    high = one << (np.maximum(a_len, 1).astype(np.uint64) - one)
+    a_valid = np.arange(a.shape[1]) < a_len[:, None]
+    for j in range(b.shape[1]):
+        active = j < b_len
+        if not active.any():
+            break
+        eq = _pack_eq(a, b[:, j], a_valid)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        dist += active & ((ph & high) != 0)
+        dist -= active & ((mh & high) != 0)
+        ph = (ph << one) | one
+        mh = mh << one
+        pv = np.where(active, mh | ~(xv | ph), pv)
+        mv = np.where(active, ph & xv, mv)
+    # an empty pattern never sets the high bit: its distance is b's length
+    dist = np.where(a_len == 0, b_len, dist)
+    longer = np.maximum(np.maximum(a_len, b_len), 1)
+    return 1.0 - dist / longer
+
+
+class _GramIndex:
+    # B's distinct grams (sorted) with the B keys holding each
+    def __init__(self, grams: np.ndarray, max_gram_keys: int, max_postings: int):
+        ids = np.repeat(np.arange(len(grams)), grams.shape[1])
+        flat = grams.ravel()
+        keep = flat >= 0
+        ids, flat = ids[keep], flat[keep]
+        order = np.argsort(flat, kind="stable")
+        self.keys = ids[order]
+        self.grams, self.starts, self.counts = np.unique(flat[order], return_index=True, return_counts=True)
+        self.max_gram_keys = max_gram_keys
+        self.max_postings = max_postings
+        self.sizes = np.count_nonzero(grams >= 0, axis=1)
+
+    def shared(self, grams: np.ndarray, probe: np.ndarray, n_keys: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (A key, B key, probed grams they share). Every A key probes only its
+        # probe[key] rarest grams (grams B doesn't have count as rarest), and
+        # stops once they reached max_postings B keys.
+        ids = np.repeat(np.arange(len(grams)), grams.shape[1])
+        flat = grams.ravel()
+        valid = flat >= 0
+        ids, flat = ids[valid], flat[valid]
+        pos = np.minimum(np.searchsorted(self.grams, flat), max(len(self.grams) - 1, 0))
+        found = self.grams[pos] == flat if len(self.grams) else np.zeros(len(flat), dtype=bool)
+        freq = np.where(found, self.counts[pos] if len(self.grams) else 0, 0)
+        order = np.lexsort((freq, ids))
+        starts = np.flatnonzero(np.r_[True, ids[order][1:] != ids[order][:-1]]) if len(order) else order
+        group_starts = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - group_starts
+        # B keys reached by the key's rarer grams
+        reached = np.cumsum(freq[order]) - freq[order]
+        before = np.empty(len(order), dtype=np.int64)
+        before[order] = reached - reached[group_starts]
+        hit = found & (rank < probe[ids]) & (freq <= self.max_gram_keys) & ((rank == 0) | (before < self.max_postings))
+        ids, pos = ids[hit], pos[hit]
+        reps = self.counts[pos]
+        left = np.repeat(ids, reps)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(reps) - reps, reps)
+        right = self.keys[np.repeat(self.starts[pos], reps) + offsets]
+        pairs, counts = np.unique(left * np.int64(n_keys) + right, return_counts=True)
+        return pairs // n_keys, pairs % n_keys, counts
+
+
+def _top_per_key(keys: np.ndarray, order_by: np.ndarray, limit: int) -> np.ndarray:
+    # positions of the `limit` highest order_by rows of every key, ranked
+    if len(keys) and order_by.dtype.kind in "iu":
+        # one int64 sort instead of a two-key lexsort
+        top = int(order_by.max())
+        order = np.argsort(keys * np.int64(top + 1) + (top - order_by), kind="stable")
+    else:
+        order = np.lexsort((-order_by, keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[rank < limit]
+
+
+def fuzzy_pairs(text_1: np.ndarray, text_2: np.ndarray, *,
+                threshold: float = 0.8,
+                max_candidates: int = 20,
+                top_n: int = 1,
+                q: int = 3,
+                max_gram_keys: int = MAX_GRAM_KEYS,
+                max_postings: int = MAX_POSTINGS) -> pd.DataFrame:
+    # Best matches in text_2 for every string of text_1 (object arrays of str):
+    # columns key_1, key_2 (positions), score (edit similarity >= threshold) and
+    # rank (1 = best), at most top_n per key_1. max_candidates caps the text_2
+    # strings scored per text_1 string, max_postings the ones blocking looks at.
+    if not 1 <= q <= 3:
+        raise ValueError("q must be 1, 2 or 3")
+    empty = pd.DataFrame({"key_1": np.empty(0, np.int64), "key_2": np.empty(0, np.int64),
+                          "score": np.empty(0, np.float64), "rank": np.empty(0, np.int64)})
+    if len(text_1) == 0 or len(text_2) == 0:
+        return empty
+    codes_2, len_2 = _code_matrix(text_2)
+    index = _GramIndex(_grams(codes_2, len_2, q), max_gram_keys, max_postings)
+
+    found = []
+    for start in range(0, len(text_1), CHUNK_KEYS):
+        codes_1, len_1 = _code_matrix(text_1[start:start + CHUNK_KEYS])
+        grams_1 = _grams(codes_1, len_1, q)
+        # prefix filter: e edits change at most q*e grams, so of any q*e+1 grams
+        # of an A key one is still in every B key within e edits. Within the
+        # threshold, e <= (1 - t) * longer length <= (1 - t) / t * A's length.
+        edits = np.floor((1.0 - threshold) / max(threshold, 1e-9) * len_1)
+        probe = (q * edits + 1).astype(np.int64)
+        k1, k2, shared = index.shared(grams_1, probe, len(text_2))
+        if not len(k1):
+            continue
+        keep = _top_per_key(k1, shared, max_candidates)
+        k1, k2 = k1[keep], k2[keep]
+        score = edit_similarity(codes_1[k1], len_1[k1], codes_2[k2], len_2[k2])
+        ok = score >= threshold
+        k1, k2, score = k1[ok], k2[ok], score[ok]
+        best = _top_per_key(k1, score, top_n)
+        found.append(pd.DataFrame({"key_1": k1[best] + start, "key_2": k2[best], "score": score[best]}))
+    if not found:
+        return empty
+    out = pd.concat(found, ignore_index=True).sort_values(["key_1", "score"], ascending=[True, False],
+                                                          kind="stable", ignore_index=True)
+    out["rank"] = out.groupby("key_1").cumcount() + 1
+    return out
+
+
+def unmatched_rows(df1: pd.DataFrame, df2: pd.DataFrame,
+                   cols_1: Sequence[str], cols_2: Sequence[str], result=None) -> Tuple[np.ndarray, np.ndarray]:
+    # row positions of df1/df2 whose key has no exact match on the other side;
+    # taken from the result when it already knows them (index engine)
+    if hasattr(result, "left_only_index"):
+        return result.left_only_index, result.right_only_index
+    if len(cols_1) == 1:
+        keys_1, keys_2 = df1[cols_1[0]], df2[cols_2[0]]
+    else:
+        keys_1 = pd.MultiIndex.from_frame(df1[list(cols_1)])
+        keys_2 = pd.MultiIndex.from_frame(df2[list(cols_2)])
+    # null keys are skipped on purpose: they never count as an exact match here,
+    # though pd.merge pairs NaN with NaN, and fuzzy_rows never matches them either
+    in_2 = np.asarray(keys_1.isin(keys_2)) & df1[list(cols_1)].notna().all(axis=1).to_numpy()
+    in_1 = np.asarray(keys_2.isin(keys_1)) & df2[list(cols_2)].notna().all(axis=1).to_numpy()
+    return np.flatnonzero(~in_2), np.flatnonzero(~in_1)
+
+
+def _codes(text: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    codes, uniques = pd.factorize(text)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def fuzzy_rows(df1: pd.DataFrame, df2: pd.DataFrame,
+               cols_1: Sequence[str], cols_2: Sequence[str],
+               rows_1: np.ndarray, rows_2: np.ndarray, **options) -> pd.DataFrame:
+    # fuzzy_pairs over the keys of rows_1 of df1 and rows_2 of df2, as row
+    # positions (row_1, row_2) with score and rank; rows with a null key are skipped
+    codes_1, text_1 = _codes(key_text(df1.iloc[rows_1], cols_1))
+    codes_2, text_2 = _codes(key_text(df2.iloc[rows_2], cols_2))
+    pairs = fuzzy_pairs(text_1, text_2, **options)
+    side_1 = pd.DataFrame({"key_1": codes_1, "row_1": rows_1})
+    side_2 = pd.DataFrame({"key_2": codes_2, "row_2": rows_2})
+    # rows with the same key text share its matches
+    out = pairs.merge(side_1, on="key_1").merge(side_2, on="key_2")
+    out = out.sort_values(["row_1", "rank", "row_2"], kind="stable", ignore_index=True)
+    return out[["row_1", "row_2", "score", "rank"]]
+
+
+def fuzzy_frame(df1: pd.DataFrame, df2: pd.DataFrame, pairs: pd.DataFrame,
+                suffixes: Tuple[str, str] = ("_A", "_B")) -> pd.DataFrame:
+    # the A row and B row of every pair side by side (names on both sides get
+    # the suffixes), then the pair's similarity score and rank
+    left = df1.iloc[pairs["row_1"].to_numpy()].reset_index(drop=True)
+    right = df2.iloc[pairs["row_2"].to_numpy()].reset_index(drop=True)
+    left.columns = [f"{c}{suffixes[0]}" if c in df2.columns else c for c in left.columns]
+    right.columns = [f"{c}{suffixes[1]}" if c in df1.columns else c for c in right.columns]
+    out = pd.concat([left, right], axis=1)
+    out["_score"] = pairs["score"].to_numpy()
+    out["_rank"] = pairs["rank"].to_numpy()
+    return out
+
+
+class FuzzyResult(Mapping):
+    # A compare_columns result with a fourth frame, "fuzzy": the best near-miss
+    # matches between its left_only and right_only rows. Those rows stay in
+    # left_only/right_only; everything else is the wrapped result's.
+    def __init__(self, result: Mapping, fuzzy: pd.DataFrame):
+        self._result = result
+        self._fuzzy = fuzzy
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        counts = self._result.counts if hasattr(self._result, "counts") else \
+            {k: len(v) for k, v in self._result.items()}
+        return {**counts, "fuzzy": len(self._fuzzy)}
+
+    def window(self, key: str):
+        if key == "fuzzy":
+            return self._fuzzy
+        return self._result.window(key) if hasattr(self._result, "window") else self._result[key]
+
+    def __getattr__(self, name):
+        # left_only_index, match_pairs, ... of the wrapped result; _result itself
+        # is missing before __init__ (copy, unpickling) and must not recurse
+        if name == "_result":
+            raise AttributeError(name)
+        return getattr(self._result, name)
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        return self._fuzzy if key == "fuzzy" else self._result[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._result
+        yield "fuzzy"
+
+    def __len__(self) -> int:
+        return len(self._result) + 1
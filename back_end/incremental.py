@@ -0,0 +1,151 @@
+import pandas as pd
+import hashlib
+import io
+import os
+from typing import Dict, Optional, Sequence, Tuple, Union
+from .dataset_cache import content_hash
+from .key_normalize import NormalizeSpec
+
+# Picking up changes to a loaded dataset without starting over. A FileState is
+# taken when a text file is loaded; if the file later only grew (same bytes up to
+# the old size, which ended on a line break) just the appended tail is parsed.
+# See DataService.refresh_data and IncrementalCompare.
+
+APPENDABLE_FORMATS = ('.csv', '.txt', '.tsv')
+HASH_BLOCK = 16 << 20
+
+
+def prefix_hash(path: str, size: int) -> str:
+    # hash of every byte of the first size bytes
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while size > 0:
+            block = f.read(min(HASH_BLOCK, size))
+            if not block:
+                break
+            h.update(block)
+            size -= len(block)
+    return h.hexdigest()
+
+
+class FileState:
+    # digest is the sampled content_hash; prefix_digest, when captured, hashes the
+    # whole file, so an append is only trusted when no old byte changed
+    def __init__(self, path: str, size: int, mtime_ns: int, digest: str, ends_with_newline: bool,
+                 prefix_digest: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.ends_with_newline = ends_with_newline
+        self.prefix_digest = prefix_digest
+
+    @classmethod
+    def capture(cls, path: str, prefix: bool = False) -> "FileState":
+        st = os.stat(path)
+        return cls(path, st.st_size, st.st_mtime_ns, content_hash(path, st.st_size),
+                   _ends_with_newline(path, st.st_size), prefix_hash(path, st.st_size) if prefix else None)
+
+    def hash_prefix(self):
+        self.prefix_digest = prefix_hash(self.path, self.size)
+
+    def same_as(self, other: "FileState") -> bool:
+        return (self.size, self.mtime_ns, self.digest) == (other.size, other.mtime_ns, other.digest)
+
+    def change(self) -> str:
+        # "unchanged", "appended" (bytes were only added at the end) or "rewritten"
+        st = os.stat(self.path)
+        if st.st_size == self.size and st.st_mtime_ns == self.mtime_ns:
+            return "unchanged"
+        if (st.st_size > self.size and self.ends_with_newline and self.prefix_digest is not None
+                and content_hash(self.path, self.size) == self.digest
+                and prefix_hash(self.path, self.size) == self.prefix_digest):
+            # the old bytes are all where they were (the sampled hash first, as it
+            # rules most rewrites out without reading the whole file)
+            return "appended"
+        return "rewritten"
+
+
+def _ends_with_newline(path: str, size: int) -> bool:
+    if size == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def read_appended(state: FileState, like: pd.DataFrame, end: int) -> pd.DataFrame:
+    # The rows between state.size and end, with like's columns and (where they
+    # fit) dtypes
+    sep = "\t" if os.path.splitext(state.path)[1].lower() == ".tsv" else ","
+    with open(state.path, "rb") as f:
+        f.seek(state.size)
+        data = f.read(end - state.size)
+    tail = pd.read_csv(io.BytesIO(data), sep=sep, header=None, names=list(like.columns), low_memory=False)
+    for c in tail.columns:
+        if tail[c].dtype != like[c].dtype:
+            try:
+                tail[c] = tail[c].astype(like[c].dtype)
+            except (TypeError, ValueError):
+                # e.g. NaN in an int column: concat upcasts instead
+                pass
+    return tail
+
+
+class IncrementalCompare:
+    # A compare of sides "a" and "b" kept up to date as they change. The service
+    # caches each loaded frame's key index, so replacing one side only indexes the
+    # new frame. refresh() picks up rows appended to a side's source file: only the
+    # tail is parsed and indexed, and the result's left_only/right_only sets (and
+    # match pairs, for A) are carried over instead of recomputed.
+    def __init__(self, service, columns_1: Union[str, Sequence[str]], columns_2: Union[str, Sequence[str]],
+                 *, suffixes: Tuple[str, str] = ("_A", "_B"),
+                 validate: Optional[str] = None,
+                 normalize_str: NormalizeSpec = False):
+        self.service = service
+        self.columns = {"a": columns_1, "b": columns_2}
+        self.options = {"suffixes": suffixes, "validate": validate, "normalize_str": normalize_str}
+        self.frames: Dict[str, Optional[pd.DataFrame]] = {"a": None, "b": None}
+        self.paths: Dict[str, Optional[str]] = {"a": None, "b": None}
+        self._result = None
+
+    def set_data(self, side: str, df: pd.DataFrame, path: Optional[str] = None):
+        # replaces one side; the other side's key index is reused
+        self.frames[side] = df
+        self.paths[side] = path
+        self._result = None
+
+    def load(self, side: str, path: str, **kwargs):
+        self.set_data(side, self.service.get_data(path, **kwargs), path)
+
+    def refresh(self, sides: Sequence[str] = ("a", "b"), **kwargs) -> Dict[str, str]:
+        # re-reads sides whose file changed; returns side -> "unchanged" | "appended" | "reloaded"
+        changes = {}
+        for side in sides:
+            df, path = self.frames[side], self.paths[side]
+            if df is None or path is None:
+                continue
+            grown, change = self.service.refresh_data(path, df, **kwargs)
+            changes[side] = change
+            if change == "unchanged":
+                continue
+            self.frames[side] = grown
+            previous, self._result = self._result, None
+            if change == "appended" and previous is not None and hasattr(previous, "carry_over"):
+                self._result = self._compare()
+                if hasattr(self._result, "carry_over"):
+                    self._result.carry_over(previous, "left" if side == "a" else "right", len(df))
+        return changes
+
+    def _compare(self):
+        return self.service.compare_columns(self.frames["a"], self.frames["b"],
+                                            self.columns["a"], self.columns["b"],
+                                            engine="index", **self.options)
+
+    @property
+    def result(self):
+        if self.frames["a"] is None or self.frames["b"] is None:
+            raise ValueError("Both sides need data before they can be compared")
+        if self._result is None:
+            self._result = self._compare()
+        return self._result
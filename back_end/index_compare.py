@@ -0,0 +1,380 @@
+import pandas as pd
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .utility_funcs import key_hashes
+
+MERGE_CATEGORIES = ["left_only", "right_only", "both"]
+RESULT_KEYS = ("merged", "matches", "left_only", "right_only")
+
+
+class HashCollision(Exception):
+    pass
+
+
+def _key_values(s1: pd.Series, s2: pd.Series) -> np.ndarray:
+    try:
+        return np.concatenate([s1.to_numpy(), s2.to_numpy()])
+    except (TypeError, ValueError):
+        return np.concatenate([s1.to_numpy(dtype=object), s2.to_numpy(dtype=object)])
+
+
+def _same_values(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # elementwise equality where null == null, like merge key matching; nulls
+    # are left out of the comparison (pd.NA == pd.NA is NA, not a bool)
+    null_x, null_y = pd.isna(x), pd.isna(y)
+    same = null_x & null_y
+    both = ~(null_x | null_y)
+    same[both] = x[both] == y[both]
+    return same
+
+
+def _first_rows(codes: np.ndarray, n_codes: int) -> np.ndarray:
+    first = np.empty(n_codes, dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return first
+
+
+class SideIndex:
+    # One side's keys as integer codes: rows with the same key share a code
+    # (numbered in order of first appearance), uniques holds each code's key hash
+    # and first its first row. Rows are checked against the first row of their
+    # code, so a hash collision can't merge two keys. Built once per loaded frame
+    # and joined against any other side by KeyCodes; a frame that grew by
+    # appended rows extends its index instead of rebuilding it.
+    def __init__(self, uniques: np.ndarray, codes: np.ndarray, counts: np.ndarray, first: np.ndarray):
+        self.uniques = uniques
+        self.codes = codes
+        self.counts = counts
+        self.first = first
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, cols: Sequence[str]) -> "SideIndex":
+        codes, uniques = pd.factorize(key_hashes(df, cols))
+        first = _first_rows(codes, len(uniques))
+        _verify_rows(df, cols, codes, first, 0)
+        return cls(uniques, codes, np.bincount(codes, minlength=len(uniques)), first)
+
+    def extended(self, df: pd.DataFrame, cols: Sequence[str], start: int) -> "SideIndex":
+        # df: the frame this index was built for with rows appended from start on
+        n_old = len(self.uniques)
+        tail = key_hashes(df.iloc[start:], cols)
+        codes = pd.Index(self.uniques).get_indexer(tail)
+        new = codes < 0
+        new_codes, new_uniques = pd.factorize(tail[new])
+        codes[new] = n_old + new_codes
+        first = np.concatenate([self.first, start + np.flatnonzero(new)[_first_rows(new_codes, len(new_uniques))]])
+        all_codes = np.concatenate([self.codes, codes])
+        _verify_rows(df, cols, all_codes, first, start)
+        counts = np.bincount(codes, minlength=n_old + len(new_uniques))
+        counts[:n_old] += self.counts
+        return SideIndex(np.concatenate([self.uniques, new_uniques]), all_codes, counts, first)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+def _verify_rows(df: pd.DataFrame, cols: Sequence[str], codes: np.ndarray, first: np.ndarray, start: int):
+    for c in cols:
+        values = df[c].to_numpy()
+        if not _same_values(values[start:], values[first[codes[start:]]]).all():
+            raise HashCollision(f"Key hash collision on {c!r}")
+
+
+class KeyCodes:
+    # Shared integer code per distinct key across both sides, joined from the two
+    # sides' indexes: A's codes are kept, B's keys map onto them or get new codes
+    # after them. Keys whose hashes meet are checked against the real key values.
+    def __init__(self, df1: pd.DataFrame, df2: pd.DataFrame,
+                 cols_1: Sequence[str], cols_2: Sequence[str],
+                 index_1: Optional[SideIndex] = None, index_2: Optional[SideIndex] = None):
+        index_1 = index_1 if index_1 is not None else SideIndex.build(df1, cols_1)
+        index_2 = index_2 if index_2 is not None else SideIndex.build(df2, cols_2)
+        n1 = len(index_1.uniques)
+        pos = pd.Index(index_1.uniques).get_indexer(index_2.uniques)
+        shared = pos >= 0
+        remap = pos.astype(np.int64)
+        remap[~shared] = n1 + np.arange(np.count_nonzero(~shared))
+        self.n_codes = n1 + int(np.count_nonzero(~shared))
+
+        rows_1 = index_1.first[pos[shared]]
+        rows_2 = index_2.first[shared]
+        for c1, c2 in zip(cols_1, cols_2):
+            values = _key_values(df1[c1].iloc[rows_1], df2[c2].iloc[rows_2])
+            if not _same_values(values[:len(rows_1)], values[len(rows_1):]).all():
+                raise HashCollision(f"Key hash collision on {c1!r}/{c2!r}")
+
+        self.codes_1 = index_1.codes
+        self.codes_2 = remap[index_2.codes]
+        self.counts_1 = np.zeros(self.n_codes, dtype=np.int64)
+        self.counts_1[:n1] = index_1.counts
+        self.counts_2 = np.zeros(self.n_codes, dtype=np.int64)
+        self.counts_2[remap] = index_2.counts
+
+
+def check_key_dtypes(df1: pd.DataFrame, df2: pd.DataFrame,
+                     cols_1: Sequence[str], cols_2: Sequence[str], suffixes: Tuple[str, str]):
+    # Raises what pd.merge raises for key dtypes it won't join (text vs int, ...).
+    # pandas decides on the key values, not only the dtypes, so the check merges
+    # one row with a non-null key from each side rather than empty frames.
+    def sample(df: pd.DataFrame, cols: Sequence[str]) -> pd.DataFrame:
+        keys = df[list(cols)]
+        valid = np.flatnonzero(keys.notna().all(axis=1).to_numpy())
+        return keys.iloc[valid[:1]]
+
+    pd.merge(sample(df1, cols_1), sample(df2, cols_2), left_on=list(cols_1), right_on=list(cols_2),
+             how="outer", suffixes=suffixes)
+
+
+def check_validate(validate: Optional[str], counts_1: np.ndarray, counts_2: np.ndarray):
+    if validate is None:
+        return
+    left_unique = not (counts_1 > 1).any()
+    right_unique = not (counts_2 > 1).any()
+    if validate in ("one_to_one", "1:1"):
+        if not left_unique and not right_unique:
+            raise pd.errors.MergeError("Merge keys are not unique in either left or right dataset; not a one-to-one merge")
+        if not left_unique:
+            raise pd.errors.MergeError("Merge keys are not unique in left dataset; not a one-to-one merge")
+        if not right_unique:
+            raise pd.errors.MergeError("Merge keys are not unique in right dataset; not a one-to-one merge")
+    elif validate in ("one_to_many", "1:m"):
+        if not left_unique:
+            raise pd.errors.MergeError("Merge keys are not unique in left dataset; not a one-to-many merge")
+    elif validate in ("many_to_one", "m:1"):
+        if not right_unique:
+            raise pd.errors.MergeError("Merge keys are not unique in right dataset; not a many-to-one merge")
+    elif validate not in ("many_to_many", "m:m"):
+        raise ValueError(f'"{validate}" is not a valid argument. Valid arguments are:\n'
+                         '- "1:1"\n- "1:m"\n- "m:1"\n- "m:m"\n- "one_to_one"\n'
+                         '- "one_to_many"\n- "many_to_one"\n- "many_to_many"')
+
+
+def join_pairs(codes_1: np.ndarray, codes_2: np.ndarray, counts_2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # positions (left_take, right_take) of every matching row pair, many-to-many included
+    order_2 = np.argsort(codes_2, kind="stable")
+    starts_2 = np.concatenate([[0], np.cumsum(counts_2)[:-1]])
+    reps = counts_2[codes_1]
+    left_take = np.repeat(np.arange(len(codes_1)), reps)
+    offsets = np.arange(len(left_take)) - np.repeat(np.cumsum(reps) - reps, reps)
+    right_take = order_2[np.repeat(starts_2[codes_1], reps) + offsets]
+    return left_take, right_take
+
+
+class MergeLayout:
+    # Reproduces the column layout pd.merge(left_on=..., right_on=...) gives and
+    # builds any subset of those columns for given left/right take positions
+    def __init__(self, df1: pd.DataFrame, df2: pd.DataFrame,
+                 cols_1: Sequence[str], cols_2: Sequence[str],
+                 suffixes: Tuple[str, str]):
+        self.df1 = df1
+        self.df2 = df2
+        shared = {c1 for c1, c2 in zip(cols_1, cols_2) if c1 == c2}
+        overlap = (set(df1.columns) & set(df2.columns)) - shared
+        # (output name, side, source column); side "key" is a shared key column that
+        # takes its value from whichever side the row has
+        self.layout: List[Tuple[str, str, str]] = []
+        for c in df1.columns:
+            if c in shared:
+                self.layout.append((c, "key", c))
+            else:
+                self.layout.append((f"{c}{suffixes[0]}" if c in overlap else c, "left", c))
+        for c in df2.columns:
+            if c not in shared:
+                self.layout.append((f"{c}{suffixes[1]}" if c in overlap else c, "right", c))
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index([name for name, _, _ in self.layout] + ["_merge"])
+
+    @staticmethod
+    def _take(col: pd.Series, take: Optional[np.ndarray], n: int) -> pd.Series:
+        if take is None:
+            # all-missing column with the dtype pd.merge would upcast to
+            return col.iloc[:0].reindex(range(n))
+        return col.take(take).reset_index(drop=True)
+
+    def build(self, left_take: Optional[np.ndarray], right_take: Optional[np.ndarray],
+              indicator: str, columns: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        # columns: positions into self.columns, defaults to all of them
+        n = len(left_take) if left_take is not None else len(right_take)
+        picked = range(len(self.layout) + 1) if columns is None else columns
+        out = {}
+        for pos in picked:
+            if pos == len(self.layout):
+                out["_merge"] = pd.Categorical([indicator] * n, categories=MERGE_CATEGORIES)
+                continue
+            name, side, src = self.layout[pos]
+            if side == "right" or (side == "key" and left_take is None):
+                out[name] = self._take(self.df2[src], right_take, n)
+            else:
+                out[name] = self._take(self.df1[src], left_take, n)
+        return pd.DataFrame(out, index=pd.RangeIndex(n))
+
+
+class ResultWindow:
+    # Row-addressable view of one IndexCompareResult frame. Only the requested rows
+    # (or one column, for sorting) are ever materialized, which lets a table model
+    # page through a multi-million row result without building it.
+    def __init__(self, result: "IndexCompareResult", key: str):
+        if key not in RESULT_KEYS:
+            raise KeyError(key)
+        self._result = result
+        self._key = key
+        layout = result._layout
+        left_take, right_take = result.match_pairs if key in ("merged", "matches") else (None, None)
+        # (left take, right take, indicator) per segment, in "merged" order
+        segments = []
+        if key in ("merged", "matches"):
+            segments.append((left_take, right_take, "both"))
+        if key in ("merged", "left_only"):
+            segments.append((result.left_only_index, None, "left_only"))
+        if key in ("merged", "right_only"):
+            segments.append((None, result.right_only_index, "right_only"))
+        self._segments = segments
+        lengths = [len(lt) if lt is not None else len(rt) for lt, rt, _ in segments]
+        self._starts = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self._layout = layout
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._layout.columns
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def rows(self, positions: np.ndarray, columns: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        positions = np.asarray(positions, dtype=np.int64)
+        seg = np.searchsorted(self._starts, positions, side="right") - 1
+        order = np.argsort(seg, kind="stable")
+        parts = []
+        for s, (lt, rt, indicator) in enumerate(self._segments):
+            local = positions[order][seg[order] == s] - self._starts[s]
+            if len(local) == 0:
+                continue
+            parts.append(self._layout.build(lt[local] if lt is not None else None,
+                                            rt[local] if rt is not None else None,
+                                            indicator, columns))
+        if not parts:
+            return self._layout.build(np.empty(0, dtype=np.int64), None, "both", columns)
+        out = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        if len(parts) > 1:
+            out = out.take(np.argsort(order, kind="stable")).reset_index(drop=True)
+        return out
+
+    def column(self, pos: int) -> pd.Series:
+        return self.rows(np.arange(len(self)), [pos]).iloc[:, 0]
+
+    def sample(self) -> pd.DataFrame:
+        # first row of every segment, which has the dtypes the whole window has
+        starts = self._starts[:-1][np.diff(self._starts) > 0]
+        return self.rows(starts)
+
+
+class IndexCompareResult(Mapping):
+    # Lazy compare_columns result. Key membership is computed up front; the frames
+    # behind "merged", "matches", "left_only" and "right_only" are only built (and
+    # then cached) when they are looked up.
+    def __init__(self, layout: MergeLayout, codes: KeyCodes):
+        self._layout = layout
+        self._codes = codes
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._pairs: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._left_only: Optional[np.ndarray] = None
+        self._right_only: Optional[np.ndarray] = None
+
+    @property
+    def left_only_index(self) -> np.ndarray:
+        if self._left_only is None:
+            self._left_only = np.flatnonzero(self._codes.counts_2[self._codes.codes_1] == 0)
+        return self._left_only
+
+    @property
+    def right_only_index(self) -> np.ndarray:
+        if self._right_only is None:
+            self._right_only = np.flatnonzero(self._codes.counts_1[self._codes.codes_2] == 0)
+        return self._right_only
+
+    def carry_over(self, previous: "IndexCompareResult", side: str, start: int):
+        # This result is `previous` after rows were appended to one side ("left" or
+        # "right") from position start on. Rows that were there before keep their
+        # category unless their key was just added on the other side, so previous's
+        # sets are filtered and only the new rows are looked up.
+        c = self._codes
+        if side == "left":
+            if previous._left_only is not None:
+                new = start + np.flatnonzero(c.counts_2[c.codes_1[start:]] == 0)
+                self._left_only = np.concatenate([previous._left_only, new])
+            if previous._right_only is not None:
+                old = previous._right_only
+                self._right_only = old[c.counts_1[c.codes_2[old]] == 0]
+            if previous._pairs is not None:
+                # matches are in left row order, so the new rows' pairs go last
+                left, right = join_pairs(c.codes_1[start:], c.codes_2, c.counts_2)
+                self._pairs = (np.concatenate([previous._pairs[0], start + left]),
+                               np.concatenate([previous._pairs[1], right]))
+        else:
+            if previous._right_only is not None:
+                new = start + np.flatnonzero(c.counts_1[c.codes_2[start:]] == 0)
+                self._right_only = np.concatenate([previous._right_only, new])
+            if previous._left_only is not None:
+                old = previous._left_only
+                self._left_only = old[c.counts_2[c.codes_1[old]] == 0]
+
+    @property
+    def match_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._pairs is None:
+            self._pairs = join_pairs(self._codes.codes_1, self._codes.codes_2, self._codes.counts_2)
+        return self._pairs
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        matches = int((self._codes.counts_1.astype(np.int64) * self._codes.counts_2).sum())
+        left_only = len(self.left_only_index)
+        right_only = len(self.right_only_index)
+        return {
+            "merged": matches + left_only + right_only,
+            "matches": matches,
+            "left_only": left_only,
+            "right_only": right_only
+        }
+
+    def _build(self, key: str) -> pd.DataFrame:
+        if key == "matches":
+            left_take, right_take = self.match_pairs
+            return self._layout.build(left_take, right_take, "both")
+        if key == "left_only":
+            return self._layout.build(self.left_only_index, None, "left_only")
+        if key == "right_only":
+            return self._layout.build(None, self.right_only_index, "right_only")
+        return pd.concat([self["matches"], self["left_only"], self["right_only"]], ignore_index=True)
+
+    def window(self, key: str) -> ResultWindow:
+        return ResultWindow(self, key)
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in RESULT_KEYS:
+            raise KeyError(key)
+        if key not in self._frames:
+            self._frames[key] = self._build(key)
+        return self._frames[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(RESULT_KEYS)
+
+    def __len__(self) -> int:
+        return len(RESULT_KEYS)
+
+
+def index_compare(df1: pd.DataFrame, df2: pd.DataFrame,
+                  cols_1: Sequence[str], cols_2: Sequence[str],
+                  *, suffixes: Tuple[str, str] = ("_A", "_B"),
+                  validate: Optional[str] = None,
+                  indexes: Optional[Tuple[SideIndex, SideIndex]] = None) -> IndexCompareResult:
+    # indexes: prebuilt SideIndex of each side (e.g. cached per loaded frame)
+    check_key_dtypes(df1, df2, cols_1, cols_2, suffixes)
+
+    codes = KeyCodes(df1, df2, cols_1, cols_2, *(indexes or ()))
+    check_validate(validate, codes.counts_1, codes.counts_2)
+    layout = MergeLayout(df1, df2, cols_1, cols_2, suffixes)
+    return IndexCompareResult(layout, codes)
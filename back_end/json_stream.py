@@ -0,0 +1,177 @@
+import pandas as pd
+import codecs
+import json
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+
+READ_BYTES = 1 << 20
+# a first line longer than this is taken to be a single-line document, not NDJSON
+MAX_SNIFF_LINE = 16 << 20
+
+
+def sniff_json(path: str) -> str:
+    # "array" ([...]), "object" ({...} over the whole file) or "ndjson" (one
+    # value per line), decided from the start of the file only
+    with open(path, "rb") as f:
+        head = f.read(4096).lstrip(codecs.BOM_UTF8).lstrip()
+        if head.startswith(b"["):
+            return "array"
+        if not head.startswith(b"{"):
+            raise RuntimeError("Unsupported JSON structure: expected an array, an object or JSON lines")
+        f.seek(0)
+        first = f.readline(MAX_SNIFF_LINE)
+        if not first.endswith(b"\n"):
+            return "object"
+        try:
+            json.loads(first)
+        except ValueError:
+            # an object spread over several lines
+            return "object"
+        for line in f:
+            if line.strip():
+                return "ndjson"
+        return "object"
+
+
+def records_frame(records: list) -> pd.DataFrame:
+    # nested records are flattened to "a.b" columns like json_normalize
+    if records and all(isinstance(r, dict) for r in records):
+        return pd.json_normalize(records)
+    return pd.DataFrame(records)
+
+
+class _TextStream:
+    # Incrementally decoded text over a binary file, for pulling one JSON value at
+    # a time with JSONDecoder.raw_decode without holding the whole document.
+    def __init__(self, f):
+        self._f = f
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def fill(self, nbytes: int = READ_BYTES) -> bool:
+        if self.eof:
+            return False
+        raw = self._f.read(nbytes)
+        self.bytes_read += len(raw)
+        self.eof = not raw
+        self.buf = self.buf[self.pos:] + self._decoder.decode(raw, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        # next non-whitespace character, "" at the end of the file
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError(f"Malformed JSON: expected one of {chars!r}, found {c!r}")
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        nbytes = READ_BYTES
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                end = None
+            # a number at the end of the buffer may continue in the next read
+            if end is not None and (end < len(self.buf) or self.eof):
+                self.pos = end
+                return obj
+            self.fill(nbytes)
+            nbytes *= 2
+
+
+def _iter_array(stream: _TextStream, batch_rows: int, opened: bool = False) -> Iterator[list]:
+    # opened: the "[" has already been consumed
+    if not opened:
+        stream.expect("[")
+    batch: List = []
+    if stream.peek() == "]":
+        return
+    while True:
+        batch.append(stream.value())
+        if len(batch) >= batch_rows:
+            yield batch
+            batch = []
+        if stream.expect(",]") == "]":
+            break
+    if batch:
+        yield batch
+
+
+def iter_json_batches(path: str, batch_rows: int = 50_000,
+                      kind: Optional[str] = None,
+                      flatten: Callable[[list], pd.DataFrame] = records_frame
+                      ) -> Iterator[Tuple[pd.DataFrame, int]]:
+    # Single pass over a JSON file, yielding (flattened frame, bytes read so far)
+    # per batch of records:
+    #   ndjson  one record per line
+    #   array   [record, ...]
+    #   object  {"key": [{record}, ...], ...} streams the first value when it is an
+    #           array of objects; any other object is a whole document (read_json
+    #           orients such as {"col": [values]}, or a single record) and is
+    #           parsed in one go
+    kind = kind or sniff_json(path)
+    with open(path, "rb") as f:
+        if kind == "ndjson":
+            batch = []
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_rows:
+                    yield flatten(batch), f.tell()
+                    batch = []
+            if batch:
+                yield flatten(batch), f.tell()
+            return
+
+        stream = _TextStream(f)
+        if kind == "array":
+            for batch in _iter_array(stream, batch_rows):
+                yield flatten(batch), stream.bytes_read
+            return
+
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "{":
+                for batch in _iter_array(stream, batch_rows, opened=True):
+                    yield flatten(batch), stream.bytes_read
+                return
+
+    yield whole_document(path), os.path.getsize(path)
+
+
+def whole_document(path: str) -> pd.DataFrame:
+    # an object that isn't streamed: read_json's table orients first, then the
+    # first value when it is a list, or the object flattened as a single record
+    try:
+        return pd.read_json(path)
+    except ValueError:
+        pass
+    with open(path, "r", encoding="utf-8-sig") as f:
+        raw = json.load(f)
+    first = next(iter(raw.values()), None)
+    if isinstance(first, list):
+        return pd.json_normalize(first)
+    return pd.json_normalize(raw)
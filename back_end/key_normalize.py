@@ -0,0 +1,166 @@
+import pandas as pd
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Sequence, Tuple, Union
+
+# Key normalization steps, always applied in this order whatever order they are
+# given in. Text steps only touch string-like columns (all of them after "to_str").
+#   to_str       numbers/dates become strings; whole floats drop their ".0" so
+#                int ids on one side match float ids (ints with NaN) on the other
+#   nfkc         Unicode NFKC: full-width digits, ligatures, non-breaking spaces...
+#   collapse_ws  runs of whitespace become one space, ends are stripped
+#   strip        leading/trailing whitespace
+#   lower        lowercase
+#   strip_zeros  leading zeros of a number ("007" -> "7", "000" -> "0")
+#   to_number    parse to numbers; a value that doesn't parse is an error
+NORMALIZE_STEPS = ("to_str", "nfkc", "collapse_ws", "strip", "lower", "strip_zeros", "to_number")
+# what normalize_str=True has always meant
+DEFAULT_NORMALIZE = ("strip", "lower")
+
+NormalizeSpec = Union[bool, str, Sequence[str], None]
+
+
+def normalize_spec(normalize_str: NormalizeSpec) -> Tuple[str, ...]:
+    if normalize_str is None or normalize_str is False:
+        return ()
+    if normalize_str is True:
+        return DEFAULT_NORMALIZE
+    steps = [normalize_str] if isinstance(normalize_str, str) else list(normalize_str)
+    unknown = [s for s in steps if s not in NORMALIZE_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown key normalization: {unknown}. Expected any of {NORMALIZE_STEPS}")
+    return tuple(s for s in NORMALIZE_STEPS if s in steps)
+
+
+def _is_text(s: pd.Series) -> bool:
+    if s.dtype == object:
+        # is_string_dtype says no to object columns with nulls in them
+        return pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty")
+    return pd.api.types.is_string_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype)
+
+
+def _to_str(s: pd.Series) -> pd.Series:
+    if _is_text(s):
+        return s.astype("string")
+    if pd.api.types.is_float_dtype(s):
+        out = s.astype("string")
+        # whole floats beyond int64 (1e20) keep their float format ("1e+20")
+        whole = ((s % 1 == 0) & (s.abs() < 2.0 ** 63)).fillna(False).to_numpy(dtype=bool)
+        out[whole] = s[whole].astype("int64").astype("string")
+        return out
+    return s.astype("string")
+
+
+def _to_number(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s
+    out = pd.to_numeric(s, errors="coerce")
+    bad = out.isna() & s.notna()
+    if bad.any():
+        raise ValueError(f"Key column {s.name!r} has values that are not numbers, e.g. {s[bad].iloc[0]!r}")
+    return out
+
+
+def normalize_key(s: pd.Series, spec: Tuple[str, ...]) -> pd.Series:
+    # a new Series, s itself is never modified
+    if "to_str" in spec:
+        s = _to_str(s)
+    if _is_text(s):
+        text = s.astype("string")
+        if "nfkc" in spec:
+            text = text.str.normalize("NFKC")
+        if "collapse_ws" in spec:
+            text = text.str.replace(r"\s+", " ", regex=True).str.strip()
+        if "strip" in spec:
+            text = text.str.strip()
+        if "lower" in spec:
+            text = text.str.lower()
+        if "strip_zeros" in spec:
+            text = text.str.replace(r"^0+(?=\d)", "", regex=True)
+        s = text
+    if "to_number" in spec:
+        s = _to_number(s)
+    return s
+
+
+class KeyNormalizer:
+    # Normalized key columns cached per (frame, column, spec). Frames are held
+    # weakly and treated as read-only: an entry is dropped once its frame is
+    # garbage collected, so a loaded dataset compared many times is normalized once.
+    max_entries = 64
+
+    def __init__(self):
+        self._cache: OrderedDict[Tuple[int, str, Tuple[str, ...]], Tuple[weakref.ref, pd.Series]] = OrderedDict()
+
+    def key(self, df: pd.DataFrame, column: str, spec: Tuple[str, ...]) -> pd.Series:
+        cache_key = (id(df), column, spec)
+        hit = self._cache.get(cache_key)
+        if hit is not None and hit[0]() is df:
+            self._cache.move_to_end(cache_key)
+            return hit[1]
+        out = normalize_key(df[column], spec)
+        self._store(df, column, spec, out)
+        return out
+
+    def _store(self, df: pd.DataFrame, column: str, spec: Tuple[str, ...], s: pd.Series):
+        self._prune()
+        self._cache[(id(df), column, spec)] = (weakref.ref(df), s)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def extend(self, df: pd.DataFrame, grown: pd.DataFrame, start: int):
+        # grown is df with rows appended from position start on: the keys cached
+        # for df carry over and only the new rows are normalized
+        for (frame_id, column, spec), (ref, s) in list(self._cache.items()):
+            if frame_id == id(df) and ref() is df:
+                tail = normalize_key(grown[column].iloc[start:], spec)
+                self._store(grown, column, spec, pd.concat([s, tail], ignore_index=True))
+
+    def _prune(self):
+        for k in [k for k, (ref, _) in self._cache.items() if ref() is None]:
+            del self._cache[k]
+
+    def frame(self, df: pd.DataFrame, columns: Sequence[str], spec: Tuple[str, ...]) -> pd.DataFrame:
+        # df with its key columns swapped for normalized ones; the other columns
+        # share df's data (shallow copy), df is left untouched
+        if not spec:
+            return df
+        keys: Dict[str, pd.Series] = {c: self.key(df, c, spec) for c in dict.fromkeys(columns)}
+        out = df.copy(deep=False)
+        for c, s in keys.items():
+            # positional, the cached key shares df's index
+            out[c] = s.array
+        return out
+
+    def clear(self):
+        self._cache.clear()
+
+
+class FrameCache:
+    # Anything derived from a frame (key sketches, key indexes...) cached per
+    # (frame, key). Frames are held weakly and treated as read-only, like
+    # KeyNormalizer's; an entry is dropped once its frame is garbage collected.
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._cache: OrderedDict[Tuple[int, Hashable], Tuple[weakref.ref, Any]] = OrderedDict()
+
+    def get(self, df: pd.DataFrame, key: Hashable) -> Any:
+        hit = self._cache.get((id(df), key))
+        if hit is not None and hit[0]() is df:
+            self._cache.move_to_end((id(df), key))
+            return hit[1]
+        return None
+
+    def put(self, df: pd.DataFrame, key: Hashable, value: Any):
+        for k in [k for k, (ref, _) in self._cache.items() if ref() is None]:
+            del self._cache[k]
+        self._cache[(id(df), key)] = (weakref.ref(df), value)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def entries(self, df: pd.DataFrame) -> List[Tuple[Hashable, Any]]:
+        return [(key, value) for (frame_id, key), (ref, value) in list(self._cache.items())
+                if frame_id == id(df) and ref() is df]
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Sequence, Tuple
+from .utility_funcs import key_hashes
+
+# Approximate key overlap of two datasets in one pass over each side's key hashes.
+# A KeySketch holds a HyperLogLog (distinct keys) and a bottom-k sample: the k
+# smallest key hashes with their row counts. Hashes are uniform, so that sample is
+# a uniform sample of the distinct keys, and the k smallest hashes of A ∪ B can be
+# read off the two sides' samples; which of those keys are in A, B or both (and
+# with how many rows) estimates the compare result without running it.
+
+HLL_PRECISION = 14
+SAMPLE_KEYS = 16_384
+# share of a side's rows with a match below which a warning is raised
+LOW_OVERLAP = 0.05
+
+
+def _leading_zeros(x: np.ndarray) -> np.ndarray:
+    # leading zero bits of every uint64, from the float exponent (bit length).
+    # Rounding to float can add one to the bit length of values just under a
+    # power of two, which a HyperLogLog doesn't notice.
+    _, bit_length = np.frexp(x.astype(np.float64))
+    return np.clip(64 - bit_length, 0, 64)
+
+
+def hll_registers(hashes: np.ndarray, precision: int = HLL_PRECISION) -> np.ndarray:
+    # top `precision` bits pick the register, the rank of the first set bit in the
+    # rest is what it remembers (at most)
+    registers = np.zeros(1 << precision, dtype=np.uint8)
+    if len(hashes) == 0:
+        return registers
+    idx = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes << np.uint64(precision)
+    rank = np.minimum(_leading_zeros(rest), 64 - precision) + 1
+    np.maximum.at(registers, idx, rank.astype(np.uint8))
+    return registers
+
+
+def hll_estimate(registers: np.ndarray) -> float:
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    empty = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and empty:
+        # linear counting is better while many registers are still empty
+        return m * np.log(m / empty)
+    return float(raw)
+
+
+def bottom_k(hashes: np.ndarray, k: int = SAMPLE_KEYS) -> Tuple[np.ndarray, np.ndarray]:
+    # the k smallest distinct hashes (sorted) and how many rows have each
+    n = len(hashes)
+    if n > 4 * k:
+        # every row at or under the 4k-th smallest hash; only falls back to the
+        # full unique when heavy duplication leaves fewer than k distinct in there
+        cut = np.partition(hashes, 4 * k)[4 * k]
+        sample, counts = np.unique(hashes[hashes <= cut], return_counts=True)
+        if len(sample) < k:
+            sample, counts = np.unique(hashes, return_counts=True)
+    else:
+        sample, counts = np.unique(hashes, return_counts=True)
+    return sample[:k], counts[:k]
+
+
+class KeySketch:
+    def __init__(self, hashes: np.ndarray, precision: int = HLL_PRECISION, sample_keys: int = SAMPLE_KEYS):
+        self.rows = len(hashes)
+        self.sample_keys = sample_keys
+        self.registers = hll_registers(hashes, precision)
+        self.sample, self.sample_counts = bottom_k(hashes, sample_keys)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: Sequence[str], **kwargs) -> "KeySketch":
+        return cls(key_hashes(df, list(columns)), **kwargs)
+
+    def extended(self, hashes: np.ndarray) -> "KeySketch":
+        # this sketch plus more rows: registers take the max, samples merge
+        tail = KeySketch(hashes, int(np.log2(len(self.registers))), self.sample_keys)
+        out = KeySketch.__new__(KeySketch)
+        out.rows = self.rows + tail.rows
+        out.sample_keys = self.sample_keys
+        out.registers = np.maximum(self.registers, tail.registers)
+        sample = np.union1d(self.sample, tail.sample)[:self.sample_keys]
+        out.sample = sample
+        out.sample_counts = (_counts_in(self.sample, self.sample_counts, sample)
+                             + _counts_in(tail.sample, tail.sample_counts, sample))
+        return out
+
+    @property
+    def exact(self) -> bool:
+        # fewer distinct keys than the sample holds: the sample is every key
+        return len(self.sample) < self.sample_keys
+
+    @property
+    def distinct(self) -> float:
+        return float(len(self.sample)) if self.exact else hll_estimate(self.registers)
+
+    @property
+    def nbytes(self) -> int:
+        return self.registers.nbytes + self.sample.nbytes + self.sample_counts.nbytes
+
+    def duplicates(self) -> Dict[str, float]:
+        # rows beyond the first of their key, and the share of keys that repeat
+        counts = self.sample_counts
+        if len(counts) == 0:
+            return {"duplicate_rows": 0.0, "duplicate_keys": 0.0, "max_repeats": 0}
+        extra = float(np.sum(counts - 1)) / float(np.sum(counts))
+        repeated = float(np.count_nonzero(counts > 1)) / len(counts)
+        return {
+            "duplicate_rows": self.rows * extra,
+            "duplicate_keys": self.distinct * repeated,
+            "max_repeats": int(counts.max())
+        }
+
+
+def _counts_in(sample: np.ndarray, counts: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    # row count of every key in `keys` within a side's sample, 0 where absent
+    if len(sample) == 0:
+        return np.zeros(len(keys), dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sample, keys), len(sample) - 1)
+    found = sample[pos] == keys
+    return np.where(found, counts[pos], 0).astype(np.int64)
+
+
+def _suggest_validate(unique_1: bool, unique_2: bool) -> str:
+    if unique_1 and unique_2:
+        return "one_to_one"
+    if unique_1:
+        return "one_to_many"
+    if unique_2:
+        return "many_to_one"
+    return "many_to_many"
+
+
+def estimate_overlap(sketch_1: KeySketch, sketch_2: KeySketch) -> Dict:
+    # Approximate compare_columns(...).counts from two sketches, plus distinct and
+    # duplicate counts per side and the validate= setting the keys would pass.
+    # Exact while both sides have fewer distinct keys than the sample size.
+    exact = sketch_1.exact and sketch_2.exact
+    union = np.union1d(sketch_1.sample, sketch_2.sample)
+    if not exact:
+        # only the k smallest of the union are a uniform sample of it
+        union = union[:min(sketch_1.sample_keys, sketch_2.sample_keys)]
+    c1 = _counts_in(sketch_1.sample, sketch_1.sample_counts, union)
+    c2 = _counts_in(sketch_2.sample, sketch_2.sample_counts, union)
+    both = (c1 > 0) & (c2 > 0)
+
+    if exact:
+        union_distinct = float(len(union))
+    else:
+        union_distinct = hll_estimate(np.maximum(sketch_1.registers, sketch_2.registers))
+    scale = union_distinct / len(union) if len(union) else 0.0
+
+    # row shares are taken within each side's own sampled rows, so they add up to
+    # the side's exact row count
+    rows_1 = c1.sum()
+    rows_2 = c2.sum()
+    left_only = sketch_1.rows * (c1[~both].sum() / rows_1) if rows_1 else 0.0
+    right_only = sketch_2.rows * (c2[~both].sum() / rows_2) if rows_2 else 0.0
+    matches = float(np.sum(c1[both] * c2[both])) * scale
+    matched_keys = float(np.count_nonzero(both)) * scale
+
+    dup_1 = sketch_1.duplicates()
+    dup_2 = sketch_2.duplicates()
+    unique_1 = dup_1["max_repeats"] <= 1
+    unique_2 = dup_2["max_repeats"] <= 1
+    out = {
+        "exact": exact,
+        "rows_a": sketch_1.rows,
+        "rows_b": sketch_2.rows,
+        "distinct_a": sketch_1.distinct,
+        "distinct_b": sketch_2.distinct,
+        "matched_keys": matched_keys,
+        "matches": matches,
+        "left_only": left_only,
+        "right_only": right_only,
+        "merged": matches + left_only + right_only,
+        "duplicate_rows_a": dup_1["duplicate_rows"],
+        "duplicate_rows_b": dup_2["duplicate_rows"],
+        "duplicate_keys_a": dup_1["duplicate_keys"],
+        "duplicate_keys_b": dup_2["duplicate_keys"],
+        "suggested_validate": _suggest_validate(unique_1, unique_2),
+    }
+    out["warnings"] = _warnings(out, dup_1, dup_2)
+    return out
+
+
+def _warnings(est: Dict, dup_1: Dict, dup_2: Dict) -> List[str]:
+    approx = "" if est["exact"] else "~"
+    warnings = []
+    for side, dup in (("A", dup_1), ("B", dup_2)):
+        if dup["max_repeats"] > 1:
+            warnings.append(f"{side} has {approx}{dup['duplicate_rows']:,.0f} duplicate key rows "
+                            f"({approx}{dup['duplicate_keys']:,.0f} keys repeat, up to {dup['max_repeats']}x"
+                            f"{'' if est['exact'] else ' in the sample'})")
+    if dup_1["max_repeats"] > 1 and dup_2["max_repeats"] > 1 and est["matches"] > est["rows_a"] + est["rows_b"]:
+        warnings.append(f"Keys repeat on both sides: matches may grow to {approx}{est['matches']:,.0f} rows")
+    for side, rows, other in (("A", est["rows_a"], est["left_only"]), ("B", est["rows_b"], est["right_only"])):
+        if rows and (rows - other) / rows < LOW_OVERLAP:
+            warnings.append(f"Only {approx}{100 * (rows - other) / rows:.1f}% of {side}'s rows have a match; "
+                            f"check the key columns and normalization")
+    return warnings
+
@@ -0,0 +1,380 @@
+import pandas as pd
+import numpy as np
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import weakref
+from collections.abc import Mapping
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from .index_compare import RESULT_KEYS, check_key_dtypes
+from .utility_funcs import key_hashes
+
+Frames = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+# rough peak of an outer merge relative to the size of its two inputs
+MERGE_OVERHEAD = 3
+# a partition result file holds its rows in this _merge order; "merged" lists
+# all matches first, then the left_only and the right_only rows
+CATEGORIES = ("both", "left_only", "right_only")
+KEY_CATEGORIES = {"merged": CATEGORIES, "matches": ("both",),
+                  "left_only": ("left_only",), "right_only": ("right_only",)}
+
+
+def frame_nbytes(df: pd.DataFrame, sample_rows: int = 10_000) -> int:
+    # Deep size of df. Object columns (Python strings) are measured on an evenly
+    # spaced sample: measuring every string costs as much as a partition pass.
+    if len(df) <= sample_rows:
+        return int(df.memory_usage(index=False, deep=True).sum())
+    sample = df.iloc[np.linspace(0, len(df) - 1, sample_rows).astype(np.int64)]
+    total = 0
+    for i, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            total += int(sample.iloc[:, i].memory_usage(index=False, deep=True) * len(df) / sample_rows)
+        else:
+            total += int(df.iloc[:, i].memory_usage(index=False, deep=True))
+    return total
+
+
+def partition_ids(df: pd.DataFrame, cols: Sequence[str], n_parts: int) -> np.ndarray:
+    # Equal keys must land in the same partition on both sides; key_hashes takes care
+    # of int/float key pairs. The per-partition merge itself stays exact.
+    return (key_hashes(df, cols) % np.uint64(n_parts)).astype(np.int64)
+
+
+def _iter_chunks(data: Frames, chunk_bytes: int) -> Iterator[pd.DataFrame]:
+    if not isinstance(data, pd.DataFrame):
+        yield from data
+        return
+    if data.empty:
+        yield data
+        return
+    row_bytes = max(1, frame_nbytes(data) // len(data))
+    step = max(1, chunk_bytes // row_bytes)
+    for start in range(0, len(data), step):
+        yield data.iloc[start:start + step]
+
+
+def _write_feather(df: pd.DataFrame, path: str) -> str:
+    # uncompressed, so readers can slice a memory-mapped file without copying it.
+    # Ints with nulls in a file come from object columns (int64 has no nulls, Int64
+    # is restored from the pandas metadata), so they're read back with
+    # integer_object_nulls: object ints as they were, not rounded to float64.
+    import pyarrow as pa
+
+    try:
+        df.to_feather(path, compression="uncompressed")
+    except (pa.ArrowException, ValueError) as e:
+        raise ValueError(f"The partitioned engines spill frames as Arrow, which can't hold this one "
+                         f"({e}); compare it with another engine") from e
+    return path
+
+
+def spill_chunk(chunk: pd.DataFrame, cols: Sequence[str], n_parts: int, path: str) -> Tuple[str, np.ndarray]:
+    # writes chunk to path with its rows grouped by partition; partition p's rows
+    # are [bounds[p], bounds[p + 1]) of the file
+    parts = partition_ids(chunk, cols, n_parts)
+    order = np.argsort(parts, kind="stable")
+    bounds = np.searchsorted(parts[order], np.arange(n_parts + 1))
+    return _write_feather(chunk.iloc[order].reset_index(drop=True), path), bounds
+
+
+def _spill_file(source: str, cols: Sequence[str], n_parts: int, path: str) -> Tuple[str, np.ndarray]:
+    # Runs in a worker process: spill_chunk of a chunk the parent wrote as is
+    from pyarrow import feather
+
+    chunk = feather.read_table(source, memory_map=True).to_pandas(integer_object_nulls=True)
+    out = spill_chunk(chunk, cols, n_parts, path)
+    os.remove(source)
+    return out
+
+
+class _Spill:
+    # One side, hash-partitioned to disk: every chunk becomes one Feather file with
+    # its rows grouped by partition, so partition p is a slice of each chunk file.
+    # With a pool the chunks are written as they are and partitioned by the workers.
+    def __init__(self, root: str, side: str, n_parts: int, pool: Optional[ProcessPoolExecutor] = None):
+        self.dir = os.path.join(root, side)
+        os.makedirs(self.dir, exist_ok=True)
+        self.n_parts = n_parts
+        self.pool = pool
+        # (file, bounds) per chunk, see spill_chunk; futures of them with a pool
+        self.chunks: List = []
+        self.empty: Optional[pd.DataFrame] = None
+
+    def write(self, chunk: pd.DataFrame, cols: Sequence[str]):
+        if self.empty is None:
+            self.empty = chunk.iloc[:0]
+        if chunk.empty:
+            return
+        path = os.path.join(self.dir, f"chunk{len(self.chunks):06d}.feather")
+        if self.pool is None:
+            self.chunks.append(spill_chunk(chunk, cols, self.n_parts, path))
+            return
+        source = _write_feather(chunk.reset_index(drop=True), path[:-len(".feather")] + ".raw.feather")
+        self.chunks.append(self.pool.submit(_spill_file, source, list(cols), self.n_parts, path))
+
+    def finish(self):
+        self.chunks = [c.result() if isinstance(c, Future) else c for c in self.chunks]
+
+    def has_rows(self, p: int) -> bool:
+        return any(bounds[p + 1] > bounds[p] for _, bounds in self.chunks)
+
+
+def read_partition(chunks: Sequence[Tuple[str, np.ndarray]], p: int, empty: pd.DataFrame) -> pd.DataFrame:
+    import pyarrow as pa
+    from pyarrow import feather
+
+    tables = [feather.read_table(path, memory_map=True).slice(bounds[p], bounds[p + 1] - bounds[p])
+              for path, bounds in chunks if bounds[p + 1] > bounds[p]]
+    if not tables:
+        return empty
+    try:
+        # chunks may infer different types for an object column (null vs string)
+        return pa.concat_tables(tables, promote_options="permissive").to_pandas(integer_object_nulls=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pd.concat([t.to_pandas(integer_object_nulls=True) for t in tables], ignore_index=True)
+
+
+def _merge_partition(left: pd.DataFrame, right: pd.DataFrame,
+                     cols_1: Sequence[str], cols_2: Sequence[str],
+                     suffixes: Tuple[str, str], validate: Optional[str]) -> pd.DataFrame:
+    return pd.merge(left, right,
+                    left_on=cols_1,
+                    right_on=cols_2,
+                    how="outer",
+                    suffixes=suffixes,
+                    indicator=True,
+                    validate=validate)
+
+
+def _merge_partition_files(left: Sequence[Tuple[str, np.ndarray]], right: Sequence[Tuple[str, np.ndarray]],
+                           empty_1: pd.DataFrame, empty_2: pd.DataFrame,
+                           cols_1: Sequence[str], cols_2: Sequence[str],
+                           suffixes: Tuple[str, str], validate: Optional[str],
+                           p: int, out_path: str) -> Tuple[str, np.ndarray]:
+    # Merges partition p and writes it to out_path with its rows grouped by
+    # CATEGORIES; returns the file and the row count of each category. Runs in a
+    # worker process for the parallel engine: inputs are memory-mapped Arrow IPC
+    # files and the result goes back the same way, so only paths and empty
+    # schemas are pickled.
+    part = _merge_partition(read_partition(left, p, empty_1), read_partition(right, p, empty_2),
+                            cols_1, cols_2, suffixes, validate)
+    # _merge codes follow MERGE_CATEGORIES (left_only, right_only, both)
+    rank = np.array([1, 2, 0], dtype=np.int8)[part["_merge"].cat.codes.to_numpy()]
+    order = np.argsort(rank, kind="stable")
+    counts = np.bincount(rank, minlength=len(CATEGORIES)).astype(np.int64)
+    return _write_feather(part.take(order).reset_index(drop=True), out_path), counts
+
+
+class PartitionedResult(Mapping):
+    # compare_columns result of the partitioned engines. Every partition's merge
+    # stays on disk as an Arrow IPC file; a frame is only read back (and then
+    # cached) when it's looked up, and a window reads just the rows asked for.
+    # The files are removed with the result.
+    def __init__(self, root: str, parts: List[Tuple[str, np.ndarray]], empty: pd.DataFrame):
+        self._root = root
+        self._parts = parts
+        # columns and dtypes of a result with no rows
+        self._empty = empty
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._cleanup = weakref.finalize(self, shutil.rmtree, root, True)
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        per_category = dict(zip(CATEGORIES, np.sum([c for _, c in self._parts], axis=0, dtype=np.int64)
+                                if self._parts else np.zeros(len(CATEGORIES), dtype=np.int64)))
+        return {key: int(sum(per_category[c] for c in KEY_CATEGORIES[key])) for key in RESULT_KEYS}
+
+    def segments(self, key: str) -> List[Tuple[str, int, int]]:
+        # (file, first row, rows) of every piece of a frame, in its row order
+        if key not in KEY_CATEGORIES:
+            raise KeyError(key)
+        out = []
+        for c in KEY_CATEGORIES[key]:
+            i = CATEGORIES.index(c)
+            for path, counts in self._parts:
+                if counts[i]:
+                    out.append((path, int(counts[:i].sum()), int(counts[i])))
+        return out
+
+    def read(self, path: str, columns: Optional[Sequence[int]] = None, rows=None) -> pd.DataFrame:
+        # rows: (first, count) slice or positions of the partition file
+        from pyarrow import feather
+
+        table = feather.read_table(path, columns=list(columns) if columns is not None else None,
+                                   memory_map=True)
+        table = table.slice(*rows) if isinstance(rows, tuple) else table.take(rows)
+        df = table.to_pandas(integer_object_nulls=True)
+        # the files may hold placeholder names, see partitioned_compare
+        df.columns = self._empty.columns if columns is None else self._empty.columns[list(columns)]
+        return df
+
+    def _build(self, key: str) -> pd.DataFrame:
+        pieces = [self.read(path, rows=(first, n)) for path, first, n in self.segments(key)]
+        if not pieces:
+            return self._empty.copy()
+        return pieces[0] if len(pieces) == 1 else pd.concat(pieces, ignore_index=True)
+
+    def window(self, key: str) -> "PartitionWindow":
+        return PartitionWindow(self, key)
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in RESULT_KEYS:
+            raise KeyError(key)
+        if key not in self._frames:
+            self._frames[key] = self._build(key)
+        return self._frames[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(RESULT_KEYS)
+
+    def __len__(self) -> int:
+        return len(RESULT_KEYS)
+
+
+class PartitionWindow:
+    # Row-addressable view of one PartitionedResult frame (see
+    # index_compare.ResultWindow): rows are read from the partition files on demand.
+    def __init__(self, result: PartitionedResult, key: str):
+        self._result = result
+        self._segments = result.segments(key)
+        self._starts = np.concatenate([[0], np.cumsum([n for _, _, n in self._segments])]).astype(np.int64)
+        self._dtypes: Optional[pd.Series] = None
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._result._empty.columns
+
+    def __len__(self) -> int:
+        return int(self._starts[-1])
+
+    def _read(self, positions: np.ndarray, columns: Optional[Sequence[int]]) -> pd.DataFrame:
+        positions = np.asarray(positions, dtype=np.int64)
+        seg = np.searchsorted(self._starts, positions, side="right") - 1
+        order = np.argsort(seg, kind="stable")
+        parts = []
+        for s in np.unique(seg):
+            local = positions[order][seg[order] == s] - self._starts[s]
+            path, first, _ = self._segments[s]
+            parts.append(self._result.read(path, columns, local + first))
+        if not parts:
+            empty = self._result._empty
+            return empty.copy() if columns is None else empty.iloc[:, list(columns)].copy()
+        out = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        if len(parts) > 1:
+            out = out.take(np.argsort(order, kind="stable")).reset_index(drop=True)
+        return out
+
+    def sample(self) -> pd.DataFrame:
+        # first row of every segment, which has the dtypes the whole window has
+        return self._read(self._starts[:-1][np.diff(self._starts) > 0], None)
+
+    def rows(self, positions: np.ndarray, columns: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        out = self._read(positions, columns)
+        # partitions come back with their own dtypes (int in one, float with
+        # nulls in another); every read gets the dtypes of the whole frame
+        if self._dtypes is None:
+            self._dtypes = self.sample().dtypes
+        dtypes = self._dtypes.iloc[list(columns)] if columns is not None else self._dtypes
+        changed = {c: t for c, t in zip(out.columns, dtypes) if out[c].dtype != t}
+        return out.astype(changed) if changed else out
+
+    def column(self, pos: int) -> pd.Series:
+        return self.rows(np.arange(len(self)), [pos]).iloc[:, 0]
+
+
+def _placeholders(names: Dict, df: pd.DataFrame) -> pd.DataFrame:
+    # Arrow files need string column names, so columns are spilled and merged
+    # under placeholders. Both sides share the mapping: a name on both sides gets
+    # the same placeholder and is suffixed by the merge as it would be.
+    for c in df.columns:
+        if c not in names:
+            names[c] = f"__c{len(names)}__"
+    out = df.copy(deep=False)
+    out.columns = [names[c] for c in df.columns]
+    return out
+
+
+def partitioned_compare(data_1: Frames, data_2: Frames,
+                        cols_1: Sequence[str], cols_2: Sequence[str],
+                        *, suffixes: Tuple[str, str] = ("_A", "_B"),
+                        validate: Optional[str] = None,
+                        memory_budget: int = 1 << 30,
+                        n_partitions: Optional[int] = None,
+                        spill_dir: Optional[str] = None,
+                        workers: int = 1) -> PartitionedResult:
+    # Peak memory is about one partition merge (memory_budget) on top of the
+    # inputs: the partition results are written to spill_dir and read back lazily.
+    # workers > 1 partitions the chunks and merges the partitions in a process pool;
+    # every worker holds one partition merge at a time, so memory_budget applies per
+    # worker.
+    cols_1 = list(cols_1)
+    cols_2 = list(cols_2)
+    workers = max(1, workers)
+
+    if n_partitions is None:
+        if isinstance(data_1, pd.DataFrame) and isinstance(data_2, pd.DataFrame):
+            total = (frame_nbytes(data_1) + frame_nbytes(data_2)) * MERGE_OVERHEAD
+            n_partitions = max(1, math.ceil(total / memory_budget))
+        else:
+            n_partitions = 64
+        if workers > 1:
+            # a few partitions per worker keeps the pool busy when key hashes are skewed
+            n_partitions = max(n_partitions, workers * 4)
+    chunk_bytes = max(1, memory_budget // (2 * MERGE_OVERHEAD))
+    if isinstance(data_1, pd.DataFrame) and isinstance(data_2, pd.DataFrame):
+        # fail before anything is spilled
+        check_key_dtypes(data_1, data_2, cols_1, cols_2, suffixes)
+
+    root = tempfile.mkdtemp(prefix="datacomp_", dir=spill_dir)
+    # spawn rather than fork: the GUI process has Qt and pool threads running
+    pool = (ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            if workers > 1 else None)
+    try:
+        names: Dict = {}
+        spills = []
+        for side, data, cols in (("a", data_1, cols_1), ("b", data_2, cols_2)):
+            # the parent only writes the chunks, the workers hash and split them
+            spill = _Spill(root, side, n_partitions, pool)
+            for chunk in _iter_chunks(data, chunk_bytes):
+                chunk = _placeholders(names, chunk)
+                spill.write(chunk, [names[c] for c in cols])
+            if spill.empty is None:
+                raise ValueError(f"No data was provided for side {side.upper()}")
+            spills.append(spill)
+        for spill in spills:
+            spill.finish()
+        spill_1, spill_2 = spills
+        empty_1, empty_2 = (s.empty for s in spills)
+        originals = {v: k for k, v in names.items()}
+
+        # the columns of the result (and key dtype errors of chunked inputs)
+        empty = pd.merge(empty_1.set_axis([originals[c] for c in empty_1.columns], axis=1),
+                         empty_2.set_axis([originals[c] for c in empty_2.columns], axis=1),
+                         left_on=cols_1, right_on=cols_2, how="outer", suffixes=suffixes, indicator=True)
+        keys_1 = [names[c] for c in cols_1]
+        keys_2 = [names[c] for c in cols_2]
+
+        used = [p for p in range(n_partitions) if spill_1.has_rows(p) or spill_2.has_rows(p)]
+        out_dir = os.path.join(root, "out")
+        os.makedirs(out_dir)
+        args = [(spill_1.chunks, spill_2.chunks, empty_1, empty_2, keys_1, keys_2, suffixes, validate,
+                 p, os.path.join(out_dir, f"part{p:05d}.feather")) for p in used]
+        if pool is not None and len(used) > 1:
+            parts = list(pool.map(_merge_partition_files, *zip(*args)))
+        else:
+            parts = [_merge_partition_files(*a) for a in args]
+        for spill in spills:
+            shutil.rmtree(spill.dir, ignore_errors=True)
+    except BaseException:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        shutil.rmtree(root, ignore_errors=True)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return PartitionedResult(root, parts, empty)
@@ -0,0 +1,302 @@
+import pandas as pd
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+from .frame_io import read_frame, write_frame
+
+# Parsing in worker processes, so CPU-bound readers (read_excel, read_sas, ...)
+# don't hold the loading process' GIL and a big CSV is parsed on several cores.
+# Workers write what they parsed as Arrow IPC (Feather) files, in shared memory
+# where there is some (/dev/shm), and the loading process memory-maps them: the
+# data never goes through a pipe or pickle. Arrow-backed frames (the "pyarrow"
+# load engine) keep pointing into the mapping; NumPy-backed ones are converted
+# from it in one pass. Column names go back with the file, as Arrow only keeps
+# strings (an Excel sheet's 2020 header would come back as "2020"). A frame Arrow
+# can't hold at all (a mixed-type object column) goes back pickled instead.
+
+# formats that are worth a process; Parquet/Feather are already fast to read and
+# a pickle would only be pickled again
+PROCESS_FORMATS = ('.csv', '.txt', '.tsv', '.json', '.xlsx', '.xls', '.xlsm', '.xlsb', '.ods',
+                   '.html', '.dta', '.sas7bdat', '.xpt')
+SPLIT_FORMATS = ('.csv', '.txt', '.tsv')
+SCAN_BLOCK = 16 << 20
+
+# progress(bytes_read, total_bytes, rows_parsed)
+ProgressCallback = Callable[[int, int, int], None]
+# what a worker returns: (Feather file or the frame itself, rows, column names
+# when the file holds placeholders for them)
+PartResult = Tuple[Union[str, pd.DataFrame], int, Optional[pd.Index]]
+
+
+def _shared_dir() -> Optional[str]:
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _write_part(df: pd.DataFrame, out_base: str) -> PartResult:
+    names = None
+    if not all(isinstance(c, str) for c in df.columns):
+        names = df.columns
+        df = df.set_axis([f"__c{i}__" for i in range(len(names))], axis=1)
+    try:
+        return write_frame(df, out_base, "feather"), len(df), names
+    except ValueError:
+        return df.set_axis(names, axis=1) if names is not None else df, len(df), None
+
+
+def _parse_file(path: str, engine: str, columns: Optional[List[str]], out_base: str) -> PartResult:
+    from .data_service import DataService
+    df = DataService(load_engine=engine).get_data(path, columns=columns)
+    return _write_part(df, out_base)
+
+
+def _parse_range(path: str, start: int, end: int, names: List[str], sep: str, engine: str,
+                 columns: Optional[List[str]], out_base: str,
+                 text_columns: Sequence[str] = ()) -> PartResult:
+    # text_columns are read as text whatever they look like (see ParsePool._text_columns)
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if engine == "pyarrow":
+        import pyarrow as pa
+        from pyarrow import csv, feather
+        table = csv.read_csv(io.BytesIO(data),
+                             read_options=csv.ReadOptions(column_names=names),
+                             parse_options=csv.ParseOptions(delimiter=sep),
+                             convert_options=csv.ConvertOptions(include_columns=columns,
+                                                                column_types={c: pa.string() for c in text_columns}))
+        feather.write_feather(table, out_base + ".feather", compression="uncompressed")
+        return out_base + ".feather", table.num_rows, None
+    df = pd.read_csv(io.BytesIO(data), sep=sep, header=None, names=names, usecols=columns, low_memory=False,
+                     dtype={c: str for c in text_columns} or None)
+    return _write_part(df, out_base)
+
+
+def _warm():
+    # imports what the parse functions need so the first real load doesn't pay for it
+    from . import data_service  # noqa: F401
+
+
+def row_starts(path: str, targets: Sequence[int]) -> List[int]:
+    # For every target offset, the start of the first row at or after it: just
+    # past a newline that isn't inside a quoted field (even number of quotes
+    # before it). Ascending targets; the file is scanned once.
+    out: List[int] = []
+    quotes = 0
+    pos = 0
+    t = 0
+    with open(path, "rb") as f:
+        while t < len(targets):
+            block = f.read(SCAN_BLOCK)
+            if not block:
+                break
+            i = block.find(b"\n", max(targets[t] - pos, 0))
+            counted, parity = 0, quotes
+            while i != -1:
+                parity += block.count(b'"', counted, i)
+                counted = i
+                if parity % 2 == 0:
+                    out.append(pos + i + 1)
+                    t += 1
+                    if t == len(targets):
+                        break
+                    i = block.find(b"\n", max(targets[t] - pos, i + 1))
+                else:
+                    i = block.find(b"\n", i + 1)
+            quotes += block.count(b'"')
+            pos += len(block)
+    return out
+
+
+def csv_ranges(path: str, parts: int) -> Tuple[List[Tuple[int, int]], int]:
+    # (start, end) byte ranges of whole rows after the header, and the header end
+    size = os.path.getsize(path)
+    header_end = (row_starts(path, [0]) or [size])[0]
+    body = size - header_end
+    targets = [header_end + body * i // parts for i in range(1, parts)]
+    cuts = sorted(set(c for c in row_starts(path, targets) if c < size))
+    bounds = [header_end, *cuts, size]
+    ranges = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    return ranges, header_end
+
+
+class ParsePool:
+    # Worker processes for DataService.get_data; created on first use. CSVs of at
+    # least split_bytes are cut into about split_bytes-sized byte ranges on row
+    # boundaries and parsed in parallel; other files are parsed whole by one worker.
+    split_bytes = 64 << 20
+
+    def __init__(self, workers: Optional[int] = None, formats: Sequence[str] = PROCESS_FORMATS):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.formats = tuple(formats)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._dir: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._dir = tempfile.mkdtemp(prefix="datacomp_parse_", dir=_shared_dir())
+                # spawn rather than fork: the GUI process has Qt and pool threads running
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def warm(self):
+        # starts the workers in the background, e.g. once the window is up
+        pool = self._pool()
+        for _ in range(self.workers):
+            pool.submit(_warm)
+
+    def _out_base(self) -> str:
+        return os.path.join(self._dir, uuid.uuid4().hex)
+
+    def parse(self, path: str, engine: str, columns: Optional[Sequence[str]] = None,
+              progress: Optional[ProgressCallback] = None,
+              cancel: Optional[threading.Event] = None) -> pd.DataFrame:
+        pool = self._pool()
+        columns = list(columns) if columns is not None else None
+        ext = os.path.splitext(path)[1].lower()
+        total = os.path.getsize(path)
+        parts = min(self.workers * 2, total // self.split_bytes)
+
+        if ext in SPLIT_FORMATS and parts > 1:
+            sep = "\t" if ext == ".tsv" else ","
+            names = list(pd.read_csv(path, sep=sep, nrows=0).columns)
+            missing = [c for c in columns or [] if c not in names]
+            if missing:
+                raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+            ranges, _ = csv_ranges(path, parts)
+            futures = [pool.submit(_parse_range, path, start, end, names, sep, engine, columns, self._out_base())
+                       for start, end in ranges]
+            sizes = [end - start for start, end in ranges]
+        else:
+            ranges = None
+            futures = [pool.submit(_parse_file, path, engine, columns, self._out_base())]
+            sizes = [total]
+
+        parts = self._collect(futures, sizes, total, progress, cancel, path)
+        try:
+            if ranges is not None:
+                # every range works out its own dtypes: a column that is text in some
+                # ranges ("X99") but numbers in others is read again as text where it
+                # wasn't, so it comes out as a single read gives it (all str, "007" kept)
+                text = self._text_columns(parts)
+                redo = [i for i, cols in enumerate(text) if cols]
+                if redo:
+                    futures = [pool.submit(_parse_range, path, *ranges[i], names, sep, engine, columns,
+                                           self._out_base(), text[i]) for i in redo]
+                    redone = self._collect(futures, [sizes[i] for i in redo], sum(sizes[i] for i in redo),
+                                           None, cancel, path)
+                    for i, part in zip(redo, redone):
+                        _remove(parts[i][0])
+                        parts[i] = part
+            # Arrow-backed dtypes only where DataService reads the format with Arrow
+            # in process; a worker's read_excel etc. frame comes back as it was
+            return self._read(parts, engine == "pyarrow" and ext in SPLIT_FORMATS)
+        finally:
+            for part, _ in parts:
+                _remove(part)
+
+    @staticmethod
+    def _text_columns(parts: List[Tuple[Union[str, pd.DataFrame], Optional[pd.Index]]]) -> List[List[str]]:
+        # per part, the columns it didn't read as text that another part did
+        import pyarrow as pa
+
+        types = []
+        for part, _ in parts:
+            if isinstance(part, pd.DataFrame):
+                types.append({c: part[c].dtype == object for c in part.columns})
+            else:
+                schema = pa.ipc.open_file(pa.memory_map(part)).schema
+                types.append({f.name: pa.types.is_string(f.type) or pa.types.is_large_string(f.type)
+                              for f in schema})
+        text = {c for t in types for c, is_text in t.items() if is_text}
+        return [[c for c, is_text in t.items() if c in text and not is_text] for t in types]
+
+    def _collect(self, futures: List[Future], sizes: List[int], total: int,
+                 progress: Optional[ProgressCallback], cancel: Optional[threading.Event],
+                 path: str) -> List[Tuple[Union[str, pd.DataFrame], Optional[pd.Index]]]:
+        from .data_service import LoadCancelled
+
+        pending = set(futures)
+        done_bytes = 0
+        rows = 0
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if cancel is not None and cancel.is_set():
+                    raise LoadCancelled(path)
+                for f in done:
+                    n = f.result()[1]
+                    done_bytes += sizes[futures.index(f)]
+                    rows += n
+                if done and progress is not None:
+                    progress(done_bytes, total, rows)
+        except BaseException:
+            # parts still running clean up after themselves
+            for f in futures:
+                if not f.cancel():
+                    f.add_done_callback(_discard)
+            raise
+        return [(part, names) for part, _, names in (f.result() for f in futures)]
+
+    @staticmethod
+    def _read(parts: List[Tuple[Union[str, pd.DataFrame], Optional[pd.Index]]],
+              arrow_dtypes: bool) -> pd.DataFrame:
+        if arrow_dtypes and all(isinstance(p, str) for p, _ in parts):
+            from pyarrow import feather
+            tables = [feather.read_table(p, memory_map=True) for p, _ in parts]
+            table = tables[0] if len(tables) == 1 else _concat_tables(tables)
+            df = table.to_pandas(types_mapper=pd.ArrowDtype)
+            return df if parts[0][1] is None else df.set_axis(parts[0][1], axis=1)
+        frames = []
+        for part, names in parts:
+            if isinstance(part, str):
+                part = read_frame(part, arrow_dtypes=arrow_dtypes)
+            frames.append(part if names is None else part.set_axis(names, axis=1))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._dir is not None:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+
+
+def _concat_tables(tables):
+    import pyarrow as pa
+    try:
+        # parts may infer different types for a column (int in one, double in another)
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # ... or ones that don't promote (int and string): those become text
+        mixed = {name for name in tables[0].column_names
+                 if len({t.schema.field(name).type for t in tables}) > 1}
+        tables = [t.cast(pa.schema([pa.field(f.name, pa.string()) if f.name in mixed else f for f in t.schema]))
+                  for t in tables]
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+def _remove(part: Union[str, pd.DataFrame]):
+    # a memory-mapped file can be unlinked while mapped (not on Windows, where the
+    # whole directory goes at shutdown)
+    if not isinstance(part, str):
+        return
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+
+
+def _discard(future: Future):
+    if not future.cancelled() and future.exception() is None:
+        _remove(future.result()[0])
@@ -0,0 +1,160 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+from .utility_funcs import format_bytes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> Optional[int]:
+    # resident set size from /proc (Linux), None where that isn't available
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    # One timed phase. rss_delta is the change in resident memory over the phase,
+    # peak_delta how far it pushed the process' memory high-water mark (0 when it
+    # stayed under an earlier peak).
+    __slots__ = ("name", "args", "thread", "start_ns", "dur_ns", "rss_delta", "peak_delta",
+                 "children", "_rss", "_peak")
+
+    def __init__(self, name: str, args: Dict):
+        self.name = name
+        self.args = args
+        self.thread = threading.get_ident()
+        self.children: List["Span"] = []
+        self.dur_ns = 0
+        self.rss_delta: Optional[int] = None
+        self.peak_delta: Optional[int] = None
+        self._rss = current_rss()
+        self._peak = peak_rss()
+        self.start_ns = time.perf_counter_ns()
+
+    def _close(self):
+        self.dur_ns = time.perf_counter_ns() - self.start_ns
+        rss, peak = current_rss(), peak_rss()
+        if rss is not None and self._rss is not None:
+            self.rss_delta = rss - self._rss
+        if peak is not None and self._peak is not None:
+            self.peak_delta = peak - self._peak
+
+    @property
+    def seconds(self) -> float:
+        return self.dur_ns / 1e9
+
+    def phase_totals(self) -> Dict[str, float]:
+        # Seconds spent in each phase below this span, by name. Time is counted
+        # where it is spent (a span minus its children), so nested phases don't
+        # double count and repeated ones (e.g. one per batch) add up.
+        totals: Dict[str, float] = {}
+        todo = list(self.children)
+        while todo:
+            span = todo.pop()
+            own = span.dur_ns - sum(c.dur_ns for c in span.children)
+            totals[span.name] = totals.get(span.name, 0.0) + own / 1e9
+            todo.extend(span.children)
+        return totals
+
+    def summary(self, max_phases: int = 4) -> str:
+        # "parse 1.21s · concat 0.08s :: 1.34s :: peak +412.0 MB"
+        phases = sorted(self.phase_totals().items(), key=lambda item: -item[1])
+        parts = [f"{name} {sec:.2f}s" for name, sec in phases[:max_phases] if sec >= 0.005]
+        text = " · ".join(parts)
+        text = f"{text} :: {self.seconds:.2f}s" if text else f"{self.seconds:.2f}s"
+        if self.peak_delta:
+            text += f" :: peak +{format_bytes(self.peak_delta)}"
+        return text
+
+
+class Tracer:
+    # Records nested timing spans with memory deltas. Each span costs two clock
+    # reads, a /proc read and a getrusage call, so it stays on; only the last
+    # max_spans spans are kept. export_chrome_trace writes them for chrome://tracing
+    # or Perfetto.
+    max_spans = 20_000
+
+    def __init__(self, enabled: bool = True, max_spans: Optional[int] = None):
+        self.enabled = enabled
+        self._spans: Deque[Span] = deque(maxlen=max_spans or self.max_spans)
+        self._local = threading.local()
+        self._origin_ns = time.perf_counter_ns()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+        stack = self._stack()
+        span = Span(name, args)
+        if stack:
+            stack[-1].children.append(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span._close()
+            stack.pop()
+            self._spans.append(span)
+
+    def current(self) -> Optional[Span]:
+        # innermost open span of the calling thread
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @property
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+    def chrome_trace(self) -> Dict:
+        pid = os.getpid()
+        events = []
+        for s in list(self._spans):
+            args = {k: str(v) for k, v in s.args.items()}
+            if s.rss_delta is not None:
+                args["rss_delta_bytes"] = s.rss_delta
+            if s.peak_delta is not None:
+                args["peak_delta_bytes"] = s.peak_delta
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": (s.start_ns - self._origin_ns) / 1000,
+                "dur": s.dur_ns / 1000,
+                "pid": pid,
+                "tid": s.thread,
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
@@ -0,0 +1,50 @@
+import pandas as pd
+from typing import Callable, List, Optional, Sequence
+
+# load(columns) -> frame with exactly those columns, in that order
+ColumnLoader = Callable[[List[str]], pd.DataFrame]
+
+
+class ProjectedFrame:
+    # A dataset of which only some columns have been parsed. The full schema is
+    # known up front (from the header / file metadata); any other column is read
+    # from the source the first time it is asked for and kept from then on.
+    def __init__(self, schema: Sequence[str], load: ColumnLoader,
+                 columns: Optional[Sequence[str]] = None):
+        self.schema = list(schema)
+        self._load = load
+        self.frame = pd.DataFrame()
+        self.ensure(columns if columns is not None else [])
+
+    @property
+    def loaded_columns(self) -> List[str]:
+        return list(self.frame.columns)
+
+    def ensure(self, columns: Sequence[str]) -> pd.DataFrame:
+        # loads whichever of columns are missing and returns just those columns
+        columns = list(dict.fromkeys(columns))
+        unknown = [c for c in columns if c not in self.schema]
+        if unknown:
+            raise KeyError(f"Columns not in dataset: {unknown}")
+        missing = [c for c in columns if c not in self.frame.columns]
+        if missing:
+            extra = self._load(missing)
+            if len(self.frame.columns) == 0:
+                self.frame = extra
+            else:
+                if len(extra) != len(self.frame):
+                    raise RuntimeError("Source changed while loading columns: row count differs")
+                # positional: both loads read the same rows in the same order
+                extra.index = self.frame.index
+                self.frame = pd.concat([self.frame, extra], axis=1)
+            # keep the file's column order
+            self.frame = self.frame[[c for c in self.schema if c in self.frame.columns]]
+        return self.frame[columns]
+
+    def full(self) -> pd.DataFrame:
+        return self.ensure(self.schema)
+
+    def __getitem__(self, columns):
+        if isinstance(columns, str):
+            return self.ensure([columns])[columns]
+        return self.ensure(columns)
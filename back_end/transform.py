@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+# Value transforms ("set B to x where A > 10") and NULL cleaning as whole-column
+# operations. Rules never modify a frame: each step builds a new one that reuses
+# the Series of every column it didn't change, so the undo history holds only the
+# changed columns of each step and the model can re-render just those.
+
+CONDITION_OPS = (">", ">=", "<", "<=", "==", "!=", "is_null", "not_null", "in", "not_in", "contains")
+NULL_FILLS = ("ffill", "bfill")
+
+
+class Condition:
+    def __init__(self, column: str, op: str, value=None):
+        if op not in CONDITION_OPS:
+            raise ValueError(f"Unknown condition: {op}. Expected one of {CONDITION_OPS}")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        # rows that pass; a null never passes a comparison
+        col = _column(df, self.column)
+        op, value = self.op, self.value
+        if op == "is_null":
+            return col.isna().to_numpy()
+        if op == "not_null":
+            return col.notna().to_numpy()
+        if op in ("in", "not_in"):
+            hit = col.isin(list(value)).to_numpy(dtype=bool, na_value=False)
+            return hit if op == "in" else ~hit & col.notna().to_numpy()
+        if op == "contains":
+            text = col.astype("string").str.contains(str(value), regex=False, na=False)
+            return text.to_numpy(dtype=bool, na_value=False)
+        compare = {">": col.gt, ">=": col.ge, "<": col.lt, "<=": col.le, "==": col.eq, "!=": col.ne}[op]
+        try:
+            result = compare(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Can't compare column {self.column!r} ({col.dtype}) with {value!r}: {e}")
+        hit = result.to_numpy(dtype=bool, na_value=False)
+        return hit & col.notna().to_numpy() if op == "!=" else hit
+
+    def __repr__(self):
+        return f"{self.column} {self.op} {self.value!r}"
+
+
+def where_mask(df: pd.DataFrame, where: Sequence[Condition]) -> np.ndarray:
+    # rows passing every condition (all rows without conditions)
+    mask = np.ones(len(df), dtype=bool)
+    for cond in where:
+        mask &= cond.mask(df)
+    return mask
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name not in df.columns:
+        raise KeyError(f"Column {name!r} not found")
+    return df[name]
+
+
+class Rule(ABC):
+    # apply() returns the new Series of every column it changes (new names are
+    # added at the end), and a row mask when it drops rows instead
+    @abstractmethod
+    def apply(self, df: pd.DataFrame) -> Union[Dict[str, pd.Series], np.ndarray]:
+        ...
+
+
+class SetValues(Rule):
+    # column = value (or from_column's value) on rows matching every where condition
+    def __init__(self, column: str, value=None, where: Sequence[Condition] = (),
+                 from_column: Optional[str] = None):
+        self.column = column
+        self.value = value
+        self.where = list(where)
+        self.from_column = from_column
+
+    def apply(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        mask = where_mask(df, self.where)
+        if not mask.any():
+            return {}
+        other = _column(df, self.from_column) if self.from_column is not None else self.value
+        if self.column not in df.columns:
+            new = pd.Series(other, index=df.index) if np.isscalar(other) or other is None else other.copy()
+            return {self.column: new.where(mask)}
+        # mask() upcasts (e.g. int -> object for text) instead of failing
+        return {self.column: df[self.column].mask(mask, other)}
+
+    def __repr__(self):
+        what = self.from_column if self.from_column is not None else repr(self.value)
+        where = f" where {' and '.join(map(repr, self.where))}" if self.where else ""
+        return f"set {self.column} = {what}{where}"
+
+
+class FillNulls(Rule):
+    # nulls in columns (all columns by default) become value, or the previous
+    # ("ffill") or next ("bfill") non-null value
+    def __init__(self, columns: Optional[Sequence[str]] = None, value=None, method: Optional[str] = None):
+        if (value is None) == (method is None):
+            raise ValueError("Fill nulls with either a value or a method")
+        if method is not None and method not in NULL_FILLS:
+            raise ValueError(f"Unknown fill method: {method}. Expected one of {NULL_FILLS}")
+        self.columns = list(columns) if columns is not None else None
+        self.value = value
+        self.method = method
+
+    def apply(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        out = {}
+        for name in self.columns if self.columns is not None else df.columns:
+            col = _column(df, name)
+            if not col.hasnans:
+                # nothing to fill: the column (and its rendering) stays as it is
+                continue
+            if self.method == "ffill":
+                out[name] = col.ffill()
+            elif self.method == "bfill":
+                out[name] = col.bfill()
+            else:
+                out[name] = col.mask(col.isna(), self.value)
+        return out
+
+    def __repr__(self):
+        return f"fill nulls in {self.columns or 'all columns'} with {self.method or repr(self.value)}"
+
+
+class DropNulls(Rule):
+    # drops rows with a null in any (how="any") or all (how="all") of columns
+    def __init__(self, columns: Optional[Sequence[str]] = None, how: str = "any"):
+        if how not in ("any", "all"):
+            raise ValueError(f"Unknown how: {how}. Expected \"any\" or \"all\"")
+        self.columns = list(columns) if columns is not None else None
+        self.how = how
+
+    def apply(self, df: pd.DataFrame) -> np.ndarray:
+        cols = self.columns if self.columns is not None else list(df.columns)
+        nulls = np.column_stack([_column(df, c).isna().to_numpy() for c in cols]) if cols else \
+            np.zeros((len(df), 1), dtype=bool)
+        drop = nulls.any(axis=1) if self.how == "any" else nulls.all(axis=1)
+        return ~drop
+
+    def __repr__(self):
+        return f"drop rows with {self.how} null in {self.columns or 'all columns'}"
+
+
+RULES = {"set": SetValues, "fill_nulls": FillNulls, "drop_nulls": DropNulls}
+
+
+def compile_rule(spec: Union[Rule, Mapping]) -> Rule:
+    # {"action": "set", "column": "B", "value": "x", "where": [{"column": "A", "op": ">", "value": 10}]}
+    # {"action": "fill_nulls", "columns": ["A"], "value": 0} / {"action": "drop_nulls", "how": "all"}
+    if isinstance(spec, Rule):
+        return spec
+    spec = dict(spec)
+    action = spec.pop("action", None)
+    if action not in RULES:
+        raise ValueError(f"Unknown action: {action}. Expected one of {tuple(RULES)}")
+    if "where" in spec:
+        spec["where"] = [c if isinstance(c, Condition) else Condition(**c) for c in spec["where"]]
+    try:
+        return RULES[action](**spec)
+    except TypeError as e:
+        raise ValueError(f"Invalid {action} rule: {e}")
+
+
+def compile_rules(specs) -> List[Rule]:
+    if isinstance(specs, (Rule, Mapping)):
+        specs = [specs]
+    return [compile_rule(s) for s in specs]
+
+
+class TransformResult:
+    # frame after a step; changed: columns with new values; reshaped: rows were
+    # dropped/restored or columns added/removed, so nothing of the old view holds
+    def __init__(self, frame: pd.DataFrame, changed: List[str], reshaped: bool):
+        self.frame = frame
+        self.changed = changed
+        self.reshaped = reshaped
+
+
+def apply_rules(df: pd.DataFrame, rules) -> TransformResult:
+    if not df.columns.is_unique:
+        raise ValueError("Transforms need unique column names")
+    changed: List[str] = []
+    reshaped = False
+    for rule in compile_rules(rules):
+        out = rule.apply(df)
+        if isinstance(out, np.ndarray):
+            if out.all():
+                continue
+            df = df[out]
+            reshaped = True
+            continue
+        if not out:
+            continue
+        added = [c for c in out if c not in df.columns]
+        cols = {c: out.get(c, df[c]) for c in df.columns}
+        cols.update({c: out[c] for c in added})
+        # copy=False: unchanged columns keep sharing their arrays with df
+        df = pd.DataFrame(cols, index=df.index, copy=False)
+        reshaped = reshaped or bool(added)
+        changed.extend(c for c in out if c not in changed)
+    return TransformResult(df, changed, reshaped)
+
+
+class Transformer:
+    # A frame with undo/redo. Every history entry is a frame sharing unchanged
+    # columns with its neighbours, so the history costs the changed columns only.
+    # Frames handed out must not be modified in place.
+    max_history = 50
+
+    def __init__(self, df: pd.DataFrame, tracer=None):
+        self._frames: List[pd.DataFrame] = [df]
+        # what step i changed going from frame i-1 to frame i
+        self._steps: List[TransformResult] = [TransformResult(df, [], False)]
+        self._pos = 0
+        self.tracer = tracer
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._frames[self._pos]
+
+    @property
+    def can_undo(self) -> bool:
+        return self._pos > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._pos < len(self._frames) - 1
+
+    def apply(self, rules) -> TransformResult:
+        # all rules are one step; nothing is recorded when they change nothing
+        if self.tracer is not None:
+            with self.tracer.span("transform", rows=len(self.frame)):
+                result = apply_rules(self.frame, rules)
+        else:
+            result = apply_rules(self.frame, rules)
+        if not result.changed and not result.reshaped:
+            return result
+        del self._frames[self._pos + 1:]
+        del self._steps[self._pos + 1:]
+        self._frames.append(result.frame)
+        self._steps.append(result)
+        if len(self._frames) > self.max_history + 1:
+            del self._frames[0]
+            del self._steps[0]
+        self._pos = len(self._frames) - 1
+        return result
+
+    def undo(self) -> Optional[TransformResult]:
+        if not self.can_undo:
+            return None
+        step = self._steps[self._pos]
+        self._pos -= 1
+        return TransformResult(self.frame, step.changed, step.reshaped)
+
+    def redo(self) -> Optional[TransformResult]:
+        if not self.can_redo:
+            return None
+        self._pos += 1
+        step = self._steps[self._pos]
+        return TransformResult(self.frame, step.changed, step.reshaped)
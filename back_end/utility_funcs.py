@@ -7,4 +7,93 @@ def build_ext_filter(ext_map: dict[str, list[str]]) -> str:
         patterns = " ".join(f"*{ext}" for ext in exts)
         ext_parts.append(f"{label} ({patterns})")
     ext_parts.append(f"All (*)")
-    return ";;".join(ext_parts)
\ No newline at end of file
+    return ";;".join(ext_parts)
+
+def format_bytes(num: int) -> str:
+    size = float(num)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+# largest magnitude up to which every integer is exactly a float64
+FLOAT_EXACT_INT = 1 << 53
+
+
+def key_hashes(df, cols) -> "np.ndarray":
+    # One uint64 per row for a (possibly composite) key. Numbers hash by value, so
+    # an int64 id and the same id stored as float hash alike; ints too large for a
+    # float to hold exactly (beyond 2**53) hash as ints and stay distinct.
+    import numpy as np
+    import pandas as pd
+
+    hashed = None
+    for c in cols:
+        col = df[c]
+        if col.dtype == object:
+            # an object column holding only numbers hashes like the numbers, as
+            # merge matches them (ints read as object on one side, int64 on the other)
+            col = _object_numbers(col)
+        if pd.api.types.is_integer_dtype(col):
+            h = _hash_values(col.to_numpy(dtype="float64", na_value=np.nan))
+            ints = col.to_numpy(dtype="uint64" if pd.api.types.is_unsigned_integer_dtype(col) else "int64",
+                                na_value=0)
+            big = (ints > FLOAT_EXACT_INT) | (ints < -FLOAT_EXACT_INT)
+            if big.any():
+                h[big] = _hash_values(ints[big])
+        elif pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            h = _hash_values(col.to_numpy(dtype="float64", na_value=np.nan))
+        else:
+            h = _hash_values(col if isinstance(col.dtype, pd.CategoricalDtype) else col.to_numpy())
+        # combines the columns' hashes in order
+        hashed = h if hashed is None else (hashed * np.uint64(0x100000001B3)) ^ h
+    return hashed
+
+
+def _object_numbers(col):
+    # col as a numeric column when its non-null values are all numbers; ints with
+    # nulls become Int64 rather than float64, which would round them past 2**53
+    import pandas as pd
+
+    if pd.api.types.infer_dtype(col, skipna=True) not in ("integer", "floating", "mixed-integer-float"):
+        return col
+    null = col.isna().to_numpy()
+    present = col[~null].infer_objects()
+    if not pd.api.types.is_numeric_dtype(present):
+        return col
+    if not null.any():
+        return present
+    if pd.api.types.is_integer_dtype(present):
+        try:
+            return col.astype("Int64")
+        except (TypeError, ValueError, OverflowError):
+            return col
+    return col.astype("float64")
+
+
+def _hash_values(values) -> "np.ndarray":
+    import pandas as pd
+    return pd.util.hash_pandas_object(pd.Series(values, copy=False), index=False).to_numpy()
+
+
+# what a first load needs: imported in the background once the GUI is up (the
+# per-format reader backends are optional, missing ones are skipped)
+WARM_IMPORTS = ("pandas", "back_end.data_service", "pyarrow.parquet", "pyarrow.csv",
+                "pyarrow.feather", "openpyxl")
+
+
+def warm_imports(modules=WARM_IMPORTS) -> dict[str, float]:
+    # seconds each import took (about 0 when it was already imported)
+    import importlib
+    import time
+
+    took = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        took[name] = time.perf_counter() - start
+    return took
@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def paired_columns(columns: Sequence[str], suffixes: Tuple[str, str] = ("_A", "_B")) -> List[str]:
+    # base names that appear as both <base><suffix A> and <base><suffix B>
+    names = set(columns)
+    bases = []
+    for c in columns:
+        if isinstance(c, str) and c.endswith(suffixes[0]):
+            base = c[:len(c) - len(suffixes[0])]
+            if f"{base}{suffixes[1]}" in names:
+                bases.append(base)
+    return bases
+
+
+def _as_float(s: pd.Series) -> np.ndarray:
+    return s.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _is_plain_numeric(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+
+def _normalized(s: pd.Series) -> pd.Series:
+    if (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)
+            or isinstance(s.dtype, pd.CategoricalDtype)):
+        return s.astype("string").str.strip().str.lower()
+    return s
+
+
+def column_changed(a: pd.Series, b: pd.Series, *,
+                   atol: float = 0.0, rtol: float = 0.0,
+                   nan_equal: bool = True,
+                   normalize_str: bool = False) -> np.ndarray:
+    # True where the A and B values of one column pair differ
+    if _is_plain_numeric(a) and _is_plain_numeric(b):
+        x, y = _as_float(a), _as_float(b)
+        if atol or rtol:
+            same = np.isclose(x, y, rtol=rtol, atol=atol, equal_nan=nan_equal)
+        else:
+            same = x == y
+            if nan_equal:
+                same |= np.isnan(x) & np.isnan(y)
+        return ~same
+
+    if normalize_str:
+        a, b = _normalized(a), _normalized(b)
+    a_na = a.isna().to_numpy()
+    b_na = b.isna().to_numpy()
+    if a.dtype == b.dtype and isinstance(a.dtype, np.dtype) and a.dtype.kind != "O":
+        # datetimes, timedeltas, bools: native numpy comparison
+        same = a.to_numpy() == b.to_numpy()
+    else:
+        # pd.NA can't take part in ==, nulls are settled by the masks anyway
+        x = a.to_numpy(dtype=object, copy=True)
+        y = b.to_numpy(dtype=object, copy=True)
+        x[a_na] = None
+        y[b_na] = None
+        same = x == y
+    same = np.asarray(same, dtype=bool) & ~a_na & ~b_na
+    if nan_equal:
+        same |= a_na & b_na
+    return ~same
+
+
+def value_diff(matches: pd.DataFrame,
+               suffixes: Tuple[str, str] = ("_A", "_B"),
+               *, columns: Optional[Sequence[str]] = None,
+               atol: float = 0.0, rtol: float = 0.0,
+               nan_equal: bool = True,
+               normalize_str: bool = False) -> Dict[str, pd.DataFrame | pd.Series]:
+    # Compares every <col>_A / <col>_B pair of a compare_columns "matches" frame
+    # column by column.
+    #   changed         bool frame, one column per compared base name
+    #   row_changed     bool series, any column changed on that row
+    #   mismatch_counts int series, changed rows per column
+    bases = paired_columns(matches.columns, suffixes)
+    if columns is not None:
+        missing = [c for c in columns if c not in bases]
+        if missing:
+            raise KeyError(f"No {suffixes[0]}/{suffixes[1]} column pair for: {missing}")
+        bases = list(columns)
+
+    changed = pd.DataFrame(
+        {base: column_changed(matches[f"{base}{suffixes[0]}"], matches[f"{base}{suffixes[1]}"],
+                              atol=atol, rtol=rtol, nan_equal=nan_equal,
+                              normalize_str=normalize_str)
+         for base in bases},
+        index=matches.index,
+        columns=bases,
+        dtype=bool
+    )
+    return {
+        "changed": changed,
+        "row_changed": changed.any(axis=1),
+        "mismatch_counts": changed.sum(axis=0).astype("int64")
+    }
+
+
+def cell_mask(changed: pd.DataFrame, columns: Sequence[str],
+              suffixes: Tuple[str, str] = ("_A", "_B")) -> np.ndarray:
+    # Spreads a value_diff "changed" frame over the columns of the frame being
+    # displayed: both <col>_A and <col>_B cells are flagged, other columns never are.
+    mask = np.zeros((len(changed), len(columns)), dtype=bool)
+    for i, c in enumerate(columns):
+        if not isinstance(c, str):
+            continue
+        for suffix in suffixes:
+            base = c[:len(c) - len(suffix)]
+            if c.endswith(suffix) and base in changed.columns:
+                mask[:, i] = changed[base].to_numpy()
+                break
+    return mask
@@ -0,0 +1,86 @@
+# Load time and memory of DataService.get_data with the "pandas" and "pyarrow"
+# load engines, per file format. Each measurement runs in a fresh process so peak
+# RSS numbers don't leak between runs (ru_maxrss survives exec, so the parent also
+# stays small and leaves writing the files to a child process).
+# Run from the repository root: python benchmarks/bench_load_engines.py --rows 2000000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from harness import mb, peak_rss_bytes, run_in_child
+
+
+def make_frame(rows: int, seed: int = 0):
+    # string heavy, like the vendor extracts the tool is used on
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    words = np.array([f"customer-{i:06d}" for i in range(50_000)])
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "name": words[rng.integers(0, len(words), rows)],
+        "city": rng.choice(["Springfield", "Riverside", "Franklin", "Greenville"], rows),
+        "note": words[rng.integers(0, len(words), rows)],
+        "amount": rng.random(rows) * 1000,
+        "count": rng.integers(0, 100, rows),
+    })
+
+
+def _measure(path: str, engine: str, queue):
+    sys.path.insert(0, ROOT)
+    from back_end.data_service import DataService
+    import pyarrow  # noqa: F401 - keep import cost out of the measured window
+
+    service = DataService(load_engine=engine)
+    before = peak_rss_bytes()
+    start = time.perf_counter()
+    df = service.get_data(path)
+    seconds = time.perf_counter() - start
+    after = peak_rss_bytes()
+    frame_bytes = int(df.memory_usage(index=False, deep=True).sum())
+    queue.put((seconds, None if before is None else after - before, frame_bytes, len(df)))
+
+
+def _write_files(rows: int, formats: list[str], tmp: str, queue):
+    df = make_frame(rows)
+    paths = {}
+    for fmt in formats:
+        path = os.path.join(tmp, f"data.{fmt}")
+        if fmt == "csv":
+            df.to_csv(path, index=False)
+        elif fmt == "parquet":
+            df.to_parquet(path, index=False)
+        elif fmt == "feather":
+            df.to_feather(path)
+        else:
+            raise ValueError(f"Unsupported benchmark format: {fmt}")
+        paths[fmt] = path
+    queue.put(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare get_data load engines")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "feather"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="datacomp_bench_") as tmp:
+        paths = run_in_child(_write_files, args.rows, args.formats, tmp)
+
+        print(f"rows={args.rows:,}")
+        print(f"{'format':<8} {'engine':<8} {'seconds':>8} {'rows/s':>12} {'peak MB':>9} {'frame MB':>9}")
+        for fmt, path in paths.items():
+            for engine in ("pandas", "pyarrow"):
+                seconds, peak, frame_bytes, rows = run_in_child(_measure, path, engine)
+                print(f"{fmt:<8} {engine:<8} {seconds:>8.2f} {rows / seconds:>12,.0f} "
+                      f"{mb(peak):>9} {mb(frame_bytes):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Scaling of compare_columns(engine="parallel") with the number of worker processes.
+# Run from the repository root: python benchmarks/bench_parallel_compare.py --rows 2000000
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from back_end.data_service import DataService
+
+
+def make_side(rows: int, key_name: str, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        key_name: rng.integers(0, int(rows * 1.2), rows),
+        "region": rng.choice(["north", "south", "east", "west"], rows),
+        "amount": rng.random(rows) * 1000,
+    })
+
+
+def worker_counts(max_workers: int) -> list[int]:
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel compare_columns scaling")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    data_1 = make_side(args.rows, "id", 1)
+    data_2 = make_side(args.rows, "client_id", 2)
+    service = DataService()
+
+    start = time.perf_counter()
+    service.compare_columns(data_1, data_2, ["id", "region"], ["client_id", "region"])
+    baseline = time.perf_counter() - start
+    print(f"rows={args.rows:,} cpus={os.cpu_count()}")
+    print(f"{'engine':<10} {'workers':>7} {'seconds':>9} {'speedup':>8}")
+    print(f"{'merge':<10} {1:>7} {baseline:>9.2f} {1.0:>8.2f}")
+
+    for workers in worker_counts(args.max_workers):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            service.compare_columns(data_1, data_2, ["id", "region"], ["client_id", "region"],
+                                    engine="parallel", workers=workers)
+            best = min(best, time.perf_counter() - start)
+        print(f"{'parallel':<10} {workers:>7} {best:>9.2f} {baseline / best:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Startup benchmark: how long the GUI takes from launch to its first window, and
+# from opening a CSV to its first preview, with the background warm-up on and off.
+# Every run is a fresh interpreter (offscreen Qt), so import costs are counted the
+# way a user pays them:
+#   window   process start -> main window shown
+#   preview  load started (--delay seconds after the window) -> first preview shown
+#   loaded   load started -> full frame loaded
+# Run from the repository root:
+#   python benchmarks/bench_startup.py --runs 5 --output startup.json
+#   python benchmarks/bench_startup.py --delay 0   (file opened as soon as the window is up)
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+METRICS = ("window", "preview", "loaded")
+
+
+def _child(path: str, warm_up: bool, delay: float):
+    # runs in the measured process: prints one JSON line of time.time() stamps
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from ui.gui_mainwindow import MainWindow
+
+    app = QApplication([])
+    win = MainWindow(warm_up=warm_up)
+    stamps = {}
+
+    def done():
+        win.close()
+        app.quit()
+
+    def preview(*_):
+        stamps.setdefault("preview", time.time())
+
+    def loaded(*_):
+        stamps["loaded"] = time.time()
+        # no partial preview (e.g. a small file): the full frame is the first one
+        stamps.setdefault("preview", stamps["loaded"])
+        QTimer.singleShot(0, done)
+
+    def load():
+        stamps["load"] = time.time()
+        win.load_panel("a", path)
+        worker = win._loaders["a"]
+        # queued after the window's own handlers, so the panel has been updated
+        worker.signals.preview.connect(preview)
+        worker.signals.finished.connect(loaded)
+        worker.signals.failed.connect(lambda _, message: (stamps.update(error=message), done()))
+
+    def shown():
+        stamps["window"] = time.time()
+        QTimer.singleShot(int(delay * 1000), load)
+
+    win.show()
+    QTimer.singleShot(0, shown)
+    app.exec()
+    print(json.dumps(stamps), flush=True)
+
+
+def measure(path: str, warm_up: bool, delay: float, cache_dir: str) -> dict:
+    # an empty dataset cache per run, so every load parses the file
+    env = dict(os.environ, XDG_CACHE_HOME=tempfile.mkdtemp(dir=cache_dir))
+    start = time.time()
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", path,
+                           "--warm-up", str(int(warm_up)), "--delay", str(delay)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    stamps = json.loads(proc.stdout.strip().splitlines()[-1])
+    if "error" in stamps:
+        raise RuntimeError(f"Load failed in the benchmark child: {stamps['error']}")
+    return {"window": stamps["window"] - start,
+            "preview": stamps["preview"] - stamps["load"],
+            "loaded": stamps["loaded"] - stamps["load"]}
+
+
+def write_input(path: str, rows: int, columns: int):
+    from datagen import make_pair, write_frame
+
+    a, _ = make_pair(rows, columns=columns)
+    write_frame(a, path, "csv")
+
+
+def run(args) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="datacomp_bench_") as tmp:
+        path = os.path.join(tmp, "startup.csv")
+        write_input(path, args.rows, args.columns)
+        for warm_up in (False, True):
+            runs = [measure(path, warm_up, args.delay, tmp) for _ in range(args.runs)]
+            name = f"startup/warm_up={'on' if warm_up else 'off'}/rows={args.rows}"
+            result = {"name": name, "runs": runs}
+            for metric in METRICS:
+                values = [r[metric] for r in runs]
+                result[f"{metric}_seconds"] = statistics.median(values)
+                result[f"{metric}_min_seconds"] = min(values)
+            results.append(result)
+            report(result)
+    return results
+
+
+def report(result: dict):
+    cells = "  ".join(f"{m} {result[f'{m}_seconds']:.3f}s (min {result[f'{m}_min_seconds']:.3f})"
+                      for m in METRICS)
+    print(f"{result['name']:<36} {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time to first window and first preview")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=6)
+    parser.add_argument("--delay", type=float, default=1.0,
+                        help="seconds between the window showing and the file being opened")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--warm-up", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, bool(args.warm_up), args.delay)
+        return
+
+    doc = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+                    "cpus": os.cpu_count(), "args": vars(args)},
+           "results": run(args)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# Benchmark suite for loading, comparing and rendering, with JSON results and a
+# regression check against a stored baseline.
+#   load     DataService.get_data per file format and load engine
+#   compare  DataService.compare_columns per engine at each --sizes row count
+#   model    DataFrameModel.data (first screen and scrolling) and sort, offscreen Qt
+# Every measurement runs in a fresh process and reports seconds and the peak RSS
+# growth during the measured call. Input files are written by a separate child and
+# compare/model inputs are read back as memory-mapped Feather, so the measuring
+# process starts small and its peak is mostly the measured work.
+# Run from the repository root:
+#   python benchmarks/bench_suite.py --output results.json
+#   python benchmarks/bench_suite.py --sizes 100000 --update-baseline
+#   python benchmarks/bench_suite.py --baseline benchmarks/baseline.json   (exit 1 on regression)
+# The committed baseline.json holds the 100k-row runs of every suite, made with
+#   python benchmarks/bench_suite.py --sizes 100000 --load-rows 100000 --model-rows 100000
+# so checking with the same arguments compares every result; results the baseline
+# has no entry for (other sizes) are listed and not checked. Timings depend on the
+# machine: update the baseline when checking on different hardware.
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from harness import mb, peak_rss_bytes, run_in_child
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather", "json": ".json",
+              "xlsx": ".xlsx", "pkl": ".pkl"}
+
+
+def _write_inputs(spec: dict, tmp: str, queue):
+    # spec: {"load": (rows, formats, gen), "compare": [(rows, gen), ...]}
+    from datagen import make_pair, write_frame
+
+    paths = {"load": {}, "compare": {}}
+    if spec.get("load"):
+        rows, formats, gen = spec["load"]
+        a, _ = make_pair(rows, **gen)
+        for fmt in formats:
+            path = os.path.join(tmp, f"load{EXTENSIONS[fmt]}")
+            write_frame(a, path, fmt)
+            paths["load"][fmt] = path
+    for rows, gen in spec.get("compare", []):
+        a, b = make_pair(rows, **gen)
+        pair = (os.path.join(tmp, f"a_{rows}.feather"), os.path.join(tmp, f"b_{rows}.feather"))
+        write_frame(a, pair[0], "feather")
+        write_frame(b, pair[1], "feather")
+        paths["compare"][rows] = pair
+    queue.put(paths)
+
+
+def _read_feather(path: str):
+    from pyarrow import feather
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def _measure_load(path: str, engine: str, queue):
+    from back_end.data_service import DataService
+    import pyarrow  # noqa: F401 - keep import cost out of the measured window
+
+    service = DataService(load_engine=engine)
+    before = peak_rss_bytes()
+    start = time.perf_counter()
+    df = service.get_data(path)
+    seconds = time.perf_counter() - start
+    after = peak_rss_bytes()
+    queue.put({"seconds": seconds,
+               "peak_rss_delta": None if before is None else after - before,
+               "rows": len(df),
+               "frame_bytes": int(df.memory_usage(index=False, deep=True).sum())})
+
+
+def _measure_compare(pair: tuple[str, str], engine: str, queue):
+    from back_end.data_service import DataService
+
+    a, b = _read_feather(pair[0]), _read_feather(pair[1])
+    service = DataService()
+    before = peak_rss_bytes()
+    start = time.perf_counter()
+    res = service.compare_columns(a, b, "id", "client_id", engine=engine)
+    keyed = time.perf_counter() - start
+    # lazy engines build their frames here, so every engine pays for the full result
+    counts = {k: len(res[k]) for k in ("matches", "left_only", "right_only", "merged")}
+    seconds = time.perf_counter() - start
+    after = peak_rss_bytes()
+    queue.put({"seconds": seconds, "keyed_seconds": keyed,
+               "peak_rss_delta": None if before is None else after - before,
+               "rows": counts["merged"], **{f"{k}_rows": v for k, v in counts.items()}})
+
+
+def _measure_model(path: str, queue):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import numpy as np
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QGuiApplication
+    from ui.gui_dataframemodel import DataFrameModel
+
+    app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841
+    df = _read_feather(path)
+    view_rows, view_cols = 40, min(20, df.shape[1])
+    display = Qt.ItemDataRole.DisplayRole
+
+    def paint(model, top):
+        # what a view asks for when it paints one screen
+        for r in range(top, min(top + view_rows, model.rowCount())):
+            for c in range(view_cols):
+                model.data(model.index(r, c), display)
+
+    before = peak_rss_bytes()
+    out = {}
+    start = time.perf_counter()
+    model = DataFrameModel(df)
+    paint(model, 0)
+    out["first_screen_seconds"] = time.perf_counter() - start
+
+    while model.canFetchMore():
+        model.fetchMore()
+    rng = np.random.default_rng(0)
+    tops = rng.integers(0, max(1, len(df) - view_rows), 200)
+    start = time.perf_counter()
+    for top in tops:
+        paint(model, int(top))
+    scroll = time.perf_counter() - start
+    out["scroll_cells_per_second"] = len(tops) * view_rows * view_cols / scroll
+
+    for col in range(min(3, df.shape[1])):
+        start = time.perf_counter()
+        model.sort(col, Qt.SortOrder.AscendingOrder)
+        paint(model, 0)
+        out[f"sort_col{col}_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        model.sort(col, Qt.SortOrder.DescendingOrder)
+        paint(model, 0)
+        out[f"resort_col{col}_seconds"] = time.perf_counter() - start
+
+    out["seconds"] = sum(v for k, v in out.items() if k.endswith("_seconds"))
+    after = peak_rss_bytes()
+    out["peak_rss_delta"] = None if before is None else after - before
+    out["rows"] = len(df)
+    queue.put(out)
+
+
+def run_suite(args) -> list[dict]:
+    gen = {"columns": args.columns, "key_cardinality": args.key_cardinality,
+           "duplicate_rate": args.duplicate_rate, "overlap_rate": args.overlap_rate,
+           "string_width": args.string_width}
+    suites = set(args.suites)
+    spec = {}
+    if "load" in suites:
+        spec["load"] = (args.load_rows, args.formats, gen)
+    sizes = sorted(set(args.sizes) | ({args.model_rows} if "model" in suites else set()))
+    spec["compare"] = [(rows, gen) for rows in sizes if "compare" in suites or rows == args.model_rows]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="datacomp_bench_") as tmp:
+        paths = run_in_child(_write_inputs, spec, tmp)
+
+        if "load" in suites:
+            for fmt, path in paths["load"].items():
+                for engine in args.load_engines:
+                    if engine == "pyarrow" and fmt not in ("csv", "parquet", "feather"):
+                        continue
+                    r = run_in_child(_measure_load, path, engine)
+                    results.append({"name": f"load/{fmt}/{engine}/rows={args.load_rows}", **r})
+                    report(results[-1])
+
+        if "compare" in suites:
+            for rows in args.sizes:
+                for engine in args.engines:
+                    r = run_in_child(_measure_compare, paths["compare"][rows], engine)
+                    results.append({"name": f"compare/{engine}/rows={rows}", **r})
+                    report(results[-1])
+
+        if "model" in suites:
+            # the A side of the compare inputs doubles as the table to render
+            r = run_in_child(_measure_model, paths["compare"][args.model_rows][0])
+            results.append({"name": f"model/rows={args.model_rows}", **r})
+            report(results[-1])
+    return results
+
+
+def report(result: dict):
+    print(f"{result['name']:<42} {result['seconds']:>9.3f}s  peak +{mb(result.get('peak_rss_delta')):>8} MB")
+
+
+def check_baseline(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    # a result regresses when its time or peak memory grew by more than tolerance
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get(r["name"])
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_rss_delta"):
+            new_value, old_value = r.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            ratio = new_value / old_value
+            if ratio > 1 + tolerance:
+                regressions.append(f"{r['name']} {metric}: {old_value:.4g} -> {new_value:.4g} ({ratio:.2f}x)")
+    return regressions
+
+
+def metadata(args) -> dict:
+    import numpy
+    import pandas
+    import pyarrow
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "pyarrow": pyarrow.__version__,
+        "args": vars(args)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, comparing and rendering")
+    parser.add_argument("--suites", nargs="+", default=["load", "compare", "model"],
+                        choices=["load", "compare", "model"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 1_000_000, 10_000_000],
+                        help="rows per side for the compare suite")
+    parser.add_argument("--engines", nargs="+", default=["merge", "index", "factorize"])
+    parser.add_argument("--load-rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "feather", "json"],
+                        choices=sorted(EXTENSIONS))
+    parser.add_argument("--load-engines", nargs="+", default=["pandas", "pyarrow"])
+    parser.add_argument("--model-rows", type=int, default=1_000_000)
+    parser.add_argument("--columns", type=int, default=6)
+    parser.add_argument("--key-cardinality", type=int, default=None)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--overlap-rate", type=float, default=0.8)
+    parser.add_argument("--string-width", type=int, default=12)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown / memory growth before a result counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline instead of checking against it")
+    args = parser.parse_args()
+
+    doc = {"meta": metadata(args), "results": run_suite(args)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to store one")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = check_baseline(doc["results"], baseline, args.tolerance)
+    known = {r["name"] for r in baseline.get("results", [])}
+    unchecked = [r["name"] for r in doc["results"] if r["name"] not in known]
+    if unchecked:
+        print(f"Not in the baseline, not checked: {', '.join(unchecked)}")
+    if regressions:
+        print("Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
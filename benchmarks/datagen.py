@@ -0,0 +1,81 @@
+# Synthetic A/B datasets for the benchmarks. The A side is keyed on an int64 "id",
+# the B side on "client_id", like the two extracts the tool is usually pointed at.
+import numpy as np
+import pandas as pd
+
+
+def random_strings(rng: np.random.Generator, count: int, width: int) -> np.ndarray:
+    # count lowercase strings of exactly width characters
+    codes = rng.integers(ord("a"), ord("z") + 1, size=(count, width), dtype=np.uint8)
+    return codes.view(f"S{width}").ravel().astype(str).astype(object)
+
+
+def side_keys(rng: np.random.Generator, rows: int, distinct: np.ndarray, duplicate_rate: float) -> np.ndarray:
+    # every distinct key at least once (as far as rows allow), duplicate_rate of
+    # the rows repeat one of them, in random order
+    n_unique = min(len(distinct), max(1, int(round(rows * (1 - duplicate_rate)))))
+    unique = rng.permutation(distinct)[:n_unique]
+    repeats = rng.choice(unique, rows - n_unique)
+    return rng.permutation(np.concatenate([unique, repeats]))
+
+
+def value_columns(rng: np.random.Generator, rows: int, columns: int, string_width: int) -> dict:
+    # float, int and string columns in turn
+    vocab = random_strings(rng, min(rows, 50_000) or 1, string_width)
+    out = {}
+    for i in range(columns):
+        kind = i % 3
+        if kind == 0:
+            out[f"amount_{i}"] = rng.random(rows) * 1000
+        elif kind == 1:
+            out[f"count_{i}"] = rng.integers(0, 1000, rows)
+        else:
+            out[f"text_{i}"] = vocab[rng.integers(0, len(vocab), rows)]
+    return out
+
+
+def make_pair(rows: int, *, columns: int = 6, key_cardinality: int | None = None,
+              duplicate_rate: float = 0.0, overlap_rate: float = 0.8,
+              string_width: int = 12, rows_b: int | None = None,
+              seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # rows            rows on the A side (rows_b on the B side, defaults to rows)
+    # columns         non-key columns per side
+    # key_cardinality distinct keys per side, defaults to as many as the rows allow
+    # duplicate_rate  share of rows whose key repeats another row's key
+    # overlap_rate    share of B's distinct keys that also exist on A
+    # string_width    characters per value of the string columns
+    if not 0 <= duplicate_rate < 1 or not 0 <= overlap_rate <= 1:
+        raise ValueError("duplicate_rate must be in [0, 1) and overlap_rate in [0, 1]")
+    rng = np.random.default_rng(seed)
+    rows_b = rows if rows_b is None else rows_b
+    cardinality = key_cardinality or rows
+
+    keys_a = np.arange(cardinality, dtype=np.int64)
+    n_shared = int(round(cardinality * overlap_rate))
+    keys_b = np.concatenate([
+        rng.permutation(keys_a)[:n_shared],
+        np.arange(cardinality, 2 * cardinality - n_shared, dtype=np.int64)
+    ])
+
+    a = pd.DataFrame({"id": side_keys(rng, rows, keys_a, duplicate_rate),
+                      **value_columns(rng, rows, columns, string_width)})
+    b = pd.DataFrame({"client_id": side_keys(rng, rows_b, keys_b, duplicate_rate),
+                      **value_columns(rng, rows_b, columns, string_width)})
+    return a, b
+
+
+def write_frame(df: pd.DataFrame, path: str, fmt: str):
+    if fmt in ("csv", "tsv", "txt"):
+        df.to_csv(path, index=False, sep="\t" if fmt == "tsv" else ",")
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt in ("feather", "arrow"):
+        df.to_feather(path)
+    elif fmt == "json":
+        df.to_json(path, orient="records", lines=True)
+    elif fmt == "xlsx":
+        df.to_excel(path, index=False)
+    elif fmt == "pkl":
+        df.to_pickle(path)
+    else:
+        raise ValueError(f"Unsupported benchmark format: {fmt}")
@@ -0,0 +1,30 @@
+# Helpers shared by the benchmark scripts: running a measurement in a fresh
+# process and reading its peak memory.
+import multiprocessing
+import sys
+
+
+def peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_in_child(target, *args):
+    # target(*args, queue) runs in a spawned process and puts exactly one result
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(*args, queue))
+    proc.start()
+    try:
+        result = queue.get()
+    finally:
+        proc.join()
+    return result
+
+
+def mb(num: int | None) -> str:
+    return "n/a" if num is None else f"{num / (1 << 20):.1f}"
@@ -0,0 +1,56 @@
+# Headless batch compares, no Qt involved:
+#   python cli.py manifest.json --out results/ --workers 4 --memory-limit 8GB
+# manifest.json:
+#   {"defaults": {"engine": "factorize", "output_format": "csv"},
+#    "jobs": [{"file_a": "a.csv", "file_b": "b.xlsx", "keys_a": "id", "keys_b": "client_id"}]}
+# Each job writes <out>/<name>/left_only.<fmt>, right_only.<fmt>; <out>/summary.jsonl
+# gets one line per finished job. Exits with 1 when any job failed.
+import argparse
+import re
+import sys
+from back_end.batch import ManifestError, run_batch
+from back_end.utility_funcs import format_bytes
+
+UNITS = {"": 1, "B": 1, "KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30, "TB": 1 << 40}
+
+
+def parse_size(text: str) -> int:
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B?)\s*", text.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Not a size: {text!r} (e.g. 512MB, 8GB)")
+    unit = match.group(2)
+    if unit and not unit.endswith("B"):
+        unit += "B"
+    return int(float(match.group(1)) * UNITS[unit])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the compares listed in a manifest without the GUI")
+    parser.add_argument("manifest", help="JSON manifest of compare jobs")
+    parser.add_argument("--out", default="datacomp_results", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="jobs run at once (default: CPU count)")
+    parser.add_argument("--memory-limit", type=parse_size, default=None,
+                        help="memory the running jobs may use together (default: half of RAM)")
+    args = parser.parse_args(argv)
+
+    def report(summary):
+        if summary["status"] == "ok":
+            counts = summary["counts"]
+            print(f"ok      {summary['name']}: {counts.get('matches', 0):,} matches, "
+                  f"{counts.get('left_only', 0):,} left only, {counts.get('right_only', 0):,} right only "
+                  f"({summary['seconds']:.1f}s, est. {format_bytes(summary['estimated_bytes'])})")
+        else:
+            error = (summary.get("error") or "").splitlines() or ["unknown error"]
+            print(f"failed  {summary['name']}: {error[0]}", file=sys.stderr)
+        sys.stdout.flush()
+
+    try:
+        results = run_batch(args.manifest, args.out, args.workers, args.memory_limit, on_done=report)
+    except (OSError, ManifestError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 1 if any(r["status"] != "ok" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
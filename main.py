@@ -1,11 +1,13 @@
 from PySide6.QtWidgets import QApplication
 from ui.gui_mainwindow import MainWindow
+import os
 import sys
 
 
 def main():
     app = QApplication(sys.argv)
-    winui = MainWindow()
+    # DATACOMP_WARM_UP=0: import pandas and start parse workers on first load only
+    winui = MainWindow(warm_up=os.environ.get("DATACOMP_WARM_UP", "1") != "0")
     winui.show()
     sys.exit(app.exec())
 
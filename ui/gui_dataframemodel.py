@@ -1,60 +1,295 @@
 from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
-import pandas as pd
+from PySide6.QtGui import QColor
+from collections import OrderedDict
+
+# numpy and pandas are imported where they're used: the window can show before
+# they are loaded
+
+
+def format_block(block: "pd.DataFrame") -> "np.ndarray":
+    # Display strings for a block of cells, formatted one column at a time.
+    # Nulls render as empty strings.
+    import numpy as np
+
+    out = np.empty(block.shape, dtype=object)
+    for j in range(block.shape[1]):
+        col = block.iloc[:, j]
+        if isinstance(col.dtype, np.dtype) and col.dtype.kind in "biufcO":
+            text = col.to_numpy().astype(str)
+        else:
+            # datetimes, categoricals and extension dtypes format through pandas
+            text = col.astype(str).to_numpy()
+        text = text.astype(object)
+        text[col.isna().to_numpy()] = ""
+        out[:, j] = text
+    return out
+
+
+def sort_ranks(col: "pd.Series") -> "tuple[np.ndarray, int]":
+    # dense rank of every value (0 = smallest) with -1 for nulls, plus the rank count
+    import pandas as pd
+
+    try:
+        codes, uniques = pd.factorize(col, sort=True)
+    except TypeError:
+        # mixed types that don't compare to each other sort by their text
+        codes, uniques = pd.factorize(col.astype(str).where(col.notna()), sort=True)
+    return codes, len(uniques)
+
+
+class FrameSource:
+    # Adapts a DataFrame to the windowed source interface DataFrameModel reads from:
+    # columns, len(), rows(positions) and column(pos). Anything else exposing that
+    # interface (e.g. IndexCompareResult.window) can be displayed without building
+    # the full frame.
+    def __init__(self, df: "pd.DataFrame"):
+        self.df = df
+
+    @property
+    def columns(self) -> "pd.Index":
+        return self.df.columns
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def rows(self, positions: "np.ndarray", columns=None) -> "pd.DataFrame":
+        return self.df.iloc[positions] if columns is None else self.df.iloc[positions, columns]
+
+    def column(self, pos: int) -> "pd.Series":
+        return self.df.iloc[:, pos]
 
 
 class DataFrameModel(QAbstractTableModel):
-    def __init__(self, data: pd.DataFrame | None = None, parent=None):
+    highlight_color = QColor("#5a3a1a")
+    # display strings are formatted and cached in tiles of block_rows x block_cols
+    block_rows = 128
+    block_cols = 32
+    max_blocks = 256
+    max_cached_sorts = 8
+    # rows handed to the view at a time through canFetchMore/fetchMore
+    fetch_batch = 10_000
+
+    def __init__(self, data: "pd.DataFrame | None" = None, parent=None, fetch_batch: int | None = None):
         super().__init__()
+        if fetch_batch is not None:
+            self.fetch_batch = fetch_batch
         self._df = data
+        self._source = FrameSource(data) if data is not None else None
+        self._fetched = 0 if data is None else min(len(data), self.fetch_batch)
+        # (rows, columns) bool array of cells to highlight, e.g. from value_diff.cell_mask
+        self._highlight: "np.ndarray | None" = None
+        self._blocks: "OrderedDict[tuple[int, int], np.ndarray]" = OrderedDict()
+        # Sorting never touches the frame: rows are displayed through _perm, which
+        # maps a view row to a frame row position. Sort keys and permutations are
+        # cached per column/order so toggling and multi-key sorts reuse them.
+        self._perm: "np.ndarray | None" = None
+        self._sort_keys: list[tuple[int, bool]] = []
+        self._rank_cache: "dict[int, tuple[np.ndarray, int]]" = {}
+        self._perm_cache: "dict[tuple[tuple[int, bool], ...], np.ndarray]" = {}
+
+    def _invalidate_blocks(self):
+        self._blocks.clear()
+
+    def _display_text(self, row: int, col: int) -> str:
+        key = (row // self.block_rows, col // self.block_cols)
+        block = self._blocks.get(key)
+        if block is None:
+            import numpy as np
+
+            r0 = key[0] * self.block_rows
+            c0 = key[1] * self.block_cols
+            r1 = min(r0 + self.block_rows, len(self._source))
+            rows = np.arange(r0, r1) if self._perm is None else self._perm[r0:r1]
+            cols = list(range(c0, min(c0 + self.block_cols, len(self._source.columns))))
+            block = format_block(self._source.rows(rows, cols))
+            self._blocks[key] = block
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(key)
+        return block[row % self.block_rows, col % self.block_cols]
+
+    def set_df(self, data, highlight: "np.ndarray | None" = None):
+        # data is a DataFrame or a windowed source (see FrameSource)
+        import pandas as pd
 
-    def set_df(self, data: pd.DataFrame):
         self.beginResetModel()
-        self._df = data if data is not None else pd.DataFrame()
+        if data is None:
+            data = pd.DataFrame()
+        if isinstance(data, pd.DataFrame):
+            self._df = data
+            self._source = FrameSource(data)
+        else:
+            self._df = None
+            self._source = data
+        shape = (len(self._source), len(self._source.columns))
+        if highlight is not None and highlight.shape != shape:
+            raise ValueError(f"Highlight mask shape {highlight.shape} does not match data shape {shape}")
+        self._highlight = highlight
+        self._fetched = min(shape[0], self.fetch_batch)
+        self._invalidate_blocks()
+        self._perm = None
+        self._sort_keys = []
+        self._rank_cache.clear()
+        self._perm_cache.clear()
         self.endResetModel()
 
+    def update_columns(self, data: "pd.DataFrame", columns):
+        # data has the shown frame's rows and columns with new values in `columns`
+        # (e.g. a transform step): only those columns' tiles and sort ranks are
+        # dropped, the sort and highlight stay. Anything else is a full reset.
+        if (self._df is None or len(data) != len(self._df)
+                or not data.columns.equals(self._df.columns) or not data.index.equals(self._df.index)):
+            self.set_df(data)
+            return
+        self._df = data
+        self._source = FrameSource(data)
+        changed = sorted({data.columns.get_loc(c) for c in columns})
+        if not changed:
+            return
+        tiles = {c // self.block_cols for c in changed}
+        for key in [k for k in self._blocks if k[1] in tiles]:
+            del self._blocks[key]
+        for c in changed:
+            self._rank_cache.pop(c, None)
+        self._perm_cache = {k: p for k, p in self._perm_cache.items()
+                            if not any(c in changed for c, _ in k)}
+        if any(c in changed for c, _ in self._sort_keys):
+            # the order itself changed
+            self.layoutAboutToBeChanged.emit()
+            self._perm = self._permutation(tuple(self._sort_keys))
+            self._invalidate_blocks()
+            self.layoutChanged.emit()
+            return
+        last = max(self._fetched - 1, 0)
+        for c in changed:
+            self.dataChanged.emit(self.index(0, c), self.index(last, c), [Qt.ItemDataRole.DisplayRole])
+
+    def source_row(self, row: int) -> int:
+        return row if self._perm is None else int(self._perm[row])
+
+    def column_names(self, positions) -> list:
+        return [] if self._source is None else list(self._source.columns[list(positions)])
+
+    def view_df(self) -> "pd.DataFrame | None":
+        # the data in display order; builds the frame when the source is windowed
+        if self._source is None:
+            return None
+        if self._perm is None:
+            if self._df is not None:
+                return self._df
+            import numpy as np
+            return self._source.rows(np.arange(len(self._source)))
+        return self._source.rows(self._perm)
+
     def rowCount(self, parent=QModelIndex()):
         if parent.isValid():
             return 0
-        return 0 if self._df is None else len(self._df)
+        return 0 if self._source is None else self._fetched
 
     def columnCount(self, parent=QModelIndex()):
         if parent.isValid():
             return 0
-        return 0 if self._df is None else len(self._df.columns)
+        return 0 if self._source is None else len(self._source.columns)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._source is None:
+            return False
+        return self._fetched < len(self._source)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._source is None:
+            return
+        remaining = len(self._source) - self._fetched
+        count = min(self.fetch_batch, remaining)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
-        if not index.isValid() or self._df is None:
+        if not index.isValid() or self._source is None:
             return None
 
         if role == Qt.ItemDataRole.DisplayRole:
-            val = self._df.iat[index.row(), index.column()]
-            if pd.isna(val):
-                return ""
-            return str(val)
+            return self._display_text(index.row(), index.column())
 
         if role == Qt.ItemDataRole.TextAlignmentRole:
             return int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
 
+        if role == Qt.ItemDataRole.BackgroundRole and self._highlight is not None:
+            if self._highlight[self.source_row(index.row()), index.column()]:
+                return self.highlight_color
+
         return None
 
     def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
-        if role != Qt.ItemDataRole.DisplayRole or self._df is None:
+        if role != Qt.ItemDataRole.DisplayRole or self._source is None:
             return None
         if orientation == Qt.Orientation.Horizontal:
-            return str(self._df.columns[section])
+            return str(self._source.columns[section])
+        if self._df is None:
+            return str(self.source_row(section))
         try:
-            return str(self._df.index[section])
+            return str(self._df.index[self.source_row(section)])
         except Exception:
             return str(section)
 
-    def sort(self, column, order):
-        if self._df is None or self._df.empty:
+    def _sort_key(self, column: int, ascending: bool) -> "np.ndarray":
+        # integer key whose ascending order is the wanted order, nulls always last
+        import numpy as np
+
+        ranks = self._rank_cache.get(column)
+        if ranks is None:
+            ranks = self._rank_cache[column] = sort_ranks(self._source.column(column))
+        codes, n_vals = ranks
+        key = codes if ascending else (n_vals - 1 - codes)
+        return np.where(codes < 0, n_vals, key)
+
+    def _permutation(self, keys: tuple[tuple[int, bool], ...]) -> "np.ndarray":
+        perm = self._perm_cache.get(keys)
+        if perm is None:
+            import numpy as np
+
+            if len(keys) == 1:
+                perm = np.argsort(self._sort_key(*keys[0]), kind="stable")
+            else:
+                # lexsort is stable and treats its last key as the primary one
+                perm = np.lexsort([self._sort_key(*k) for k in reversed(keys)])
+            self._perm_cache[keys] = perm
+            if len(self._perm_cache) > self.max_cached_sorts:
+                self._perm_cache.pop(next(iter(self._perm_cache)))
+        return perm
+
+    @property
+    def sort_keys(self) -> list[tuple[int, bool]]:
+        return list(self._sort_keys)
+
+    def sort(self, column, order, add_key: bool = False):
+        # add_key=True keeps the current sort and adds column as the next tie-breaker;
+        # a column that is already a key keeps its place and only changes order
+        if self._source is None or len(self._source) == 0:
             return
-        col_name = self._df.columns[column]
         ascending = order == Qt.SortOrder.AscendingOrder
+        keys = list(self._sort_keys) if add_key else []
+        at = [i for i, k in enumerate(keys) if k[0] == column]
+        if at:
+            keys[at[0]] = (column, ascending)
+        else:
+            keys.append((column, ascending))
+
+        self.layoutAboutToBeChanged.emit()
+        self._sort_keys = keys
+        self._perm = self._permutation(tuple(keys))
+        self._invalidate_blocks()
+        self.layoutChanged.emit()
+
+    def clear_sort(self):
+        if self._perm is None:
+            return
         self.layoutAboutToBeChanged.emit()
-        self._df.sort_values(by=col_name,
-                             ascending=ascending,
-                             inplace=True,
-                             ignore_index=True)
-        self.layoutChanged.emit()
\ No newline at end of file
+        self._sort_keys = []
+        self._perm = None
+        self._invalidate_blocks()
+        self.layoutChanged.emit()
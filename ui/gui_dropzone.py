@@ -3,14 +3,14 @@ from PySide6.QtWidgets import (QApplication, QPushButton,
                                QLabel, QFileDialog, QTableView, QStackedLayout, QHBoxLayout, QPlainTextEdit,
                                QSizePolicy, QHeaderView, QAbstractItemView, QMenu)
 from PySide6.QtCore import Qt, Signal, QItemSelection, QItemSelectionModel, QModelIndex
-from back_end import build_ext_filter
+from back_end.utility_funcs import build_ext_filter, format_bytes
 from ui.gui_dataframemodel import DataFrameModel
-import pandas as pd
 import os
 
 
 class DropZoneUI(QFrame):
     fileSelected = Signal(str)
+    cancelRequested = Signal()
     ext_map = {
         "CSV / Text Files": ['.csv', '.txt', '.tsv'],
         "Excel Files": ['.xlsx', '.xls', '.xlsm', '.xlsb', '.ods'],
@@ -20,7 +20,7 @@ class DropZoneUI(QFrame):
         "Pickle Files": ['.pkl'],
         "Stata Files": ['.dta'],
         "SAS Files": ['.sas7bdat', '.xpt'],
-        "Feather Files": ['.feather']
+        "Feather / Arrow Files": ['.feather', '.arrow']
     }
 
     def __init__(self, title="Drop file here", parent=None):
@@ -82,8 +82,15 @@ class DropZoneUI(QFrame):
         self.replace_button.setFixedHeight(20)
         self.replace_button.clicked.connect(self.click_plus)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setCursor(Qt.PointingHandCursor)
+        self.cancel_button.setFixedHeight(20)
+        self.cancel_button.clicked.connect(self.cancelRequested.emit)
+        self.cancel_button.setVisible(False)
+
         topbar.addWidget(self.status)
         topbar.addStretch(1)
+        topbar.addWidget(self.cancel_button)
         topbar.addWidget(self.replace_button)
 
         vert_1.addLayout(topbar)
@@ -93,6 +100,13 @@ class DropZoneUI(QFrame):
         self.stack.addWidget(preview_stack)
         self.stack.setCurrentIndex(0)
 
+        self._has_data = False
+        self._provisional = False
+        # the dataset shown before a replacement's preview, back on cancel or failure
+        self._kept_model: DataFrameModel | None = None
+        self._loading_name = ""
+        self._idle_status = ""
+
     def dragEnterEvent(self, event):
         md = event.mimeData()
         # if event.mimeData().hasUrls():
@@ -128,9 +142,19 @@ class DropZoneUI(QFrame):
         if filename:
             self.fileSelected.emit(filename)
 
-    def set_preview(self, df: pd.DataFrame, source_path: str | None = None):
-        preview_df = df.head(20).copy()
-        self._model.set_df(preview_df if preview_df is not None else pd.DataFrame())
+    @property
+    def has_data(self) -> bool:
+        return self._has_data
+
+    def set_preview(self, df: "pd.DataFrame", source_path: str | None = None, partial: bool = False,
+                    note: str | None = None):
+        # partial=True: df is only the head of a file that is still loading
+        if partial and self._has_data and not self._provisional:
+            self._kept_model = self._model
+            self._use_model(DataFrameModel())
+        elif not partial:
+            self._kept_model = None
+        self._model.set_df(df.head(20))
 
         # Table
         self._table.setMinimumHeight(160)
@@ -156,28 +180,103 @@ class DropZoneUI(QFrame):
         h_header.setDefaultAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         h_header.setStretchLastSection(False)
         h_header.setDefaultSectionSize(50)
-        h_header.setSectionResizeMode(QHeaderView.ResizeToContents)
-        self._table.resizeColumnsToContents()
-
-        MAX_WIDTH = 60
-        for col in range(self._model.columnCount()):
-            width = min(self._table.columnWidth(col), MAX_WIDTH)
-            self._table.setColumnWidth(col, width)
-            h_header.setSectionResizeMode(col, QHeaderView.Fixed)
+        self._fit_columns()
 
         h_header.setSectionsClickable(True)
-        h_header.setSectionResizeMode(QHeaderView.Interactive)
         h_header.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         h_header.customContextMenuRequested.connect(self._on_header_menu,
                                                     Qt.ConnectionType.UniqueConnection)
-        h_header.sectionClicked.connect(self._on_header_click)
+        h_header.sectionClicked.connect(self._on_header_click,
+                                        Qt.ConnectionType.UniqueConnection)
 
 
+        self._provisional = partial
+        if partial:
+            self.stack.setCurrentIndex(1)
+            return
+
         if source_path:
-            name = os.path.basename(source_path)
-            self.set_status_text(f"{name} :: {len(df)} rows :: {len(df.columns)} columns")
+            self.set_shape(source_path, len(df), len(df.columns), note)
+        self._has_data = True
+        self.cancel_button.setVisible(False)
+        self.stack.setCurrentIndex(1)
+
+    def set_shape(self, source_path: str, rows: int, cols: int, note: str | None = None):
+        # Full load finished behind an already displayed preview
+        name = os.path.basename(source_path)
+        text = f"{name} :: {rows} rows :: {cols} columns"
+        if note:
+            text += f" :: {note}"
+        self.set_status_text(text)
+        self._provisional = False
+        self._kept_model = None
+        self._has_data = True
+        self.cancel_button.setVisible(False)
+
+
+    def set_trace_summary(self, summary: str):
+        # second status line under the file/shape line, e.g. "parse 1.20s · concat 0.10s :: 1.34s"
+        first_line = self.status.toPlainText().split("\n", 1)[0]
+        self.set_status_text(f"{first_line}\n{summary}")
+
+    def set_loading(self, source_path: str):
+        self._loading_name = os.path.basename(source_path)
+        if not self.cancel_button.isVisible():
+            self._idle_status = self.status.toPlainText()
+        self.cancel_button.setVisible(True)
+        self.set_status_text(f"Loading {self._loading_name} ...")
         self.stack.setCurrentIndex(1)
 
+    def set_progress(self, bytes_read: int, total: int, rows: int):
+        text = f"Loading {self._loading_name} :: {format_bytes(bytes_read)} / {format_bytes(total)}"
+        if rows:
+            text += f" :: {rows:,} rows"
+        self.set_status_text(text)
+
+    def finish_loading(self, message: str | None = None):
+        self.cancel_button.setVisible(False)
+        if self._provisional:
+            # the preview belongs to a load that never completed: back to what
+            # was shown before it, if anything
+            self._provisional = False
+            if self._kept_model is not None:
+                self._use_model(self._kept_model)
+                self._fit_columns()
+                self._kept_model = None
+            else:
+                self._has_data = False
+                self._model.set_df(None)
+        if not self._has_data:
+            self.stack.setCurrentIndex(0)
+        else:
+            self.set_status_text(message or self._idle_status)
+
+    def _use_model(self, model: DataFrameModel):
+        self._model = model
+        self._table.setModel(model)
+        self._show_sort_indicator()
+
+    def _fit_columns(self):
+        h_header = self._table.horizontalHeader()
+        h_header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        self._table.resizeColumnsToContents()
+
+        MAX_WIDTH = 60
+        for col in range(self._model.columnCount()):
+            width = min(self._table.columnWidth(col), MAX_WIDTH)
+            self._table.setColumnWidth(col, width)
+            h_header.setSectionResizeMode(col, QHeaderView.Fixed)
+        h_header.setSectionResizeMode(QHeaderView.Interactive)
+
+    def _show_sort_indicator(self):
+        header = self._table.horizontalHeader()
+        keys = self._model.sort_keys
+        if keys:
+            primary_col, primary_asc = keys[0]
+            header.setSortIndicator(primary_col,
+                                    Qt.SortOrder.AscendingOrder if primary_asc
+                                    else Qt.SortOrder.DescendingOrder)
+        header.setSortIndicatorShown(bool(keys))
 
     def set_status_text(self, text: str, tooltip: bool = True):
         self.status.setPlainText(text)
@@ -186,13 +285,27 @@ class DropZoneUI(QFrame):
 
         self.status.horizontalScrollBar().setValue(0)
 
+    def _sort_column(self, col: int, order: Qt.SortOrder):
+        # holding Shift adds the column as a secondary sort key
+        add_key = bool(QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier)
+        self._model.sort(col, order, add_key=add_key)
+        self._show_sort_indicator()
+
     def _on_header_click(self, col: int):
         selection_model = self._table.selectionModel()
         if self._model.rowCount() == 0:
             return
 
-        item_range = self._col_range_selection(col)
         mods = QApplication.keyboardModifiers()
+        if mods & Qt.KeyboardModifier.ShiftModifier:
+            # Shift-click: add the column as the next sort key, or flip its order in place
+            current = dict(self._model.sort_keys)
+            ascending = not current[col] if col in current else True
+            self._sort_column(col, Qt.SortOrder.AscendingOrder if ascending
+                              else Qt.SortOrder.DescendingOrder)
+            return
+
+        item_range = self._col_range_selection(col)
         press_ctrl = bool(mods & Qt.KeyboardModifier.ControlModifier)
 
         if press_ctrl:
@@ -227,13 +340,9 @@ class DropZoneUI(QFrame):
         action = menu.exec(header.mapToGlobal(pos))
 
         if action is action_sort_asc:
-            self._model.sort(col, Qt.SortOrder.AscendingOrder)
-            header.setSortIndicator(col, Qt.SortOrder.AscendingOrder)
-            header.setSortIndicatorShown(True)
+            self._sort_column(col, Qt.SortOrder.AscendingOrder)
         elif action is action_sort_desc:
-            self._model.sort(col, Qt.SortOrder.DescendingOrder)
-            header.setSortIndicator(col, Qt.SortOrder.DescendingOrder)
-            header.setSortIndicatorShown(True)
+            self._sort_column(col, Qt.SortOrder.DescendingOrder)
         elif action is action_clear_select:
             selection_model.clearSelection()
         elif action is action_print_selection:
@@ -265,17 +374,9 @@ class DropZoneUI(QFrame):
                 selection_model.clearSelection()
         elif col is not None:
             if action is action_sort_asc:
-                self._model.sort(col, Qt.SortOrder.AscendingOrder)
-                self._table.horizontalHeader().setSortIndicator(
-                    col,
-                    Qt.SortOrder.AscendingOrder)
-                self._table.horizontalHeader().setSortIndicatorShown(True)
+                self._sort_column(col, Qt.SortOrder.AscendingOrder)
             elif action is action_sort_desc:
-                self._model.sort(col, Qt.SortOrder.DescendingOrder)
-                self._table.horizontalHeader().setSortIndicator(
-                    col,
-                    Qt.SortOrder.DescendingOrder)
-                self._table.horizontalHeader().setSortIndicatorShown(True)
+                self._sort_column(col, Qt.SortOrder.DescendingOrder)
 
     def _col_range_selection(self, col: int):
         rows = self._model.rowCount()
@@ -287,6 +388,13 @@ class DropZoneUI(QFrame):
         selection_model = self._table.selectionModel()
         return selection_model.isColumnSelected(col, QModelIndex())
 
+    def selected_columns(self) -> list:
+        # names of the selected columns, left to right (the compare keys)
+        selection_model = self._table.selectionModel()
+        if not selection_model:
+            return []
+        return self._model.column_names(sorted(idx.column() for idx in selection_model.selectedColumns()))
+
     def print_selection(self):
         selection_model = self._table.selectionModel()
         if not selection_model:
@@ -295,5 +403,5 @@ class DropZoneUI(QFrame):
         if not cols:
             return
 
-        selection = self._model._df.iloc[:, cols]
+        selection = self._model.view_df().iloc[:, cols]
         print(selection)
\ No newline at end of file
@@ -7,25 +7,82 @@ from PySide6.QtWidgets import (QApplication,
                                QTableView,
                                QSplitter,
                                QMessageBox,
-                               QFormLayout)
-from PySide6.QtCore import Qt
+                               QMenu,
+                               QFileDialog,
+                               QFormLayout,
+                               QProgressDialog)
+from PySide6.QtCore import Qt, QThreadPool, QTimer
+from PySide6.QtGui import QKeySequence
 from .gui_dropzone import DropZoneUI
 from .gui_dataframemodel import DataFrameModel
-from back_end.data_service import DataService
-import pandas as pd
+from .gui_workers import LoadWorker, ExportWorker, CompareWorker
+from back_end.utility_funcs import build_ext_filter, warm_imports
+import os
+import threading
+
+# pandas and the rest of back_end are imported on first use (or by the warm-up
+# thread once the window is up), so they don't hold back the first window
 
 class MainWindow(QMainWindow):
-    def __init__(self, parent=None):
+    export_ext_map = {
+        "CSV Files": ['.csv', '.tsv', '.txt'],
+        "Parquet Files": ['.parquet'],
+        "Feather / Arrow Files": ['.feather', '.arrow'],
+        "Excel Files": ['.xlsx']
+    }
+
+    def __init__(self, parent=None, warm_up: bool = True):
         super().__init__(parent)
 
-        self.datasrvc = DataService()
+        # created by the datasrvc property
+        self._datasrvc = None
+        self._service_lock = threading.Lock()
+        # warm_up: import pandas/readers and start the parse workers in the
+        # background after the window is first shown
+        self._warm_up = warm_up
+        self._closing = False
         self.setWindowTitle("DataComp")
 
-        self.df_a: pd.DataFrame() | None = None
-        self.df_b: pd.DataFrame() | None = None
+        self.df_a: "pd.DataFrame | None" = None
+        self.df_b: "pd.DataFrame | None" = None
+
+        # Background loading, one in-flight worker per panel so A and B load side by side
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount()))
+        self._loaders: dict[str, LoadWorker] = {}
+        self._next_token = 0
+        # what the center table shows: a DataFrame or a result window
+        self.result = None
+        self._exporter: ExportWorker | None = None
+        self._export_dialog: QProgressDialog | None = None
+        # undo/redo history of transforms of the shown result, started by the first one
+        self._transformer: "Transformer | None" = None
+        self._comparer: CompareWorker | None = None
 
         self.file_btn = QPushButton("File")
+        file_menu = QMenu(self.file_btn)
+        file_menu.addAction("Export File A...", lambda: self.export_data("a"))
+        file_menu.addAction("Export File B...", lambda: self.export_data("b"))
+        file_menu.addAction("Export Result...", lambda: self.export_data("result"))
+        file_menu.addSeparator()
+        file_menu.addAction("Export Performance Trace...", self.export_trace)
+        self.file_btn.setMenu(file_menu)
+        self.edit_btn = QPushButton("Edit")
+        edit_menu = QMenu(self.edit_btn)
+        self.undo_action = edit_menu.addAction("Undo", self.undo_transform)
+        self.undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.redo_action = edit_menu.addAction("Redo", self.redo_transform)
+        self.redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        edit_menu.addSeparator()
+        edit_menu.addAction("Drop Rows with NULLs", self.drop_null_rows)
+        self.edit_btn.setMenu(edit_menu)
+        # shortcuts work without opening the menu
+        self.addActions([self.undo_action, self.redo_action])
+        self._update_undo_actions()
         self.options_btn = QPushButton("Options")
+        # compares A and B on the columns selected in each panel
+        self.compare_btn = QPushButton("Compare")
+        self.compare_btn.clicked.connect(self.compare_data)
 
         self.layout = QFormLayout()
 
@@ -33,6 +90,8 @@ class MainWindow(QMainWindow):
         top_layout = QHBoxLayout()
 
         top_layout.addWidget(self.file_btn)
+        top_layout.addWidget(self.edit_btn)
+        top_layout.addWidget(self.compare_btn)
 
 
         # Center Preview
@@ -62,6 +121,8 @@ class MainWindow(QMainWindow):
 
         self.dropA.fileSelected.connect(lambda path: self.load_panel("a", path))
         self.dropB.fileSelected.connect(lambda path: self.load_panel("b", path))
+        self.dropA.cancelRequested.connect(lambda: self.cancel_load("a"))
+        self.dropB.cancelRequested.connect(lambda: self.cancel_load("b"))
 
         self.dropA.setMaximumWidth(500)
         self.dropB.setMaximumWidth(500)
@@ -70,23 +131,305 @@ class MainWindow(QMainWindow):
         self.layout.addRow(vbox)
 
 
-    def load_panel(self, side: str, path: str):
+    @property
+    def datasrvc(self):
+        # the DataService, created on first use (from the GUI or the warm-up thread)
+        with self._service_lock:
+            if self._datasrvc is None:
+                from back_end.data_service import DataService
+                from back_end.dataset_cache import DatasetCache
+                from back_end.process_parse import ParsePool
+
+                try:
+                    cache = DatasetCache()
+                except OSError:
+                    cache = None
+                # files are parsed in worker processes, load threads only wait on them
+                self._datasrvc = DataService(cache=cache, parse_pool=ParsePool())
+            return self._datasrvc
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._warm_up:
+            self._warm_up = False
+            # after the first paint
+            QTimer.singleShot(0, lambda: threading.Thread(target=self._warm, name="warm-up", daemon=True).start())
+
+    def _warm(self):
+        warm_imports()
+        service = self.datasrvc
+        if not self._closing:
+            service.parse_pool.warm()
+
+    def compare_data(self):
+        # Joins A and B on the selected key columns (same count, in column order)
+        # and shows the matches with their changed values highlighted
+        if self.df_a is None or self.df_b is None:
+            QMessageBox.information(self, "Nothing to compare", "Load File A and File B first.")
+            return
+        keys_a = self.dropA.selected_columns()
+        keys_b = self.dropB.selected_columns()
+        if not keys_a or len(keys_a) != len(keys_b):
+            QMessageBox.information(self, "Select key columns",
+                                    "Select the same number of key columns in File A and File B.")
+            return
+        if self._comparer is not None:
+            QMessageBox.information(self, "Compare running", "Wait for the current compare to finish.")
+            return
+
+        self._next_token += 1
+        worker = CompareWorker(self.datasrvc, self._next_token, self.df_a, self.df_b, keys_a, keys_b)
+        worker.signals.finished.connect(self._on_compare_finished)
+        worker.signals.failed.connect(self._on_compare_failed)
+        self._comparer = worker
+        self.compare_btn.setEnabled(False)
+        self._pool.start(worker)
+
+    def _end_compare(self, token: int) -> bool:
+        if self._comparer is None or self._comparer.token != token:
+            return False
+        self._comparer = None
+        self.compare_btn.setEnabled(True)
+        return True
+
+    def _on_compare_finished(self, token: int, result, diff: dict):
+        if not self._end_compare(token):
+            return
+        self.show_result(result["matches"], diff)
+        counts = ", ".join(f"{k}: {len(v):,}" for k, v in result.items() if k != "merged")
+        self.statusBar().showMessage(f"{counts}, changed rows: {int(diff['row_changed'].sum()):,}")
+
+    def _on_compare_failed(self, token: int, message: str):
+        if self._end_compare(token):
+            QMessageBox.critical(self, "Failed to compare Data", message)
+
+    def show_result(self, df, diff: dict | None = None):
+        # Puts a compare result (a DataFrame or an IndexCompareResult.window) in the
+        # center table; with a value_diff result the changed _A/_B cells are highlighted
+        highlight = None
+        if diff is not None:
+            from back_end.value_diff import cell_mask
+            highlight = cell_mask(diff["changed"], list(df.columns))
+        self.result = df
+        self._transformer = None
+        self._update_undo_actions()
+        self.model.set_df(df, highlight)
+        self.table.resizeColumnsToContents()
+
+    def transform_result(self, rules):
+        # Applies transform rules to the shown result (see back_end.transform); only
+        # the columns they change are re-rendered
+        if self.result is None:
+            return
+        if self._transformer is None:
+            import numpy as np
+            import pandas as pd
+
+            data = self.result
+            if not isinstance(data, pd.DataFrame):
+                # result windows are read-only views, transforms work on the frame
+                data = data.rows(np.arange(len(data)))
+            self._transformer = self.datasrvc.transformer(data)
         try:
-            df = self.datasrvc.get_data(path)
-        except Exception as e:
-            QMessageBox.critical(self, "Failed to load Data", str(e))
+            step = self._transformer.apply(rules)
+        except (KeyError, ValueError) as e:
+            QMessageBox.critical(self, "Failed to transform Data", str(e))
             return
+        self._show_transform(step)
 
-        preview = df.copy()
+    def drop_null_rows(self):
+        from back_end.transform import DropNulls
+        self.transform_result(DropNulls())
 
-        if side.lower() == "a":
-            self.df_a = df
-            self.dropA.set_preview(preview, path)
+    def undo_transform(self):
+        if self._transformer is not None:
+            self._show_transform(self._transformer.undo())
 
+    def redo_transform(self):
+        if self._transformer is not None:
+            self._show_transform(self._transformer.redo())
+
+    def _show_transform(self, step):
+        if step is None:
+            return
+        self.result = step.frame
+        if step.reshaped:
+            self.model.set_df(step.frame)
+        else:
+            # falls back to a reset while the model still shows a result window
+            self.model.update_columns(step.frame, step.changed)
+        self._update_undo_actions()
+
+    def _update_undo_actions(self):
+        t = self._transformer
+        self.undo_action.setEnabled(t is not None and t.can_undo)
+        self.redo_action.setEnabled(t is not None and t.can_redo)
+
+    def _panel(self, side: str) -> DropZoneUI:
+        return self.dropA if side == "a" else self.dropB
+
+    def _side_for_token(self, token: int) -> str | None:
+        for side, worker in self._loaders.items():
+            if worker.token == token:
+                return side
+        return None
+
+    def load_panel(self, side: str, path: str):
+        side = side.lower()
+        self.cancel_load(side)
+
+        self._next_token += 1
+        worker = LoadWorker(self.datasrvc, self._next_token, side, path)
+        worker.signals.progress.connect(self._on_load_progress)
+        worker.signals.preview.connect(self._on_load_preview)
+        worker.signals.finished.connect(self._on_load_finished)
+        worker.signals.failed.connect(self._on_load_failed)
+        worker.signals.cancelled.connect(self._on_load_cancelled)
+        self._loaders[side] = worker
+
+        self._panel(side).set_loading(path)
+        self._pool.start(worker)
+
+    def _set_side_df(self, side: str, df: "pd.DataFrame | None"):
+        if side == "a":
+            self.df_a = df
         else:
             self.df_b = df
-            self.dropB.set_preview(preview, path)
 
+    def _finish_panel(self, side: str):
+        panel = self._panel(side)
+        panel.finish_loading()
+        # a cancelled or failed replacement leaves the previous dataset in place
+        if not panel.has_data:
+            self._set_side_df(side, None)
+
+    def cancel_load(self, side: str):
+        worker = self._loaders.pop(side, None)
+        if worker is None:
+            return
+        worker.cancel()
+        self._finish_panel(side)
+
+    def _on_load_progress(self, token: int, bytes_read: int, total: int, rows: int):
+        side = self._side_for_token(token)
+        if side is not None:
+            self._panel(side).set_progress(bytes_read, total, rows)
+
+    def _on_load_preview(self, token: int, preview: "pd.DataFrame"):
+        side = self._side_for_token(token)
+        if side is not None:
+            self._panel(side).set_preview(preview, self._loaders[side].path, partial=True)
+
+    def _on_load_finished(self, token: int, df: "pd.DataFrame"):
+        side = self._side_for_token(token)
+        if side is None:
+            return
+        worker = self._loaders.pop(side)
+        self._set_side_df(side, df)
+
+        panel = self._panel(side)
+        note = f"cache {worker.cache_state}" if worker.cache_state else None
+        if worker.has_preview:
+            panel.set_shape(worker.path, len(df), len(df.columns), note)
+        else:
+            panel.set_preview(df, worker.path, note=note)
+        if worker.trace_summary:
+            panel.set_trace_summary(worker.trace_summary)
+
+    def _on_load_failed(self, token: int, message: str):
+        side = self._side_for_token(token)
+        if side is None:
+            return
+        self._loaders.pop(side)
+        self._finish_panel(side)
+        QMessageBox.critical(self, "Failed to load Data", message)
+
+    def _on_load_cancelled(self, token: int):
+        side = self._side_for_token(token)
+        if side is not None:
+            self._loaders.pop(side)
+            self._finish_panel(side)
+
+    def export_data(self, which: str):
+        # Exports File A, File B or the shown result in the background; the frames
+        # are never modified in place, so the worker can keep reading while the
+        # panels load something else
+        data = {"a": self.df_a, "b": self.df_b, "result": self.result}[which]
+        if data is None:
+            QMessageBox.information(self, "Nothing to export", "There is no data to export yet.")
+            return
+        if self._exporter is not None:
+            QMessageBox.information(self, "Export running", "Wait for the current export to finish.")
+            return
+        name = {"a": "file_a", "b": "file_b", "result": "result"}[which]
+        path, _ = QFileDialog.getSaveFileName(self, "Export Data", f"{name}.csv",
+                                              build_ext_filter(self.export_ext_map))
+        if not path:
+            return
+
+        self._next_token += 1
+        worker = ExportWorker(self.datasrvc, self._next_token, data, path)
+        worker.signals.progress.connect(self._on_export_progress)
+        worker.signals.finished.connect(self._on_export_finished)
+        worker.signals.failed.connect(self._on_export_failed)
+        worker.signals.cancelled.connect(self._on_export_cancelled)
+        self._exporter = worker
+
+        dialog = QProgressDialog(f"Exporting {os.path.basename(path)}...", "Cancel", 0, 1000, self)
+        dialog.setWindowTitle("Export")
+        dialog.setMinimumDuration(500)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.canceled.connect(worker.cancel)
+        self._export_dialog = dialog
+        self._pool.start(worker)
+
+    def _end_export(self, token: int) -> bool:
+        if self._exporter is None or self._exporter.token != token:
+            return False
+        self._exporter = None
+        if self._export_dialog is not None:
+            self._export_dialog.close()
+            self._export_dialog.deleteLater()
+            self._export_dialog = None
+        return True
+
+    def _on_export_progress(self, token: int, rows: int, total: int):
+        if self._exporter is not None and self._exporter.token == token and self._export_dialog is not None:
+            self._export_dialog.setValue(int(1000 * rows / total) if total else 1000)
+            self._export_dialog.setLabelText(f"Exporting {os.path.basename(self._exporter.path)}... "
+                                             f"{rows:,} of {total:,} rows")
+
+    def _on_export_finished(self, token: int, rows: int):
+        self._end_export(token)
+
+    def _on_export_failed(self, token: int, message: str):
+        if self._end_export(token):
+            QMessageBox.critical(self, "Failed to export Data", message)
+
+    def _on_export_cancelled(self, token: int):
+        self._end_export(token)
+
+    def export_trace(self):
+        # Chrome trace JSON of recent loads and compares (chrome://tracing, Perfetto)
+        path, _ = QFileDialog.getSaveFileName(self, "Export Performance Trace", "datacomp_trace.json",
+                                              "Trace Files (*.json)")
+        if not path:
+            return
+        try:
+            self.datasrvc.tracer.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Failed to export trace", str(e))
+
+    def closeEvent(self, event):
+        for side in list(self._loaders):
+            self.cancel_load(side)
+        if self._exporter is not None:
+            self._exporter.cancel()
+        self._closing = True
+        if self._datasrvc is not None and self._datasrvc.parse_pool is not None:
+            self._datasrvc.parse_pool.shutdown()
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+import threading
+
+
+class LoadSignals(QObject):
+    # token, bytes_read, total_bytes, rows_parsed; counts are objects, a Qt int
+    # is 32-bit and files past 2 GiB would overflow it
+    progress = Signal(int, object, object, object)
+    # token, partial DataFrame read ahead of the full parse
+    preview = Signal(int, object)
+    # token, DataFrame
+    finished = Signal(int, object)
+    # token, error message
+    failed = Signal(int, str)
+    cancelled = Signal(int)
+
+
+class LoadWorker(QRunnable):
+    def __init__(self, service: "DataService", token: int, side: str, path: str):
+        super().__init__()
+        self.service = service
+        self.token = token
+        self.side = side
+        self.path = path
+        self.signals = LoadSignals()
+        self._cancel = threading.Event()
+        self.has_preview = False
+        # "hit" / "miss" when the dataset cache was consulted
+        self.cache_state: str | None = None
+        # timing summary of the load (see back_end.profiling.Span.summary)
+        self.trace_summary: str | None = None
+        # the worker object is owned by MainWindow, not by the pool
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _report(self, bytes_read: int, total: int, rows: int):
+        self.signals.progress.emit(self.token, bytes_read, total, rows)
+
+    def _cache_status(self, state: str):
+        self.cache_state = state
+
+    def run(self):
+        # the service is there, so this only binds the name
+        from back_end.data_service import LoadCancelled
+
+        tracer = self.service.tracer
+        try:
+            with tracer.span("load", path=self.path) as root:
+                with tracer.span("preview"):
+                    preview = self.service.get_preview(self.path)
+                if preview is not None and not self._cancel.is_set():
+                    self.has_preview = True
+                    self.signals.preview.emit(self.token, preview)
+
+                df = self.service.get_data(self.path, progress=self._report, cancel=self._cancel,
+                                           cache_status=self._cache_status)
+        except LoadCancelled:
+            self.signals.cancelled.emit(self.token)
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.token, str(e))
+            return
+
+        if root is not None:
+            self.trace_summary = root.summary()
+        if self._cancel.is_set():
+            self.signals.cancelled.emit(self.token)
+        else:
+            self.signals.finished.emit(self.token, df)
+
+
+class ExportSignals(QObject):
+    # token, rows_written, total_rows
+    progress = Signal(int, object, object)
+    # token, rows written
+    finished = Signal(int, object)
+    # token, error message
+    failed = Signal(int, str)
+    cancelled = Signal(int)
+
+
+class ExportWorker(QRunnable):
+    # Writes a frame, result window or result[key] in chunks off the GUI thread
+    def __init__(self, service: "DataService", token: int, data, path: str, key: str | None = None):
+        super().__init__()
+        self.service = service
+        self.token = token
+        self.data = data
+        self.path = path
+        self.key = key
+        self.signals = ExportSignals()
+        self._cancel = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _report(self, rows: int, total: int):
+        self.signals.progress.emit(self.token, rows, total)
+
+    def run(self):
+        from back_end.export import ExportCancelled
+
+        try:
+            rows = self.service.export(self.data, self.path, self.key,
+                                       progress=self._report, cancel=self._cancel)
+        except ExportCancelled:
+            self.signals.cancelled.emit(self.token)
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.token, str(e))
+            return
+        self.signals.finished.emit(self.token, rows)
+
+
+class CompareSignals(QObject):
+    # token, compare result, value_diff of its matches
+    finished = Signal(int, object, object)
+    # token, error message
+    failed = Signal(int, str)
+
+
+class CompareWorker(QRunnable):
+    # Runs compare_columns on the loaded frames and diffs the values of the matches
+    def __init__(self, service: "DataService", token: int, data_1, data_2,
+                 columns_1: list, columns_2: list):
+        super().__init__()
+        self.service = service
+        self.token = token
+        self.data_1 = data_1
+        self.data_2 = data_2
+        self.columns_1 = columns_1
+        self.columns_2 = columns_2
+        self.signals = CompareSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            result = self.service.compare_columns(self.data_1, self.data_2,
+                                                  self.columns_1, self.columns_2)
+            diff = self.service.diff_values(result["matches"])
+        except Exception as e:
+            self.signals.failed.emit(self.token, str(e))
+            return
+        self.signals.finished.emit(self.token, result, diff)